@@ -3,5 +3,13 @@ from . import api_views
 
 urlpatterns = [
     path('berechnung/', api_views.berechnung_api, name='berechnung_api'),
+    path('berechnung/terme/', api_views.berechnung_terme_api, name='berechnung_terme_api'),
+    path('berechnung/kontext/', api_views.berechnung_kontext_api, name='berechnung_kontext_api'),
+    path('berechnung/batch/', api_views.berechnung_batch_api, name='berechnung_batch_api'),
+    path('berechnung/parameterstudie/', api_views.parameterstudie_api, name='parameterstudie_api'),
     path('gebaeude/<int:gebaeude_id>/berechnung/', api_views.gebaeude_berechnung, name='gebaeude_berechnung'),
+    path('gebaeude/export/', api_views.ergebnis_export_api, name='ergebnis_export_api'),
+    path('gebaeude/import/', api_views.gebaeude_import_api, name='gebaeude_import_api'),
+    path('async/berechnung/', api_views.berechnung_api_async, name='berechnung_api_async'),
+    path('async/gebaeude/<int:gebaeude_id>/berechnung/', api_views.gebaeude_berechnung_async, name='gebaeude_berechnung_async'),
 ]
\ No newline at end of file
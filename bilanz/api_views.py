@@ -1,11 +1,71 @@
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.shortcuts import get_object_or_404
-from django.core.exceptions import ValidationError
+from django.core.exceptions import RequestDataTooBig, ValidationError
+import codecs
 import json
+import math
+
+import numpy as np
 
 from .models import Gebaeude, Ort, Bauteil, PVAnlage, Lueftung, Beleuchtung, Waermequelle
-from .berechnungen import berechne_energiebilanz
+from .berechnungen import (
+    berechne_energiebilanz, berechne_energiebilanz_inkrementell, berechne_energiebilanz_auswahl,
+    ergebnis_auswahl, benoetigte_terme, benoetigt_klimadaten, auswahl_aus_ergebnis,
+)
+from .berechnungen_batch import (
+    VERFAHREN, berechne_energiebilanz_batch, spalten_aus_datensaetzen, ergebnis_zeilen,
+)
+from .eingaben import (
+    datensatz_aus_parametern, datensatz_pruefen, gebaeude_eingabe_aus_parametern,
+    bauteile_aus_parametern,
+)
+from .klima import klimadaten_fuer_ort, aklimadaten_fuer_ort
+from .lader import lade_berechnungseingabe, alade_berechnungseingabe
+from .ergebnisse import aktuelle_berechnung, aaktuelle_berechnung
+from .ausfuehrung import Ueberlastet, get_berechnungs_executor
+from .importer import IMPORT_FORMATE, datensaetze_lesen, importieren
+from .export import CONTENT_TYPES, EXPORT_FORMATE, EXPORT_QUELLEN, ergebnisse_iterieren, export_zeilen
+from .live import (
+    BERECHNUNGSFEHLER, KeinKontext, kontext_oeffnen, kontext_aendern, kontext_laden, kontext_schliessen,
+)
+from .parameterstudie import berechne_parameterstudie
+from .cache import get_ergebnis_cache, get_term_cache, berechnungs_schluessel
+from .messung import JsonResponse
+from . import metriken
+from .protokoll import protokollieren
+
+
+MAX_BATCH_GROESSE = 100000
+MAX_BATCH_BYTES = 100 * 1024 * 1024
+LESE_BLOCK = 64 * 1024
+
+
+def _lese_auswahl(params):
+    """
+    Auswahl aus den Parametern ``blocks`` und ``fields`` (kommagetrennt)
+
+    Gibt None zurück, wenn keine Auswahl angegeben ist.
+    """
+    bloecke = [b for b in params.get('blocks', '').split(',') if b]
+    felder = [f for f in params.get('fields', '').split(',') if f]
+    if not bloecke and not felder:
+        return None
+    return ergebnis_auswahl(bloecke, felder)
+
+
+def _lese_trace(params):
+    """``trace=1``: Ergebnis mit Protokoll der Berechnung (siehe protokoll.py)"""
+    return params.get('trace', '').lower() in ('1', 'true')
+
+
+def _protokolliert(berechnung, auswahl):
+    """Ergebnis von ``berechnung()`` samt Protokoll unter 'trace'"""
+    with protokollieren() as protokoll:
+        ergebnis = berechnung()
+    if auswahl is not None:
+        ergebnis = auswahl_aus_ergebnis(ergebnis, auswahl)
+    return {**ergebnis, 'trace': protokoll.baum}
 
 
 @csrf_exempt
@@ -13,6 +73,11 @@ def berechnung_api(request):
     """
     API-Endpoint für Live-Berechnungen
     Akzeptiert GET-Parameter und gibt JSON-Ergebnis zurück
+
+    Mit ``blocks=`` bzw. ``fields=`` werden nur die angeforderten
+    Ergebnisblöcke/-felder berechnet und zurückgegeben. Mit ``trace=1``
+    wird vollständig und ohne Cache gerechnet und das Protokoll der
+    Berechnung unter 'trace' mitgeliefert.
     """
     if request.method != 'GET':
         return JsonResponse({'error': 'Nur GET-Requests erlaubt'}, status=405)
@@ -21,83 +86,27 @@ def berechnung_api(request):
         # Parameter aus GET-Request extrahieren
         params = request.GET
         
-        # Gebäude-Daten aus Parametern erstellen (Mock-Objekt)
-        class MockGebaeude:
-            def __init__(self, params):
-                self.laenge_ns = float(params.get('laenge_ns', 20))
-                self.breite_ow = float(params.get('breite_ow', 15))
-                self.geschosse = int(params.get('geschosse', 3))
-                self.geschosshoehe = float(params.get('geschosshoehe', 2.8))
-                self.personendichte = float(params.get('personendichte', 15))
-                self.gebaeudeart = params.get('geb_klasse', 'buero')
-                
-                # Fensterflächen
-                self.fensterflaeche_nord = float(params.get('fenster_nord', 0))
-                self.fensterflaeche_sued = float(params.get('fenster_sued', 0))
-                self.fensterflaeche_ost = float(params.get('fenster_ost', 0))
-                self.fensterflaeche_west = float(params.get('fenster_west', 0))
-                
-                # g-Werte
-                self.g_wert_nord = float(params.get('g_wert_nord', 0.6))
-                self.g_wert_sued = float(params.get('g_wert_sued', 0.6))
-                self.g_wert_ost = float(params.get('g_wert_ost', 0.6))
-                self.g_wert_west = float(params.get('g_wert_west', 0.6))
-            
-            @property
-            def hoehe(self):
-                return self.geschosse * self.geschosshoehe
-            
-            @property
-            def grundflaeche(self):
-                return self.laenge_ns * self.breite_ow
-            
-            @property
-            def bgf(self):
-                return self.grundflaeche * self.geschosse
-            
-            @property
-            def nf(self):
-                return self.bgf * 0.85
-            
-            @property
-            def volumen(self):
-                return self.bgf * self.geschosshoehe
-        
-        gebaeude = MockGebaeude(params)
-        
-        # U-Werte aus Parametern
-        bauteile_dict = {}
-        for typ in ['wand_nord', 'wand_sued', 'wand_ost', 'wand_west', 'dach', 'bodenplatte']:
-            u_wert_key = f'u_wert_{typ}'
-            if u_wert_key in params and params[u_wert_key]:
-                try:
-                    bauteile_dict[typ] = float(params[u_wert_key])
-                except ValueError:
-                    pass
-        
-        # Standard-Klimadaten (München)
-        klimadaten = {
-            'heizgradtage': 3500,
-            'solarstrahlung_nord': 300,
-            'solarstrahlung_sued': 1100,
-            'solarstrahlung_ost': 700,
-            'solarstrahlung_west': 700,
-        }
-        
-        # Ort aus Parameter
-        ort_name = params.get('ort')
-        if ort_name:
-            try:
-                ort = Ort.objects.get(name=ort_name)
-                klimadaten = {
-                    'heizgradtage': ort.heizgradtage,
-                    'solarstrahlung_nord': ort.solarstrahlung_nord,
-                    'solarstrahlung_sued': ort.solarstrahlung_sued,
-                    'solarstrahlung_ost': ort.solarstrahlung_ost,
-                    'solarstrahlung_west': ort.solarstrahlung_west,
-                }
-            except Ort.DoesNotExist:
-                pass
+        # Gebäude-Daten und U-Werte aus Parametern
+        gebaeude = gebaeude_eingabe_aus_parametern(params)
+        bauteile_dict = bauteile_aus_parametern(params)
+        
+        auswahl = _lese_auswahl(params)
+        if _lese_trace(params):
+            klimadaten = klimadaten_fuer_ort(params.get('ort'))
+            return JsonResponse(_protokolliert(lambda: berechne_energiebilanz(
+                gebaeude, bauteile_dict, None, None, [], [], klimadaten,
+            ), auswahl))
+        if auswahl is not None:
+            # Nur benötigte Terme, Klimadaten nur wenn einer davon sie braucht
+            klimadaten = None
+            if benoetigt_klimadaten(benoetigte_terme(auswahl)):
+                klimadaten = klimadaten_fuer_ort(params.get('ort'))
+            return JsonResponse(berechne_energiebilanz_auswahl(
+                auswahl, gebaeude, bauteile_dict, None, None, [], [], klimadaten,
+            ))
+        
+        # Klimadaten des Orts (Standard: München)
+        klimadaten = klimadaten_fuer_ort(params.get('ort'))
         
         # Mock-Daten für andere Komponenten
         pv_data = None
@@ -105,11 +114,19 @@ def berechnung_api(request):
         beleuchtungen_data = []
         waermequellen_data = []
         
-        # Berechnung durchführen
-        ergebnis = berechne_energiebilanz(
-            gebaeude, bauteile_dict, pv_data, lueftung_data,
-            beleuchtungen_data, waermequellen_data, klimadaten
-        )
+        # Berechnung durchführen (bzw. aus dem Ergebnis-Cache)
+        def berechnung():
+            return berechne_energiebilanz(
+                gebaeude, bauteile_dict, pv_data, lueftung_data,
+                beleuchtungen_data, waermequellen_data, klimadaten
+            )
+        
+        cache = get_ergebnis_cache()
+        if cache is not None:
+            schluessel = berechnungs_schluessel(gebaeude, bauteile_dict, klimadaten)
+            ergebnis = cache.hole_oder_berechne(schluessel, berechnung)
+        else:
+            ergebnis = berechnung()
         
         return JsonResponse(ergebnis)
         
@@ -117,49 +134,482 @@ def berechnung_api(request):
         return JsonResponse({'error': str(e)}, status=400)
 
 
+@csrf_exempt
+def berechnung_terme_api(request):
+    """
+    Inkrementelle Live-Berechnung mit denselben Parametern wie berechnung_api
+
+    Gibt neben dem Ergebnis die Werte der einzelnen Bilanzterme und die
+    Namen der Terme zurück, die neu berechnet werden mussten.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Nur GET-Requests erlaubt'}, status=405)
+    
+    try:
+        params = request.GET
+        werte, neu_berechnet = berechne_energiebilanz_inkrementell(
+            gebaeude_eingabe_aus_parametern(params),
+            bauteile_aus_parametern(params),
+            None, None, [], [],
+            klimadaten_fuer_ort(params.get('ort')),
+            cache=get_term_cache(),
+        )
+        ergebnis = werte.pop('energiebilanz')
+        
+        return JsonResponse({
+            'ergebnis': ergebnis,
+            'terme': werte,
+            'neu_berechnet': neu_berechnet,
+        })
+        
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+@csrf_exempt
+def berechnung_kontext_api(request):
+    """
+    API-Endpoint für die Live-Berechnung mit Kontext in der Session
+    POST öffnet den Kontext (Body: Parameter wie berechnung_api, optional),
+    PATCH übernimmt geänderte Parameter und gibt nur geänderte Ergebnisfelder
+    zurück, GET liefert das vollständige aktuelle Ergebnis, DELETE schließt
+    den Kontext
+    """
+    if request.method == 'DELETE':
+        kontext_schliessen(request.session)
+        return HttpResponse(status=204)
+
+    if request.method == 'GET':
+        try:
+            kontext = kontext_laden(request.session)
+        except KeinKontext:
+            return JsonResponse({'error': 'Kein Berechnungskontext geöffnet'}, status=409)
+        except BERECHNUNGSFEHLER as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse({'version': kontext['version'], 'ergebnis': kontext['ergebnis']})
+
+    if request.method not in ('POST', 'PATCH'):
+        return JsonResponse({'error': 'Nur GET, POST, PATCH und DELETE erlaubt'}, status=405)
+
+    try:
+        daten = json.loads(request.body or b'{}')
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return JsonResponse({'error': 'Body muss ein JSON-Objekt sein'}, status=400)
+    if not isinstance(daten, dict):
+        return JsonResponse({'error': 'Body muss ein JSON-Objekt sein'}, status=400)
+
+    try:
+        if request.method == 'POST':
+            kontext = kontext_oeffnen(request.session, daten)
+            return JsonResponse({'version': kontext['version'], 'ergebnis': kontext['ergebnis']})
+
+        version, aenderungen = kontext_aendern(request.session, daten)
+        return JsonResponse({'version': version, 'aenderungen': aenderungen})
+
+    except KeinKontext:
+        return JsonResponse({'error': 'Kein Berechnungskontext geöffnet'}, status=409)
+    except BERECHNUNGSFEHLER as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
 def gebaeude_berechnung(request, gebaeude_id):
     """
     API-Endpoint für Berechnung eines spezifischen Gebäudes
+    Unterstützt dieselbe Auswahl mit ``blocks=``/``fields=`` und ``trace=1``
+    wie berechnung_api
     """
     if request.method != 'GET':
         return JsonResponse({'error': 'Nur GET-Requests erlaubt'}, status=405)
     
     try:
-        gebaeude = get_object_or_404(Gebaeude, id=gebaeude_id)
+        auswahl = _lese_auswahl(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    trace = _lese_trace(request.GET)
+    
+    if auswahl is not None and not benoetigte_terme(auswahl) and not trace:
+        # Nur Geometrie: weder Relationen noch Klimadaten laden
+        gebaeude = Gebaeude.objects.filter(id=gebaeude_id).first()
+        if gebaeude is None:
+            return JsonResponse({'error': 'Gebäude nicht gefunden'}, status=404)
+        return JsonResponse(berechne_energiebilanz_auswahl(
+            auswahl, gebaeude, {}, None, None, [], [], None,
+        ))
+    
+    try:
+        eingaben = lade_berechnungseingabe(gebaeude_id)
+    except Gebaeude.DoesNotExist:
+        return JsonResponse({'error': 'Gebäude nicht gefunden'}, status=404)
+    
+    try:
+        if trace:
+            # Immer neu berechnen, das gespeicherte Ergebnis bleibt unverändert
+            return JsonResponse(_protokolliert(eingaben.berechnen, auswahl))
         
-        # Bauteile sammeln
-        bauteile_dict = {bt.typ: bt.u_wert for bt in gebaeude.bauteile.all()}
+        # Gespeichertes Ergebnis, neu berechnet nur bei geänderten Eingaben
+        berechnung, _ = aktuelle_berechnung(eingaben)
         
-        # Klimadaten
-        klimadaten = {
-            'heizgradtage': gebaeude.ort.heizgradtage,
-            'solarstrahlung_nord': gebaeude.ort.solarstrahlung_nord,
-            'solarstrahlung_sued': gebaeude.ort.solarstrahlung_sued,
-            'solarstrahlung_ost': gebaeude.ort.solarstrahlung_ost,
-            'solarstrahlung_west': gebaeude.ort.solarstrahlung_west,
-        }
+        if auswahl is not None:
+            return JsonResponse(auswahl_aus_ergebnis(berechnung.ergebnis, auswahl))
+        return JsonResponse(berechnung.ergebnis)
         
-        # Andere Komponenten
-        try:
-            pv_data = gebaeude.pv_anlage
-        except:
-            pv_data = None
-            
-        try:
-            lueftung_data = gebaeude.lueftung
-        except:
-            lueftung_data = None
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+async def berechnung_api_async(request):
+    """
+    Asynchrone Variante von berechnung_api für den Betrieb unter ASGI
+    Klimadaten kommen über das asynchrone ORM, die Berechnung läuft im
+    begrenzten Berechnungs-Executor
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Nur GET-Requests erlaubt'}, status=405)
+    
+    try:
+        params = request.GET
+        gebaeude = gebaeude_eingabe_aus_parametern(params)
+        bauteile_dict = bauteile_aus_parametern(params)
+        auswahl = _lese_auswahl(params)
+        executor = get_berechnungs_executor()
         
-        beleuchtungen_data = list(gebaeude.beleuchtungen.all())
-        waermequellen_data = list(gebaeude.waermequellen.all())
+        if auswahl is not None:
+            klimadaten = None
+            if benoetigt_klimadaten(benoetigte_terme(auswahl)):
+                klimadaten = await aklimadaten_fuer_ort(params.get('ort'))
+            return JsonResponse(await executor.ausfuehren(
+                berechne_energiebilanz_auswahl,
+                auswahl, gebaeude, bauteile_dict, None, None, [], [], klimadaten,
+            ))
         
-        # Berechnung durchführen
-        ergebnis = berechne_energiebilanz(
-            gebaeude, bauteile_dict, pv_data, lueftung_data,
-            beleuchtungen_data, waermequellen_data, klimadaten
-        )
+        klimadaten = await aklimadaten_fuer_ort(params.get('ort'))
+        
+        cache = get_ergebnis_cache()
+        schluessel = None
+        ergebnis = None
+        if cache is not None:
+            schluessel = berechnungs_schluessel(gebaeude, bauteile_dict, klimadaten)
+            ergebnis = cache.get(schluessel)
+        if ergebnis is None:
+            ergebnis = await executor.ausfuehren(
+                berechne_energiebilanz, gebaeude, bauteile_dict, None, None, [], [], klimadaten,
+            )
+            if cache is not None:
+                cache.set(schluessel, ergebnis)
         
         return JsonResponse(ergebnis)
         
+    except Ueberlastet:
+        return JsonResponse({'error': 'Zu viele gleichzeitige Berechnungen'}, status=503)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+async def gebaeude_berechnung_async(request, gebaeude_id):
+    """
+    Asynchrone Variante von gebaeude_berechnung für den Betrieb unter ASGI
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Nur GET-Requests erlaubt'}, status=405)
+    
+    try:
+        auswahl = _lese_auswahl(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    if auswahl is not None and not benoetigte_terme(auswahl):
+        gebaeude = await Gebaeude.objects.filter(id=gebaeude_id).afirst()
+        if gebaeude is None:
+            return JsonResponse({'error': 'Gebäude nicht gefunden'}, status=404)
+        return JsonResponse(berechne_energiebilanz_auswahl(
+            auswahl, gebaeude, {}, None, None, [], [], None,
+        ))
+    
+    try:
+        eingaben = await alade_berechnungseingabe(gebaeude_id)
+    except Gebaeude.DoesNotExist:
+        return JsonResponse({'error': 'Gebäude nicht gefunden'}, status=404)
+    
+    try:
+        berechnung, _ = await aaktuelle_berechnung(eingaben, get_berechnungs_executor().ausfuehren)
+        
+        if auswahl is not None:
+            return JsonResponse(auswahl_aus_ergebnis(berechnung.ergebnis, auswahl))
+        return JsonResponse(berechnung.ergebnis)
+        
+    except Ueberlastet:
+        return JsonResponse({'error': 'Zu viele gleichzeitige Berechnungen'}, status=503)
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=400)
\ No newline at end of file
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def _lese_parametersaetze(request, maximal):
+    """
+    Liest die Parametersätze aus einem JSON-Array oder NDJSON-Body
+
+    Der Body wird zeilenweise aus dem Request gelesen (nicht über
+    request.body und damit ohne die Grenze DATA_UPLOAD_MAX_MEMORY_SIZE,
+    stattdessen bis BILANZ_BATCH_MAX_BYTES, darüber RequestDataTooBig).
+    NDJSON wird nach ``maximal`` + 1 Parametersätzen nicht weiter gelesen.
+    Gibt eine Liste zurück, deren Einträge entweder ein Parameter-Dict
+    oder eine Fehlermeldung (str) sind.
+    """
+    grenze = getattr(settings, 'BILANZ_BATCH_MAX_BYTES', MAX_BATCH_BYTES)
+    zeilen = codecs.iterdecode(_begrenzte_zeilen(request, grenze), 'utf-8')
+    saetze = []
+    for nummer, zeile in enumerate(zeilen, start=1):
+        if not zeile.strip():
+            continue
+        if not saetze and zeile.lstrip().startswith('['):
+            # JSON-Array: Body vollständig lesen
+            return _pruefe_saetze(_lese_json_body(zeile + ''.join(zeilen)))
+        try:
+            saetze.append(json.loads(zeile))
+        except json.JSONDecodeError as e:
+            if not saetze:
+                # Kein NDJSON, z.B. ein mehrzeilig formatiertes JSON-Objekt
+                return _pruefe_saetze(_lese_json_body(zeile + ''.join(zeilen), nummer - 1))
+            saetze.append(f'Zeile {nummer}: ungültiges JSON ({e.msg})')
+        if len(saetze) > maximal:
+            break
+    return _pruefe_saetze(saetze)
+
+
+def _begrenzte_zeilen(request, grenze):
+    """
+    Zeilen des Bodys (bytes), blockweise gelesen, damit auch eine einzelne
+    Zeile nicht mehr als ``grenze`` Bytes in den Speicher holt
+    """
+    gelesen = 0
+    teile = []
+    for teil in iter(lambda: request.readline(LESE_BLOCK), b''):
+        gelesen += len(teil)
+        if gelesen > grenze:
+            raise RequestDataTooBig(f'Body größer als {grenze} Bytes')
+        teile.append(teil)
+        if teil.endswith(b'\n'):
+            yield b''.join(teile)
+            teile = []
+    if teile:
+        yield b''.join(teile)
+
+
+def _lese_json_body(body, leerzeilen=0):
+    """Parametersätze aus einem vollständigen JSON-Body, sonst je Zeile wie NDJSON"""
+    try:
+        daten = json.loads(body)
+    except json.JSONDecodeError:
+        daten = None
+
+    if isinstance(daten, list):
+        return daten
+    if isinstance(daten, dict):
+        return [daten]
+
+    saetze = []
+    for nummer, zeile in enumerate(body.splitlines(), start=leerzeilen + 1):
+        if not zeile.strip():
+            continue
+        try:
+            saetze.append(json.loads(zeile))
+        except json.JSONDecodeError as e:
+            saetze.append(f'Zeile {nummer}: ungültiges JSON ({e.msg})')
+    return saetze
+
+
+def _pruefe_saetze(saetze):
+    return [
+        satz if isinstance(satz, (dict, str)) else 'Parametersatz muss ein JSON-Objekt sein'
+        for satz in saetze
+    ]
+
+
+def _endlich(ergebnisse):
+    """
+    Je Zeile, ob alle Ergebnisse endlich sind
+    Überläufe ergeben inf bzw. nan, das kein gültiges JSON ist
+    """
+    return np.logical_and.reduce([
+        np.isfinite(werte) for inhalt in ergebnisse.values() for werte in inhalt.values()
+    ])
+
+
+@csrf_exempt
+def berechnung_batch_api(request):
+    """
+    API-Endpoint für Batch-Berechnungen
+    Akzeptiert ein JSON-Array oder NDJSON mit Parametersätzen wie berechnung_api
+    und gibt die Ergebnisse in derselben Reihenfolge zurück
+    Optional: ?verfahren=monat für das Monatsbilanzverfahren
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Nur POST-Requests erlaubt'}, status=405)
+
+    verfahren = request.GET.get('verfahren', 'jahr')
+    if verfahren not in VERFAHREN:
+        return JsonResponse({'error': f'Unbekanntes Verfahren "{verfahren}"'}, status=400)
+
+    try:
+        parametersaetze = _lese_parametersaetze(request, MAX_BATCH_GROESSE)
+    except UnicodeDecodeError:
+        return JsonResponse({'error': 'Body muss UTF-8 kodiert sein'}, status=400)
+    except RequestDataTooBig as e:
+        return JsonResponse({'error': str(e)}, status=413)
+
+    if len(parametersaetze) > MAX_BATCH_GROESSE:
+        return JsonResponse(
+            {'error': f'Maximal {MAX_BATCH_GROESSE} Parametersätze pro Request'}, status=413
+        )
+
+    ergebnisse = [None] * len(parametersaetze)
+    datensaetze = []
+    positionen = []
+
+    for index, params in enumerate(parametersaetze):
+        if isinstance(params, str):
+            ergebnisse[index] = {'error': params}
+            continue
+        klimadaten = klimadaten_fuer_ort(params.get('ort'))
+        try:
+            datensaetze.append(datensatz_pruefen(datensatz_aus_parametern(params, klimadaten)))
+        except (TypeError, ValueError) as e:
+            ergebnisse[index] = {'error': str(e)}
+            continue
+        positionen.append(index)
+
+    fehler = len(ergebnisse) - len(positionen)
+    if datensaetze:
+        batch = berechne_energiebilanz_batch(spalten_aus_datensaetzen(datensaetze), verfahren)
+        endlich = _endlich(batch).tolist()
+        for index, ergebnis, ist_endlich in zip(positionen, ergebnis_zeilen(batch), endlich):
+            if ist_endlich:
+                ergebnisse[index] = ergebnis
+            else:
+                ergebnisse[index] = {'error': 'Die Berechnung ergibt keinen endlichen Wert'}
+                fehler += 1
+
+    return JsonResponse({
+        'anzahl': len(ergebnisse),
+        'fehler': fehler,
+        'ergebnisse': ergebnisse,
+    })
+
+
+@csrf_exempt
+def parameterstudie_api(request):
+    """
+    API-Endpoint für Parameterstudien
+    Erwartet JSON mit 'basis' (Parameter wie berechnung_api) und 'variationen'
+    und gibt das vollständige Ergebnisraster zurück
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Nur POST-Requests erlaubt'}, status=405)
+
+    try:
+        daten = json.loads(request.body)
+        basis = daten.get('basis', {})
+        variationen = daten.get('variationen', {})
+        if not isinstance(basis, dict) or not isinstance(variationen, dict):
+            raise ValueError("'basis' und 'variationen' müssen JSON-Objekte sein")
+
+        klimadaten = klimadaten_fuer_ort(basis.get('ort'))
+        studie = berechne_parameterstudie(datensatz_aus_parametern(basis, klimadaten), variationen)
+
+    except (ValueError, TypeError, AttributeError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if not _endlich(studie['ergebnisse']).all():
+        return JsonResponse({'error': 'Die Berechnung ergibt keinen endlichen Wert'}, status=400)
+
+    return JsonResponse({
+        'anzahl': math.prod(studie['form']),
+        'form': list(studie['form']),
+        'achsen': {name: werte.tolist() for name, werte in studie['achsen'].items()},
+        'parameter': {name: werte.tolist() for name, werte in studie['parameter'].items()},
+        'ergebnisse': {
+            block: {schluessel: np.round(werte, 1).tolist() for schluessel, werte in inhalt.items()}
+            for block, inhalt in studie['ergebnisse'].items()
+        },
+    })
+
+
+def gebaeude_import_api(request):
+    """
+    API-Endpoint für den Import von Gebäuden aus CSV oder JSON Lines
+    Der Body wird zeilenweise gelesen und blockweise gespeichert
+    Format über ?format=csv|jsonl, sonst nach Content-Type (text/csv)
+    Erfordert die Berechtigung bilanz.add_gebaeude und ein CSRF-Token
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Nur POST-Requests erlaubt'}, status=405)
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Anmeldung erforderlich'}, status=401)
+    if not request.user.has_perm('bilanz.add_gebaeude'):
+        return JsonResponse({'error': 'Keine Berechtigung für den Import'}, status=403)
+
+    format = request.GET.get('format')
+    if format is None:
+        format = 'csv' if request.content_type == 'text/csv' else 'jsonl'
+    if format not in IMPORT_FORMATE:
+        return JsonResponse({'error': f'Unbekanntes Format "{format}"'}, status=400)
+
+    try:
+        stand = importieren(datensaetze_lesen(codecs.iterdecode(request, 'utf-8-sig'), format))
+    except UnicodeDecodeError:
+        return JsonResponse({'error': 'Body muss UTF-8 kodiert sein'}, status=400)
+
+    return JsonResponse(stand)
+
+
+def _lese_ids(text):
+    """Kommagetrennte Gebäude-ids oder None"""
+    if not text:
+        return None
+    try:
+        return [int(i) for i in text.split(',') if i]
+    except ValueError:
+        raise ValueError('ids müssen ganze Zahlen sein')
+
+
+def ergebnis_export_api(request):
+    """
+    API-Endpoint für den Export der Ergebnisse vieler Gebäude
+    Gibt JSON Lines (Standard) oder CSV (?format=csv) als Stream aus
+    Filter: ort, gebaeudeart, ids (kommagetrennt), ab (id >)
+    Optional: quelle=gespeichert, blocks=/fields= wie berechnung_api
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Nur GET-Requests erlaubt'}, status=405)
+
+    format = request.GET.get('format', 'jsonl')
+    quelle = request.GET.get('quelle', 'aktuell')
+    try:
+        if format not in EXPORT_FORMATE:
+            raise ValueError(f'Unbekanntes Format "{format}"')
+        if quelle not in EXPORT_QUELLEN:
+            raise ValueError(f'Unbekannte Quelle "{quelle}"')
+        auswahl = _lese_auswahl(request.GET)
+        ids = _lese_ids(request.GET.get('ids'))
+        ab = int(request.GET['ab']) if request.GET.get('ab') else None
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    ergebnisse = ergebnisse_iterieren(
+        quelle, auswahl,
+        ort=request.GET.get('ort'), gebaeudeart=request.GET.get('gebaeudeart'), ids=ids, ab=ab,
+    )
+    response = StreamingHttpResponse(
+        export_zeilen(format, ergebnisse, auswahl),
+        content_type=f'{CONTENT_TYPES[format]}; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="ergebnisse.{format}"'
+    return response
+
+
+def metriken_api(request):
+    """Prozessweite Metriken im Prometheus-Textformat (siehe metriken.py)"""
+    if not metriken.metriken_aktiv():
+        raise Http404('Metriken deaktiviert')
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Nur GET-Requests erlaubt'}, status=405)
+    return HttpResponse(metriken.metriken_text(), content_type=metriken.CONTENT_TYPE)
@@ -4,4 +4,9 @@ from django.apps import AppConfig
 class BilanzConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'bilanz'
-    verbose_name = 'Energiebilanz'
\ No newline at end of file
+    verbose_name = 'Energiebilanz'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # execute_wrapper für neue Datenbankverbindungen
+        from . import messung, metriken  # noqa: F401
@@ -0,0 +1,95 @@
+"""
+Begrenzter Executor für Berechnungen aus asynchronen Views
+
+Die asynchronen API-Views lagern die CPU-lastige Berechnung in einen
+Thread-Pool aus, damit die Event-Loop weiter Anfragen annimmt. Die Zahl
+der gleichzeitig laufenden bzw. wartenden Berechnungen ist begrenzt;
+darüber hinaus wird Ueberlastet geworfen statt unbegrenzt zu puffern.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+STANDARD_EINSTELLUNGEN = {
+    'WORKER': 4,
+    'WARTESCHLANGE': 64,
+}
+
+
+class Ueberlastet(Exception):
+    """Alle Worker und Warteplätze des Executors sind belegt"""
+
+
+class BegrenzterExecutor:
+    """
+    Thread-Pool mit ``worker`` Threads und höchstens ``warteschlange``
+    zusätzlich wartenden Aufgaben
+    """
+
+    def __init__(self, worker=4, warteschlange=64):
+        self.worker = worker
+        self.warteschlange = warteschlange
+        self._executor = ThreadPoolExecutor(max_workers=worker, thread_name_prefix='bilanz-berechnung')
+        self._lock = threading.Lock()
+        self.laufend = 0
+        self.abgewiesen = 0
+
+    async def ausfuehren(self, funktion, *args):
+        """Führt ``funktion(*args)`` im Pool aus und gibt das Ergebnis zurück"""
+        with self._lock:
+            if self.laufend >= self.worker + self.warteschlange:
+                self.abgewiesen += 1
+                raise Ueberlastet()
+            self.laufend += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                # Kontext übernehmen, damit z.B. die Request-Messung im Worker gilt
+                self._executor, functools.partial(contextvars.copy_context().run, funktion, *args),
+            )
+        finally:
+            with self._lock:
+                self.laufend -= 1
+
+    def beenden(self):
+        self._executor.shutdown(wait=False)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_berechnungs_executor():
+    """Prozessweiter Executor gemäß settings.BILANZ_BERECHNUNG_EXECUTOR"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                einstellungen = {
+                    **STANDARD_EINSTELLUNGEN,
+                    **getattr(settings, 'BILANZ_BERECHNUNG_EXECUTOR', {}),
+                }
+                _executor = BegrenzterExecutor(
+                    worker=einstellungen['WORKER'],
+                    warteschlange=einstellungen['WARTESCHLANGE'],
+                )
+    return _executor
+
+
+def vorhandener_berechnungs_executor():
+    """Executor, falls er bereits angelegt wurde, sonst None"""
+    return _executor
+
+
+@receiver(setting_changed)
+def _einstellungen_geaendert(sender, setting, **kwargs):
+    global _executor
+    if setting == 'BILANZ_BERECHNUNG_EXECUTOR' and _executor is not None:
+        _executor.beenden()
+        _executor = None
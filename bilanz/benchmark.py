@@ -0,0 +1,264 @@
+"""
+Benchmark-Suite für den Rechenkern und die Berechnungs-Endpoints
+
+Jeder Benchmark ist eine Funktion ohne Argumente, die wiederholt
+aufgerufen wird; gemessen wird wie bei timeit die Zeit je Aufruf
+(Minimum und Median über mehrere Wiederholungen). Ergebnisse werden als
+JSON gespeichert und mit einer Baseline verglichen, siehe
+``manage.py benchmark``.
+"""
+import fnmatch
+import functools
+import itertools
+import platform
+import statistics
+import time
+import uuid
+from contextlib import contextmanager
+
+import django
+import numpy as np
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from . import berechnungen
+from .berechnungen import ORIENTIERUNGEN, GebaeudeEingabe, berechne_energiebilanz
+from .berechnungen_batch import berechne_energiebilanz_batch, spalten_aus_datensaetzen
+from .eingaben import STANDARD_KLIMADATEN
+from .klima import klima_register
+from .models import Gebaeude, Ort, Bauteil, PVAnlage, Lueftung, Beleuchtung, Waermequelle
+
+
+BENCHMARK_VERSION = 1
+STANDARD_SCHWELLE = 0.2  # Relative Verlangsamung, ab der eine Regression gemeldet wird
+STANDARD_MIN_ZEIT = 0.2  # Sekunden je Wiederholung
+STANDARD_WIEDERHOLUNGEN = 5
+BATCH_GROESSEN = (1, 10, 100, 1000, 10000, 100000)
+
+# Synthetische Gebäude: Geometrie und Anzahl der Wärmequellen/Beleuchtungsbereiche
+GEBAEUDE_GROESSEN = {
+    'klein': {'laenge_ns': 10, 'breite_ow': 8, 'geschosse': 1, 'waermequellen': 1, 'beleuchtungen': 1},
+    'mittel': {'laenge_ns': 30, 'breite_ow': 15, 'geschosse': 4, 'waermequellen': 10, 'beleuchtungen': 2},
+    'gross': {'laenge_ns': 120, 'breite_ow': 40, 'geschosse': 12, 'waermequellen': 200, 'beleuchtungen': 4},
+}
+
+BAUTEILE = {
+    'wand_nord': 0.28, 'wand_sued': 0.28, 'wand_ost': 0.28, 'wand_west': 0.28,
+    'dach': 0.2, 'bodenplatte': 0.35,
+}
+NUTZUNGSBEREICHE = ('buero', 'verkehr', 'sanitaer', 'wohnen')
+
+
+def synthetisches_gebaeude(groesse):
+    """Argumente für berechne_energiebilanz aus ungespeicherten Modellinstanzen"""
+    daten = GEBAEUDE_GROESSEN[groesse]
+    flaeche = daten['laenge_ns'] * daten['geschosse'] * 2.8 * 0.3
+    gebaeude = GebaeudeEingabe(
+        daten['laenge_ns'], daten['breite_ow'], daten['geschosse'],
+        fensterflaechen=[flaeche] * len(ORIENTIERUNGEN),
+    )
+    pv_anlage = PVAnlage(pv_vor_opak_sued=flaeche / 2)
+    lueftung = Lueftung(typ='mechanisch_wrg', wirkungsgrad_wrg=0.8)
+    beleuchtungen = [Beleuchtung(nutzungsbereich=b) for b in NUTZUNGSBEREICHE[:daten['beleuchtungen']]]
+    waermequellen = [
+        Waermequelle(typ='geraet', name=f'Gerät {i}', anzahl=5, leistung=100)
+        for i in range(daten['waermequellen'])
+    ]
+    return gebaeude, dict(BAUTEILE), pv_anlage, lueftung, beleuchtungen, waermequellen, STANDARD_KLIMADATEN
+
+
+def _funktions_benchmarks():
+    """Je berechne_*-Funktion ein Aufruf für das mittlere Gebäude"""
+    gebaeude, bauteile, pv, lueftung, beleuchtungen, waermequellen, klima = synthetisches_gebaeude('mittel')
+    argumente = {
+        'berechne_transmissionsverlust': (gebaeude, bauteile),
+        'berechne_lueftungswaermeverlust': (gebaeude,),
+        'berechne_heizwaermebedarf': (gebaeude, bauteile, klima),
+        'berechne_solargewinne': (gebaeude, klima),
+        'berechne_interne_gewinne': (gebaeude, waermequellen),
+        'berechne_trinkwarmwasser': (gebaeude,),
+        'berechne_lueftungsenergie': (gebaeude, lueftung),
+        'berechne_beleuchtungsenergie': (gebaeude, beleuchtungen),
+        'berechne_prozessenergie': (gebaeude,),
+        'berechne_pv_ertrag': (gebaeude, pv, klima),
+    }
+    return {
+        f'funktion.{name}': (lambda f=getattr(berechnungen, name), a=args: f(*a))
+        for name, args in argumente.items()
+    }
+
+
+def _bilanz_benchmarks():
+    return {
+        f'energiebilanz.{groesse}': (lambda a=synthetisches_gebaeude(groesse): berechne_energiebilanz(*a))
+        for groesse in GEBAEUDE_GROESSEN
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def _batch_spalten(anzahl, seed=0):
+    """Spalten für ``anzahl`` zufällige Gebäude (reproduzierbar)"""
+    rng = np.random.default_rng(seed)
+    datensaetze = [{
+        'laenge_ns': 30.0, 'breite_ow': 15.0, 'geschosse': 4,
+        **{f'u_wert_{typ}': u for typ, u in BAUTEILE.items()},
+        **{f'fensterflaeche_{o}': 20.0 for o in ORIENTIERUNGEN},
+        **STANDARD_KLIMADATEN,
+    }]
+    spalten = {name: np.repeat(werte, anzahl) for name, werte in spalten_aus_datensaetzen(datensaetze).items()}
+    spalten['laenge_ns'] = rng.uniform(8, 120, anzahl)
+    spalten['breite_ow'] = rng.uniform(8, 40, anzahl)
+    spalten['geschosse'] = rng.integers(1, 12, anzahl).astype(float)
+    spalten['gebaeudeart'] = rng.choice(['buero', 'schule', 'heim'], anzahl).astype(object)
+    return spalten
+
+
+def _batch_benchmarks(groessen):
+    benchmarks = {}
+    for anzahl in groessen:
+        for verfahren in ('jahr', 'monat'):
+            # Spalten werden beim ersten (Aufwärm-)Aufruf aufgebaut
+            benchmarks[f'batch.{verfahren}.{anzahl}'] = (
+                lambda n=anzahl, v=verfahren: berechne_energiebilanz_batch(_batch_spalten(n), v)
+            )
+    return benchmarks
+
+
+def _api_benchmarks(client):
+    """Endpoints über den Test-Client; gebaeude_id wird in api_daten() angelegt"""
+    parameter = {
+        'laenge_ns': 30, 'breite_ow': 15, 'geschosse': 4,
+        'fenster_nord': 20, 'fenster_sued': 20, 'fenster_ost': 20, 'fenster_west': 20,
+        **{f'u_wert_{typ}': u for typ, u in BAUTEILE.items()},
+    }
+    url = reverse('berechnung_api')
+    zaehler = itertools.count()
+
+    def berechnung_ohne_cache():
+        # Jede Anfrage mit anderer Länge, damit der Ergebnis-Cache nie trifft
+        client.get(url, {**parameter, 'laenge_ns': 30 + next(zaehler) * 1e-6})
+
+    benchmarks = {
+        'api.berechnung': berechnung_ohne_cache,
+        'api.berechnung.cache': lambda: client.get(url, parameter),
+        'api.berechnung.auswahl': lambda: client.get(url, {**parameter, 'blocks': 'gebaeudedaten'}),
+    }
+    if getattr(client, 'gebaeude_id', None) is not None:
+        gebaeude_url = reverse('gebaeude_berechnung', args=[client.gebaeude_id])
+        benchmarks['api.gebaeude_berechnung'] = lambda: client.get(gebaeude_url)
+    return benchmarks
+
+
+@contextmanager
+def api_daten(groesse='mittel'):
+    """
+    Legt für die API-Benchmarks einen Ort und ein Gebäude an und rollt sie
+    danach wieder zurück; liefert einen Client mit ``gebaeude_id``
+    """
+    daten = GEBAEUDE_GROESSEN[groesse]
+    client = Client()
+    with transaction.atomic():
+        ort = Ort.objects.create(
+            name=f'Benchmark {uuid.uuid4().hex[:8]}', solarstrahlung_horizontal=1000, **STANDARD_KLIMADATEN,
+        )
+        gebaeude = Gebaeude.objects.create(
+            ort=ort, laenge_ns=daten['laenge_ns'], breite_ow=daten['breite_ow'], geschosse=daten['geschosse'],
+        )
+        Bauteil.objects.bulk_create(Bauteil(gebaeude=gebaeude, typ=t, u_wert=u) for t, u in BAUTEILE.items())
+        Waermequelle.objects.bulk_create(
+            Waermequelle(gebaeude=gebaeude, typ='geraet', name=f'Gerät {i}', anzahl=5, leistung=100)
+            for i in range(daten['waermequellen'])
+        )
+        client.gebaeude_id = gebaeude.id
+        try:
+            yield client
+        finally:
+            transaction.set_rollback(True)
+            klima_register.invalidieren()
+
+
+def benchmarks(client=None, batch_groessen=BATCH_GROESSEN):
+    """Alle Benchmarks als Dict Name -> Funktion"""
+    alle = {**_funktions_benchmarks(), **_bilanz_benchmarks(), **_batch_benchmarks(batch_groessen)}
+    if client is not None:
+        alle.update(_api_benchmarks(client))
+    return alle
+
+
+def auswaehlen(namen, muster):
+    """Namen, die auf eines der fnmatch-Muster passen (alle ohne Muster)"""
+    if not muster:
+        return list(namen)
+    return [name for name in namen if any(fnmatch.fnmatchcase(name, m) for m in muster)]
+
+
+def messen(funktion, min_zeit=STANDARD_MIN_ZEIT, wiederholungen=STANDARD_WIEDERHOLUNGEN):
+    """
+    Misst die Zeit je Aufruf
+
+    Die Anzahl der Aufrufe je Wiederholung wird wie bei timeit.autorange so
+    gewählt, dass eine Wiederholung mindestens ``min_zeit`` dauert.
+    """
+    funktion()  # Aufwärmen (Caches, Lazy-Imports)
+    aufrufe = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(aufrufe):
+            funktion()
+        dauer = time.perf_counter() - start
+        if dauer >= min_zeit:
+            break
+        aufrufe *= 10 if dauer < min_zeit / 10 else 2
+
+    zeiten = [dauer / aufrufe]
+    for _ in range(wiederholungen - 1):
+        start = time.perf_counter()
+        for _ in range(aufrufe):
+            funktion()
+        zeiten.append((time.perf_counter() - start) / aufrufe)
+    return {
+        'min': min(zeiten),
+        'median': statistics.median(zeiten),
+        'aufrufe': aufrufe,
+        'wiederholungen': wiederholungen,
+    }
+
+
+def umgebung():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'numpy': np.__version__,
+        'plattform': platform.platform(),
+        'prozessor': platform.processor() or platform.machine(),
+    }
+
+
+def schwelle_fuer(name, schwelle, schwellen):
+    """Schwelle des ersten passenden Musters aus ``schwellen``, sonst ``schwelle``"""
+    for muster, wert in schwellen.items():
+        if fnmatch.fnmatchcase(name, muster):
+            return wert
+    return schwelle
+
+
+def vergleichen(ergebnisse, baseline, schwelle=STANDARD_SCHWELLE, schwellen=None):
+    """
+    Vergleicht die Minima je Aufruf mit der Baseline
+
+    Gibt je Benchmark ein Dict mit 'name', 'aktuell', 'baseline'
+    (None, wenn nicht in der Baseline), 'aenderung' (relativ) und
+    'regression' zurück.
+    """
+    schwellen = schwellen or {}
+    vergleich = []
+    for name, messung in ergebnisse.items():
+        alt = baseline.get(name)
+        eintrag = {'name': name, 'aktuell': messung['min'], 'baseline': None, 'aenderung': None, 'regression': False}
+        if alt:
+            eintrag['baseline'] = alt['min']
+            eintrag['aenderung'] = messung['min'] / alt['min'] - 1
+            eintrag['regression'] = eintrag['aenderung'] > schwelle_fuer(name, schwelle, schwellen)
+        vergleich.append(eintrag)
+    return vergleich
@@ -2,26 +2,117 @@
 Berechnungsmodul für Energiebilanz
 """
 import math
+import time
 
+from .messung import aktuelle_messung
+from .metriken import dauer_erfassen
+from .protokoll import aktuelles_protokoll
 
-def berechne_heizwaermebedarf(gebaeude, bauteile_dict, klimadaten):
+
+ORIENTIERUNGEN = ['nord', 'sued', 'ost', 'west']
+
+# Schlüssel je Orientierung, einmalig erzeugt statt pro Aufruf
+WAND_TYPEN = tuple(f'wand_{o}' for o in ORIENTIERUNGEN)
+STRAHLUNG_SCHLUESSEL = tuple(f'solarstrahlung_{o}' for o in ORIENTIERUNGEN)
+PV_FELDER = tuple((f'pv_vor_fenster_{o}', f'pv_vor_opak_{o}') for o in ORIENTIERUNGEN)
+
+# Spezifische Kennwerte je Gebäudeart (kWh/m²a)
+TWW_SPEZIFISCH = {
+    'buero': 15,
+    'schule': 5,
+    'heim': 25,
+}
+
+LUEFTUNG_SPEZIFISCH = {
+    'buero': 8,
+    'schule': 6,
+    'heim': 5,
+}
+
+BELEUCHTUNG_SPEZIFISCH = {
+    'buero': 10,
+    'schule': 12,
+    'heim': 8,
+}
+
+PROZESSE_SPEZIFISCH = {
+    'buero': 5,
+    'schule': 2,
+    'heim': 3,
+}
+
+
+class GebaeudeEingabe:
     """
-    Berechnet den Heizwärmebedarf nach vereinfachtem Verfahren
+    Kompakte Gebäudeeingabe für die berechne_*-Funktionen
+
+    Fensterflächen und g-Werte liegen als Tupel in der Reihenfolge von
+    ORIENTIERUNGEN vor, die Geometrie wird beim Anlegen einmal berechnet.
+    """
+    __slots__ = (
+        'laenge_ns', 'breite_ow', 'geschosse', 'geschosshoehe', 'personendichte',
+        'gebaeudeart', 'fensterflaechen', 'g_werte',
+        'hoehe', 'grundflaeche', 'bgf', 'nf', 'volumen',
+    )
+
+    def __init__(self, laenge_ns, breite_ow, geschosse, geschosshoehe=2.8,
+                 personendichte=15, gebaeudeart='buero',
+                 fensterflaechen=(0, 0, 0, 0), g_werte=(0.6, 0.6, 0.6, 0.6)):
+        self.laenge_ns = laenge_ns
+        self.breite_ow = breite_ow
+        self.geschosse = geschosse
+        self.geschosshoehe = geschosshoehe
+        self.personendichte = personendichte
+        self.gebaeudeart = gebaeudeart
+        self.fensterflaechen = tuple(fensterflaechen)
+        self.g_werte = tuple(g_werte)
+
+        # Geometrie wie die Properties von Gebaeude
+        self.hoehe = geschosse * geschosshoehe
+        self.grundflaeche = laenge_ns * breite_ow
+        self.bgf = self.grundflaeche * geschosse
+        self.nf = self.bgf * 0.85
+        self.volumen = self.bgf * geschosshoehe
+
+    @classmethod
+    def aus_gebaeude(cls, gebaeude):
+        """Erzeugt die Eingabe aus einem Gebaeude (oder einem gleich aufgebauten Objekt)"""
+        return cls(
+            gebaeude.laenge_ns,
+            gebaeude.breite_ow,
+            gebaeude.geschosse,
+            gebaeude.geschosshoehe,
+            gebaeude.personendichte,
+            gebaeude.gebaeudeart,
+            fensterflaechen=[getattr(gebaeude, f'fensterflaeche_{o}', 0) for o in ORIENTIERUNGEN],
+            g_werte=[getattr(gebaeude, f'g_wert_{o}', 0.6) for o in ORIENTIERUNGEN],
+        )
+
+
+def als_eingabe(gebaeude):
+    """Gibt eine GebaeudeEingabe zurück, ORM-Objekte werden einmal umgewandelt"""
+    if type(gebaeude) is GebaeudeEingabe:
+        return gebaeude
+    return GebaeudeEingabe.aus_gebaeude(gebaeude)
+
+
+def berechne_transmissionsverlust(gebaeude, bauteile_dict):
+    """
+    Berechnet den Transmissionswärmeverlust-Koeffizienten (W/K)
     """
-    # Transmissionswärmeverluste
+    gebaeude = als_eingabe(gebaeude)
+
     q_t = 0
     
     # Wände
-    for orientierung in ['nord', 'sued', 'ost', 'west']:
-        bauteil_key = f'wand_{orientierung}'
+    for orientierung, bauteil_key, fensterflaeche in zip(
+            ORIENTIERUNGEN, WAND_TYPEN, gebaeude.fensterflaechen):
         if bauteil_key in bauteile_dict:
             u_wert = bauteile_dict[bauteil_key]
             if orientierung == 'nord' or orientierung == 'sued':
                 flaeche = gebaeude.laenge_ns * gebaeude.hoehe
-                fensterflaeche = getattr(gebaeude, f'fensterflaeche_{orientierung}', 0)
             else:  # ost/west
                 flaeche = gebaeude.breite_ow * gebaeude.hoehe
-                fensterflaeche = getattr(gebaeude, f'fensterflaeche_{orientierung}', 0)
             
             # Opake Fläche = Gesamtfläche - Fensterfläche
             opake_flaeche = max(0, flaeche - fensterflaeche)
@@ -41,16 +132,26 @@ def berechne_heizwaermebedarf(gebaeude, bauteile_dict, klimadaten):
     
     # Fenster (U-Wert 1.3 W/m²K angenommen)
     u_fenster = 1.3
-    for orientierung in ['nord', 'sued', 'ost', 'west']:
-        fensterflaeche = getattr(gebaeude, f'fensterflaeche_{orientierung}', 0)
+    for fensterflaeche in gebaeude.fensterflaechen:
         q_t += u_fenster * fensterflaeche
     
-    # Lüftungswärmeverluste (vereinfacht)
+    return q_t
+
+
+def berechne_lueftungswaermeverlust(gebaeude):
+    """
+    Berechnet den Lüftungswärmeverlust-Koeffizienten (W/K, vereinfacht)
+    """
     luftwechsel = 0.5  # 1/h
     rho_luft = 1.2  # kg/m³
     c_luft = 1000  # J/kgK
-    q_v = luftwechsel * gebaeude.volumen * rho_luft * c_luft / 3600  # W/K
-    
+    return luftwechsel * gebaeude.volumen * rho_luft * c_luft / 3600  # W/K
+
+
+def heizwaermebedarf_aus_verlusten(q_t, q_v, klimadaten):
+    """
+    Heizwärmebedarf (kWh/a) aus Transmissions- und Lüftungswärmeverlust
+    """
     # Gesamtwärmeverlust
     q_gesamt = q_t + q_v
     
@@ -63,16 +164,28 @@ def berechne_heizwaermebedarf(gebaeude, bauteile_dict, klimadaten):
     return max(0, heizwaermebedarf)
 
 
+def berechne_heizwaermebedarf(gebaeude, bauteile_dict, klimadaten):
+    """
+    Berechnet den Heizwärmebedarf nach vereinfachtem Verfahren
+    """
+    gebaeude = als_eingabe(gebaeude)
+    return heizwaermebedarf_aus_verlusten(
+        berechne_transmissionsverlust(gebaeude, bauteile_dict),
+        berechne_lueftungswaermeverlust(gebaeude),
+        klimadaten,
+    )
+
+
 def berechne_solargewinne(gebaeude, klimadaten):
     """
     Berechnet solare Gewinne durch Fenster
     """
+    gebaeude = als_eingabe(gebaeude)
     solargewinne = 0
     
-    for orientierung in ['nord', 'sued', 'ost', 'west']:
-        fensterflaeche = getattr(gebaeude, f'fensterflaeche_{orientierung}', 0)
-        g_wert = getattr(gebaeude, f'g_wert_{orientierung}', 0.6)
-        strahlung = klimadaten.get(f'solarstrahlung_{orientierung}', 0)
+    for fensterflaeche, g_wert, schluessel in zip(
+            gebaeude.fensterflaechen, gebaeude.g_werte, STRAHLUNG_SCHLUESSEL):
+        strahlung = klimadaten.get(schluessel, 0)
         
         solargewinne += fensterflaeche * g_wert * strahlung * 0.7  # Reduktionsfaktor
     
@@ -103,14 +216,7 @@ def berechne_trinkwarmwasser(gebaeude):
     """
     Berechnet Trinkwarmwasserbedarf basierend auf Gebäudeart
     """
-    # Spezifische Werte je Gebäudeart (kWh/m²a)
-    tww_spezifisch = {
-        'buero': 15,
-        'schule': 5,
-        'heim': 25,
-    }
-    
-    spez_bedarf = tww_spezifisch.get(gebaeude.gebaeudeart, 15)
+    spez_bedarf = TWW_SPEZIFISCH.get(gebaeude.gebaeudeart, 15)
     return gebaeude.nf * spez_bedarf
 
 
@@ -122,13 +228,7 @@ def berechne_lueftungsenergie(gebaeude, lueftung_data):
         return 0
     
     # Vereinfachte Berechnung
-    spez_bedarf = {
-        'buero': 8,
-        'schule': 6,
-        'heim': 5,
-    }
-    
-    lwt_spezifisch = spez_bedarf.get(gebaeude.gebaeudeart, 8)
+    lwt_spezifisch = LUEFTUNG_SPEZIFISCH.get(gebaeude.gebaeudeart, 8)
     return gebaeude.nf * lwt_spezifisch
 
 
@@ -138,12 +238,7 @@ def berechne_beleuchtungsenergie(gebaeude, beleuchtungen):
     """
     if not beleuchtungen:
         # Fallback basierend auf Gebäudeart
-        spez_bedarf = {
-            'buero': 10,
-            'schule': 12,
-            'heim': 8,
-        }
-        bel_spezifisch = spez_bedarf.get(gebaeude.gebaeudeart, 10)
+        bel_spezifisch = BELEUCHTUNG_SPEZIFISCH.get(gebaeude.gebaeudeart, 10)
         return gebaeude.nf * bel_spezifisch
     
     # Detaillierte Berechnung basierend auf Eingaben
@@ -165,13 +260,7 @@ def berechne_prozessenergie(gebaeude):
     """
     Berechnet Prozessenergiebedarf
     """
-    spez_bedarf = {
-        'buero': 5,
-        'schule': 2,
-        'heim': 3,
-    }
-    
-    nutzer_spezifisch = spez_bedarf.get(gebaeude.gebaeudeart, 5)
+    nutzer_spezifisch = PROZESSE_SPEZIFISCH.get(gebaeude.gebaeudeart, 5)
     return gebaeude.nf * nutzer_spezifisch
 
 
@@ -184,44 +273,88 @@ def berechne_pv_ertrag(gebaeude, pv_anlage, klimadaten):
     
     pv_ertrag = 0
     
-    for orientierung in ['nord', 'sued', 'ost', 'west']:
+    for (feld_fenster, feld_opak), schluessel in zip(PV_FELDER, STRAHLUNG_SCHLUESSEL):
         # PV vor Fenstern
-        pv_fenster = getattr(pv_anlage, f'pv_vor_fenster_{orientierung}', 0)
+        pv_fenster = getattr(pv_anlage, feld_fenster, 0)
         # PV vor opaken Flächen
-        pv_opak = getattr(pv_anlage, f'pv_vor_opak_{orientierung}', 0)
+        pv_opak = getattr(pv_anlage, feld_opak, 0)
         
         pv_gesamt = pv_fenster + pv_opak
-        strahlung = klimadaten.get(f'solarstrahlung_{orientierung}', 0)
+        strahlung = klimadaten.get(schluessel, 0)
         
         pv_ertrag += pv_gesamt * strahlung * pv_anlage.wirkungsgrad
     
     return pv_ertrag
 
 
+@dauer_erfassen('einzeln')
 def berechne_energiebilanz(gebaeude_data, bauteile_data, pv_data, lueftung_data, 
                           beleuchtungen_data, waermequellen_data, klimadaten):
     """
     Hauptfunktion für die Energiebilanzberechnung
     """
+    gebaeude_data = als_eingabe(gebaeude_data)
+
+    protokoll = aktuelles_protokoll()
+    if protokoll is not None:
+        # Protokoll (Trace): alle Terme einzeln mit Zwischenwerten
+        return _energiebilanz_protokolliert(protokoll, {
+            'gebaeude': gebaeude_data,
+            'bauteile': bauteile_data,
+            'pv': pv_data,
+            'lueftung': lueftung_data,
+            'beleuchtungen': beleuchtungen_data,
+            'waermequellen': waermequellen_data,
+            'klimadaten': klimadaten,
+        })
+
+    aufrufe = {
+        'heizwaermebedarf': (berechne_heizwaermebedarf, (gebaeude_data, bauteile_data, klimadaten)),
+        'trinkwarmwasser': (berechne_trinkwarmwasser, (gebaeude_data,)),
+        'solargewinne': (berechne_solargewinne, (gebaeude_data, klimadaten)),
+        'interne_gewinne': (berechne_interne_gewinne, (gebaeude_data, waermequellen_data)),
+        'lueftungsenergie': (berechne_lueftungsenergie, (gebaeude_data, lueftung_data)),
+        'beleuchtungsenergie': (berechne_beleuchtungsenergie, (gebaeude_data, beleuchtungen_data)),
+        'prozessenergie': (berechne_prozessenergie, (gebaeude_data,)),
+        'pv_ertrag': (berechne_pv_ertrag, (gebaeude_data, pv_data, klimadaten)),
+    }
+    messung = aktuelle_messung()
+    if messung is None:
+        terme = {name: funktion(*args) for name, (funktion, args) in aufrufe.items()}
+    else:
+        # Laufende Request-Messung: Zeit je berechne_*-Funktion erfassen
+        terme = {name: messung.aufruf(funktion, *args) for name, (funktion, args) in aufrufe.items()}
+    return energiebilanz_aus_termen(gebaeude_data, terme)
+
+
+def energiebilanz_aus_termen(gebaeude_data, terme, zwischenwerte=None):
+    """
+    Fasst die einzelnen Bilanzterme zu Nutz-, End- und Primärenergie,
+    PV und GWP zusammen
+
+    Ist ``zwischenwerte`` ein Dict, werden die ungerundeten Zwischenwerte
+    darin abgelegt (für das Protokoll).
+    """
     # Nutzenergiebedarf
-    ne_heizung = berechne_heizwaermebedarf(gebaeude_data, bauteile_data, klimadaten)
-    ne_tww = berechne_trinkwarmwasser(gebaeude_data)
+    ne_heizung = terme['heizwaermebedarf']
+    ne_tww = terme['trinkwarmwasser']
     
     # Solare und interne Gewinne
-    solargewinne = berechne_solargewinne(gebaeude_data, klimadaten)
-    interne_gewinne = berechne_interne_gewinne(gebaeude_data, waermequellen_data)
+    solargewinne = terme['solargewinne']
+    interne_gewinne = terme['interne_gewinne']
     
     # Heizwärmebedarf reduzieren um Gewinne
-    ne_heizung = max(0, ne_heizung - (solargewinne + interne_gewinne) * 0.7)
+    gewinn_abzug = (solargewinne + interne_gewinne) * 0.7
+    ne_heizung = max(0, ne_heizung - gewinn_abzug)
     
     ne_gesamt = ne_heizung + ne_tww
     
     # Endenergiebedarf (vereinfacht mit Anlagenwirkungsgrad 0.9)
     ee_heizung = ne_heizung / 0.9
     ee_tww = ne_tww / 0.9
-    ee_lueftung = berechne_lueftungsenergie(gebaeude_data, lueftung_data)
-    ee_beleuchtung = berechne_beleuchtungsenergie(gebaeude_data, beleuchtungen_data)
-    ee_prozesse = berechne_prozessenergie(gebaeude_data)
+    ee_lueftung = terme['lueftungsenergie']
+    ee_beleuchtung = terme['beleuchtungsenergie']
+    ee_prozesse = terme['prozessenergie']
     
     ee_gesamt = ee_heizung + ee_tww + ee_lueftung + ee_beleuchtung + ee_prozesse
     
@@ -229,13 +362,20 @@ def berechne_energiebilanz(gebaeude_data, bauteile_data, pv_data, lueftung_data,
     pe_gesamt = (ee_heizung + ee_tww) * 1.1 + (ee_lueftung + ee_beleuchtung + ee_prozesse) * 1.8
     
     # PV-Ertrag
-    pv_ertrag = berechne_pv_ertrag(gebaeude_data, pv_data, klimadaten)
+    pv_ertrag = terme['pv_ertrag']
     strom_ueberschuss = max(0, pv_ertrag - (ee_lueftung + ee_beleuchtung + ee_prozesse))
     
     # GWP (vereinfacht)
     gwp_var1 = ee_gesamt * 0.5  # kg CO2-eq/a
     gwp_var2 = ee_gesamt * 0.3  # kg CO2-eq/a
     
+    if zwischenwerte is not None:
+        zwischenwerte.update(
+            gewinn_abzug=gewinn_abzug, ne_heizung=ne_heizung, ne_gesamt=ne_gesamt,
+            ee_heizung=ee_heizung, ee_tww=ee_tww, ee_gesamt=ee_gesamt, pe_gesamt=pe_gesamt,
+            strom_ueberschuss=strom_ueberschuss, gwp_var1=gwp_var1, gwp_var2=gwp_var2,
+        )
+    
     return {
         'nutzenergie': {
             'ne_heizung': round(ne_heizung, 1),
@@ -271,4 +411,325 @@ def berechne_energiebilanz(gebaeude_data, bauteile_data, pv_data, lueftung_data,
             'nf': round(gebaeude_data.nf, 1),
             'volumen': round(gebaeude_data.volumen, 1),
         }
-    }
\ No newline at end of file
+    }
+
+# Inkrementelle Berechnung über einzeln zwischengespeicherte Bilanzterme
+#
+# Jede Eingabegruppe liefert einen hashbaren Schlüssel aus den Eingaben
+# (gebaeude ist eine GebaeudeEingabe). Ein Term hängt von Eingabegruppen
+# und vorgelagerten Termen ab; sein Cache-Schlüssel enthält die Schlüssel
+# der Gruppen und die Werte der vorgelagerten Terme.
+
+EINGABE_GRUPPEN = {
+    'geometrie': lambda e: (
+        e['gebaeude'].laenge_ns, e['gebaeude'].breite_ow,
+        e['gebaeude'].geschosse, e['gebaeude'].geschosshoehe,
+    ),
+    'fenster': lambda e: e['gebaeude'].fensterflaechen,
+    'g_werte': lambda e: e['gebaeude'].g_werte,
+    'gebaeudeart': lambda e: e['gebaeude'].gebaeudeart,
+    'personendichte': lambda e: e['gebaeude'].personendichte,
+    'bauteile': lambda e: tuple(sorted(e['bauteile'].items())),
+    'heizgradtage': lambda e: e['klimadaten'].get('heizgradtage', 3500),
+    'strahlung': lambda e: tuple(e['klimadaten'].get(k, 0) for k in STRAHLUNG_SCHLUESSEL),
+    'pv': lambda e: None if not e['pv'] else (
+        tuple(getattr(e['pv'], feld, 0) for felder in PV_FELDER for feld in felder)
+        + (e['pv'].wirkungsgrad,)
+    ),
+    'lueftung': lambda e: bool(e['lueftung']),
+    'beleuchtungen': lambda e: tuple(
+        (b.laufzeit_h_d, b.laufzeit_d_a) for b in e['beleuchtungen'] or ()
+    ),
+    'waermequellen': lambda e: tuple(
+        (q.anzahl, q.leistung, q.betrieb_h_d, q.betrieb_d_a) for q in e['waermequellen']
+    ),
+}
+
+# Term -> (Eingabegruppen, vorgelagerte Terme, Berechnung); in Berechnungsreihenfolge
+BILANZ_TERME = {
+    'transmissionsverlust': (
+        ('geometrie', 'fenster', 'bauteile'), (),
+        lambda e, w: berechne_transmissionsverlust(e['gebaeude'], e['bauteile']),
+    ),
+    'lueftungswaermeverlust': (
+        ('geometrie',), (),
+        lambda e, w: berechne_lueftungswaermeverlust(e['gebaeude']),
+    ),
+    'heizwaermebedarf': (
+        ('heizgradtage',), ('transmissionsverlust', 'lueftungswaermeverlust'),
+        lambda e, w: heizwaermebedarf_aus_verlusten(
+            w['transmissionsverlust'], w['lueftungswaermeverlust'], e['klimadaten'],
+        ),
+    ),
+    'solargewinne': (
+        ('fenster', 'g_werte', 'strahlung'), (),
+        lambda e, w: berechne_solargewinne(e['gebaeude'], e['klimadaten']),
+    ),
+    'interne_gewinne': (
+        ('geometrie', 'personendichte', 'waermequellen'), (),
+        lambda e, w: berechne_interne_gewinne(e['gebaeude'], e['waermequellen']),
+    ),
+    'trinkwarmwasser': (
+        ('geometrie', 'gebaeudeart'), (),
+        lambda e, w: berechne_trinkwarmwasser(e['gebaeude']),
+    ),
+    'lueftungsenergie': (
+        ('geometrie', 'gebaeudeart', 'lueftung'), (),
+        lambda e, w: berechne_lueftungsenergie(e['gebaeude'], e['lueftung']),
+    ),
+    'beleuchtungsenergie': (
+        ('geometrie', 'gebaeudeart', 'beleuchtungen'), (),
+        lambda e, w: berechne_beleuchtungsenergie(e['gebaeude'], e['beleuchtungen']),
+    ),
+    'prozessenergie': (
+        ('geometrie', 'gebaeudeart'), (),
+        lambda e, w: berechne_prozessenergie(e['gebaeude']),
+    ),
+    'pv_ertrag': (
+        ('pv', 'strahlung'), (),
+        lambda e, w: berechne_pv_ertrag(e['gebaeude'], e['pv'], e['klimadaten']),
+    ),
+    'energiebilanz': (
+        ('geometrie',), (
+            'heizwaermebedarf', 'trinkwarmwasser', 'solargewinne', 'interne_gewinne',
+            'lueftungsenergie', 'beleuchtungsenergie', 'prozessenergie', 'pv_ertrag',
+        ),
+        lambda e, w: energiebilanz_aus_termen(e['gebaeude'], w),
+    ),
+}
+
+
+def _term_berechnen(messung, name, eingaben, werte):
+    """Wertet einen Term aus BILANZ_TERME aus, bei laufender Request-Messung mit Zeit"""
+    berechnung = BILANZ_TERME[name][2]
+    if messung is None:
+        return berechnung(eingaben, werte)
+    return messung.aufruf(berechnung, eingaben, werte, name=f'berechne_{name}')
+
+
+def _cache_lesen(messung, cache, schluessel):
+    """Term aus dem Cache, bei laufender Request-Messung als Treffer bzw. Fehlschlag erfasst"""
+    if messung is None:
+        return cache.get(schluessel)
+    start = time.perf_counter()
+    wert = cache.get(schluessel)
+    messung.hinzufuegen(
+        'term_cache_treffer' if wert is not None else 'term_cache_fehlschlag',
+        time.perf_counter() - start,
+    )
+    return wert
+
+
+@dauer_erfassen('inkrementell')
+def berechne_energiebilanz_inkrementell(gebaeude_data, bauteile_data, pv_data, lueftung_data,
+                                       beleuchtungen_data, waermequellen_data, klimadaten,
+                                       cache=None):
+    """
+    Energiebilanz über einzeln zwischengespeicherte Bilanzterme
+
+    ``cache`` ist ein Objekt mit ``get(schluessel)`` und
+    ``set(schluessel, wert)`` (z.B. ErgebnisCache). Ein Term wird nur neu
+    berechnet, wenn sich seine Eingaben oder die Werte der vorgelagerten
+    Terme geändert haben. Rückgabe: (Werte aller Terme, Namen der neu
+    berechneten Terme); das Ergebnis von berechne_energiebilanz steht
+    unter 'energiebilanz'.
+    """
+    eingaben = {
+        'gebaeude': als_eingabe(gebaeude_data),
+        'bauteile': bauteile_data,
+        'pv': pv_data,
+        'lueftung': lueftung_data,
+        'beleuchtungen': beleuchtungen_data,
+        'waermequellen': waermequellen_data,
+        'klimadaten': klimadaten,
+    }
+    gruppen = {}
+    werte = {}
+    neu_berechnet = []
+    messung = aktuelle_messung()
+
+    for name, (eingabe_gruppen, vorgelagert, _) in BILANZ_TERME.items():
+        for gruppe in eingabe_gruppen:
+            if gruppe not in gruppen:
+                gruppen[gruppe] = EINGABE_GRUPPEN[gruppe](eingaben)
+        schluessel = (
+            name,
+            tuple(gruppen[g] for g in eingabe_gruppen),
+            tuple(werte[t] for t in vorgelagert),
+        )
+        wert = _cache_lesen(messung, cache, schluessel) if cache is not None else None
+        if wert is None:
+            wert = _term_berechnen(messung, name, eingaben, {t: werte[t] for t in vorgelagert})
+            neu_berechnet.append(name)
+            if cache is not None:
+                cache.set(schluessel, wert)
+        werte[name] = wert
+
+    return werte, neu_berechnet
+
+
+def _energiebilanz_protokolliert(protokoll, eingaben):
+    """
+    berechne_energiebilanz über BILANZ_TERME mit Wert und Laufzeit je Term
+
+    Legt den Baum der Berechnung im Protokoll ab (siehe protokoll.py) und
+    gibt dasselbe Ergebnis wie berechne_energiebilanz zurück.
+    """
+    start = time.perf_counter()
+    werte = {}
+    knoten = {}
+    for name, (_, vorgelagert, berechnung) in BILANZ_TERME.items():
+        if name == 'energiebilanz':
+            continue
+        term_start = time.perf_counter()
+        werte[name] = berechnung(eingaben, werte)
+        kinder = [knoten[t] for t in vorgelagert]
+        knoten[name] = {
+            'name': f'berechne_{name}',
+            'wert': werte[name],
+            'dauer_ms': (time.perf_counter() - term_start) * 1000 + sum(k['dauer_ms'] for k in kinder),
+            'kinder': kinder,
+        }
+
+    zwischenwerte = {}
+    ergebnis = energiebilanz_aus_termen(eingaben['gebaeude'], werte, zwischenwerte)
+    protokoll.hinzufuegen({
+        'name': 'berechne_energiebilanz',
+        'wert': zwischenwerte,
+        'dauer_ms': (time.perf_counter() - start) * 1000,
+        'kinder': [knoten[t] for t in BILANZ_TERME['energiebilanz'][1]],
+    })
+    return ergebnis
+
+
+# Auswahl einzelner Ergebnisblöcke und -felder
+#
+# FELD_TERME ordnet jedem Ergebnisfeld die Bilanzterme zu, aus denen es
+# berechnet wird. Für eine Auswahl werden nur diese Terme (samt ihrer
+# vorgelagerten Terme aus BILANZ_TERME) ausgewertet.
+
+ERGEBNIS_BLOECKE = {
+    'nutzenergie': ('ne_heizung', 'ne_tww', 'ne_gesamt', 'ne_spezifisch'),
+    'endenergie': (
+        'ee_heizung', 'ee_tww', 'ee_lueftung', 'ee_beleuchtung', 'ee_prozesse',
+        'ee_gesamt', 'ee_spezifisch',
+    ),
+    'primaerenergie': ('pe_gesamt', 'pe_spezifisch'),
+    'pv': ('pv_ertrag', 'strom_ueberschuss'),
+    'gwp': ('gwp_var1', 'gwp_var2'),
+    'gebaeudedaten': ('hoehe', 'grundflaeche', 'bgf', 'nf', 'volumen'),
+}
+
+_HEIZUNG = ('heizwaermebedarf', 'solargewinne', 'interne_gewinne')
+_NUTZENERGIE = _HEIZUNG + ('trinkwarmwasser',)
+_STROM = ('lueftungsenergie', 'beleuchtungsenergie', 'prozessenergie')
+_ENDENERGIE = _NUTZENERGIE + _STROM
+
+FELD_TERME = {
+    'ne_heizung': _HEIZUNG,
+    'ne_tww': ('trinkwarmwasser',),
+    'ne_gesamt': _NUTZENERGIE,
+    'ne_spezifisch': _NUTZENERGIE,
+    'ee_heizung': _HEIZUNG,
+    'ee_tww': ('trinkwarmwasser',),
+    'ee_lueftung': ('lueftungsenergie',),
+    'ee_beleuchtung': ('beleuchtungsenergie',),
+    'ee_prozesse': ('prozessenergie',),
+    'ee_gesamt': _ENDENERGIE,
+    'ee_spezifisch': _ENDENERGIE,
+    'pe_gesamt': _ENDENERGIE,
+    'pe_spezifisch': _ENDENERGIE,
+    'pv_ertrag': ('pv_ertrag',),
+    'strom_ueberschuss': ('pv_ertrag',) + _STROM,
+    'gwp_var1': _ENDENERGIE,
+    'gwp_var2': _ENDENERGIE,
+    'hoehe': (),
+    'grundflaeche': (),
+    'bgf': (),
+    'nf': (),
+    'volumen': (),
+}
+
+KLIMA_GRUPPEN = ('heizgradtage', 'strahlung')
+
+
+def ergebnis_auswahl(bloecke=(), felder=()):
+    """
+    Auswahl aus Blocknamen und Feldnamen: Dict Block -> Felder
+
+    Ohne Angaben werden alle Blöcke ausgewählt. Unbekannte Namen lösen
+    einen ValueError aus.
+    """
+    if not bloecke and not felder:
+        return dict(ERGEBNIS_BLOECKE)
+
+    gewaehlt = set(felder)
+    for block in bloecke:
+        if block not in ERGEBNIS_BLOECKE:
+            raise ValueError(f'Unbekannter Ergebnisblock "{block}"')
+        gewaehlt.update(ERGEBNIS_BLOECKE[block])
+    unbekannt = gewaehlt - FELD_TERME.keys()
+    if unbekannt:
+        raise ValueError(f'Unbekannte Ergebnisfelder: {", ".join(sorted(unbekannt))}')
+
+    auswahl = {}
+    for block, block_felder in ERGEBNIS_BLOECKE.items():
+        block_auswahl = tuple(f for f in block_felder if f in gewaehlt)
+        if block_auswahl:
+            auswahl[block] = block_auswahl
+    return auswahl
+
+
+def benoetigte_terme(auswahl):
+    """Alle Bilanzterme (inkl. vorgelagerter) für eine Auswahl, in Berechnungsreihenfolge"""
+    offen = [t for felder in auswahl.values() for f in felder for t in FELD_TERME[f]]
+    terme = set()
+    while offen:
+        term = offen.pop()
+        if term not in terme:
+            terme.add(term)
+            offen.extend(BILANZ_TERME[term][1])
+    return [name for name in BILANZ_TERME if name in terme]
+
+
+def benoetigt_klimadaten(terme):
+    """True, wenn einer der Terme Klimadaten verwendet"""
+    return any(
+        gruppe in KLIMA_GRUPPEN for term in terme for gruppe in BILANZ_TERME[term][0]
+    )
+
+
+def auswahl_aus_ergebnis(ergebnis, auswahl):
+    """Schneidet ein vollständiges Ergebnis auf die Auswahl zu"""
+    return {
+        block: {feld: ergebnis[block][feld] for feld in felder}
+        for block, felder in auswahl.items()
+    }
+
+
+@dauer_erfassen('auswahl')
+def berechne_energiebilanz_auswahl(auswahl, gebaeude_data, bauteile_data, pv_data,
+                                   lueftung_data, beleuchtungen_data, waermequellen_data,
+                                   klimadaten):
+    """
+    Berechnet nur die ausgewählten Ergebnisfelder (siehe ergebnis_auswahl)
+
+    Es werden nur die benötigten Bilanzterme ausgewertet; ``klimadaten``
+    darf None sein, wenn keiner davon Klimadaten braucht.
+    """
+    eingaben = {
+        'gebaeude': als_eingabe(gebaeude_data),
+        'bauteile': bauteile_data,
+        'pv': pv_data,
+        'lueftung': lueftung_data,
+        'beleuchtungen': beleuchtungen_data,
+        'waermequellen': waermequellen_data,
+        'klimadaten': klimadaten,
+    }
+    # Nicht benötigte Terme fließen nur in nicht ausgewählte Felder ein
+    werte = dict.fromkeys(BILANZ_TERME, math.nan)
+    messung = aktuelle_messung()
+    for name in benoetigte_terme(auswahl):
+        werte[name] = _term_berechnen(messung, name, eingaben, werte)
+
+    return auswahl_aus_ergebnis(energiebilanz_aus_termen(eingaben['gebaeude'], werte), auswahl)
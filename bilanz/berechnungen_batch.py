@@ -0,0 +1,512 @@
+"""
+Vektorisierte Energiebilanz für ganze Gebäudebestände
+
+Die Funktionen arbeiten auf Spalten (ein Array-Eintrag je Gebäude) und
+rechnen dieselben Formeln wie ``berechnungen.py``, nur für alle Gebäude
+gleichzeitig. Fehlende U-Werte werden als NaN übergeben und zählen wie
+ein fehlendes Bauteil in der Einzelberechnung.
+"""
+import numpy as np
+
+from .berechnungen import (
+    ORIENTIERUNGEN, als_eingabe, TWW_SPEZIFISCH, LUEFTUNG_SPEZIFISCH,
+    BELEUCHTUNG_SPEZIFISCH, PROZESSE_SPEZIFISCH,
+)
+from .metriken import BATCH_GROESSE, dauer_erfassen
+
+
+BAUTEIL_TYPEN = ['wand_nord', 'wand_sued', 'wand_ost', 'wand_west', 'dach', 'bodenplatte']
+
+# Standardwerte für Spalten, die in einem Datensatz fehlen dürfen
+SPALTEN_STANDARD = {
+    'geschosshoehe': 2.8,
+    'personendichte': 15.0,
+    'gebaeudeart': 'buero',
+    **{f'fensterflaeche_{o}': 0.0 for o in ORIENTIERUNGEN},
+    **{f'g_wert_{o}': 0.6 for o in ORIENTIERUNGEN},
+    **{f'u_wert_{typ}': np.nan for typ in BAUTEIL_TYPEN},
+    'heizgradtage': 3500.0,
+    'temperatur_mittel': 9.1,
+    **{f'solarstrahlung_{o}': 0.0 for o in ORIENTIERUNGEN},
+    **{f'pv_vor_fenster_{o}': 0.0 for o in ORIENTIERUNGEN},
+    **{f'pv_vor_opak_{o}': 0.0 for o in ORIENTIERUNGEN},
+    'pv_wirkungsgrad': 0.0,
+    'lueftung': False,
+    'beleuchtung_h_a': np.nan,
+    'waermequellen_kwh': 0.0,
+}
+
+PFLICHT_SPALTEN = ['laenge_ns', 'breite_ow', 'geschosse']
+
+VERFAHREN = ['jahr', 'monat']
+
+# Monatsbilanz: Kalender, Referenzklima und Gebäudekennwerte
+TAGE_JE_MONAT = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype=float)
+
+# Monatsmitteltemperaturen des Referenzklimas (°C), werden auf die
+# Jahresmitteltemperatur des Orts verschoben
+TEMPERATUR_REFERENZ = np.array([-1.3, 0.6, 4.1, 9.5, 12.9, 15.7, 18.0, 18.3, 14.4, 9.1, 4.7, 1.3])
+
+# Monatliche Anteile an der Jahressumme der Solarstrahlung je Orientierung
+_STRAHLUNG_REFERENZ = {
+    'nord': [9, 15, 25, 36, 50, 56, 55, 44, 30, 19, 10, 7],
+    'sued': [31, 46, 71, 85, 93, 86, 94, 98, 82, 63, 35, 24],
+    'ost': [14, 26, 48, 71, 89, 90, 96, 83, 58, 35, 16, 10],
+    'west': [14, 26, 48, 71, 89, 90, 96, 83, 58, 35, 16, 10],
+}
+STRAHLUNG_ANTEILE = {
+    orientierung: np.array(werte, dtype=float) / sum(werte)
+    for orientierung, werte in _STRAHLUNG_REFERENZ.items()
+}
+# Zeilen: Strahlungsprofile je Orientierung, zuletzt Verteilung nach Tagen (intern)
+_GEWINN_PROFILMATRIX = np.array(
+    [STRAHLUNG_ANTEILE[o] for o in ORIENTIERUNGEN] + [TAGE_JE_MONAT / 365]
+)
+
+RAUM_SOLLTEMPERATUR = 20.0  # °C
+WAERMESPEICHERFAEHIGKEIT = 50.0  # Wh/(m²K) bezogen auf die Nutzfläche
+MONATSBILANZ_BLOCKGROESSE = 8192
+
+
+def datensatz_aus_objekten(gebaeude, bauteile_dict, pv_anlage, lueftung_data,
+                           beleuchtungen, waermequellen, klimadaten):
+    """
+    Wandelt die Argumente von ``berechne_energiebilanz`` in einen Datensatz
+    mit Spaltennamen um
+    """
+    gebaeude = als_eingabe(gebaeude)
+    datensatz = {
+        'laenge_ns': gebaeude.laenge_ns,
+        'breite_ow': gebaeude.breite_ow,
+        'geschosse': gebaeude.geschosse,
+        'geschosshoehe': gebaeude.geschosshoehe,
+        'personendichte': gebaeude.personendichte,
+        'gebaeudeart': gebaeude.gebaeudeart,
+        'heizgradtage': klimadaten.get('heizgradtage', 3500),
+        'temperatur_mittel': klimadaten.get('temperatur_mittel', SPALTEN_STANDARD['temperatur_mittel']),
+        'lueftung': bool(lueftung_data),
+    }
+
+    for i, orientierung in enumerate(ORIENTIERUNGEN):
+        datensatz[f'fensterflaeche_{orientierung}'] = gebaeude.fensterflaechen[i]
+        datensatz[f'g_wert_{orientierung}'] = gebaeude.g_werte[i]
+        datensatz[f'solarstrahlung_{orientierung}'] = klimadaten.get(f'solarstrahlung_{orientierung}', 0)
+
+    for typ in BAUTEIL_TYPEN:
+        if typ in bauteile_dict:
+            datensatz[f'u_wert_{typ}'] = bauteile_dict[typ]
+
+    if pv_anlage:
+        for orientierung in ORIENTIERUNGEN:
+            datensatz[f'pv_vor_fenster_{orientierung}'] = getattr(pv_anlage, f'pv_vor_fenster_{orientierung}', 0)
+            datensatz[f'pv_vor_opak_{orientierung}'] = getattr(pv_anlage, f'pv_vor_opak_{orientierung}', 0)
+        datensatz['pv_wirkungsgrad'] = pv_anlage.wirkungsgrad
+
+    if beleuchtungen:
+        datensatz['beleuchtung_h_a'] = sum(b.laufzeit_h_d * b.laufzeit_d_a for b in beleuchtungen)
+
+    datensatz['waermequellen_kwh'] = sum(
+        q.anzahl * q.leistung * q.betrieb_h_d * q.betrieb_d_a / 1000 for q in waermequellen
+    )
+
+    return datensatz
+
+
+def spalten_aus_datensaetzen(datensaetze):
+    """
+    Baut aus einer Liste von Datensätzen (dicts) die Spalten-Arrays auf
+    """
+    spalten = {}
+    for name in PFLICHT_SPALTEN:
+        spalten[name] = np.array([d[name] for d in datensaetze], dtype=float)
+
+    for name, standard in SPALTEN_STANDARD.items():
+        werte = [d.get(name, standard) for d in datensaetze]
+        if name == 'gebaeudeart':
+            spalten[name] = np.array(werte, dtype=object)
+        elif name == 'lueftung':
+            spalten[name] = np.array(werte, dtype=bool)
+        else:
+            spalten[name] = np.array(werte, dtype=float)
+
+    return spalten
+
+
+def _spalte(spalten, name, anzahl):
+    """Liefert eine Spalte als float-Array oder den Standardwert je Gebäude"""
+    if name in spalten:
+        return np.asarray(spalten[name], dtype=float)
+    return np.full(anzahl, SPALTEN_STANDARD[name], dtype=float)
+
+
+def _gebaeudearten_index(gebaeudearten):
+    """Zerlegt die Gebäudearten in die vorkommenden Arten und einen Index je Gebäude"""
+    arten, index = np.unique(np.asarray(gebaeudearten).astype(str), return_inverse=True)
+    return arten, index
+
+
+def _kennwert(tabelle, arten_index, standard):
+    """Schlägt einen spezifischen Kennwert je Gebäudeart nach"""
+    arten, index = arten_index
+    werte = np.array([tabelle.get(art, standard) for art in arten], dtype=float)
+    return werte[index]
+
+
+def geometrie_batch(spalten):
+    """
+    Berechnet die abgeleiteten Geometriegrößen wie die Properties von Gebaeude
+    """
+    laenge_ns = np.asarray(spalten['laenge_ns'], dtype=float)
+    breite_ow = np.asarray(spalten['breite_ow'], dtype=float)
+    geschosse = np.asarray(spalten['geschosse'], dtype=float)
+    geschosshoehe = _spalte(spalten, 'geschosshoehe', len(laenge_ns))
+
+    hoehe = geschosse * geschosshoehe
+    grundflaeche = laenge_ns * breite_ow
+    bgf = grundflaeche * geschosse
+    nf = bgf * 0.85
+    volumen = bgf * geschosshoehe
+
+    return {
+        'hoehe': hoehe,
+        'grundflaeche': grundflaeche,
+        'bgf': bgf,
+        'nf': nf,
+        'volumen': volumen,
+    }
+
+
+def waermeverlust_koeffizient_batch(spalten, geometrie):
+    """
+    Spezifischer Wärmeverlust (Transmission + Lüftung) in W/K
+    """
+    anzahl = len(geometrie['hoehe'])
+    q_t = np.zeros(anzahl)
+
+    # Wände (fehlender U-Wert -> Bauteil wird nicht berücksichtigt)
+    for orientierung in ORIENTIERUNGEN:
+        u_wert = np.nan_to_num(_spalte(spalten, f'u_wert_wand_{orientierung}', anzahl))
+        if orientierung == 'nord' or orientierung == 'sued':
+            flaeche = np.asarray(spalten['laenge_ns'], dtype=float) * geometrie['hoehe']
+        else:  # ost/west
+            flaeche = np.asarray(spalten['breite_ow'], dtype=float) * geometrie['hoehe']
+        fensterflaeche = _spalte(spalten, f'fensterflaeche_{orientierung}', anzahl)
+
+        opake_flaeche = np.maximum(0, flaeche - fensterflaeche)
+        q_t += u_wert * opake_flaeche
+
+    # Dach
+    u_dach = np.nan_to_num(_spalte(spalten, 'u_wert_dach', anzahl))
+    q_t += u_dach * geometrie['grundflaeche']
+
+    # Bodenplatte
+    u_boden = np.nan_to_num(_spalte(spalten, 'u_wert_bodenplatte', anzahl))
+    q_t += u_boden * geometrie['grundflaeche'] * 0.5  # Reduktionsfaktor für Erdreich
+
+    # Fenster (U-Wert 1.3 W/m²K angenommen)
+    u_fenster = 1.3
+    for orientierung in ORIENTIERUNGEN:
+        q_t += u_fenster * _spalte(spalten, f'fensterflaeche_{orientierung}', anzahl)
+
+    # Lüftungswärmeverluste (vereinfacht)
+    luftwechsel = 0.5  # 1/h
+    rho_luft = 1.2  # kg/m³
+    c_luft = 1000  # J/kgK
+    q_v = luftwechsel * geometrie['volumen'] * rho_luft * c_luft / 3600  # W/K
+
+    return q_t + q_v
+
+
+def berechne_heizwaermebedarf_batch(spalten, geometrie):
+    """
+    Vektorisierte Variante von ``berechne_heizwaermebedarf``
+    """
+    q_gesamt = waermeverlust_koeffizient_batch(spalten, geometrie)
+    heizgradtage = _spalte(spalten, 'heizgradtage', len(q_gesamt))
+    heizwaermebedarf = q_gesamt * heizgradtage * 24 / 1000  # kWh/a
+
+    return np.maximum(0, heizwaermebedarf)
+
+
+def monatstemperaturen_batch(spalten, anzahl):
+    """
+    Monatliche Außentemperaturen in °C, Form ``(anzahl, 12)``
+
+    Liegt die Spalte ``temperatur_monat`` vor, wird sie direkt verwendet.
+    Sonst wird das Referenzprofil auf die Jahresmitteltemperatur verschoben.
+    """
+    if 'temperatur_monat' in spalten:
+        return np.asarray(spalten['temperatur_monat'], dtype=float)
+
+    verschiebung = _spalte(spalten, 'temperatur_mittel', anzahl) - TEMPERATUR_REFERENZ.mean()
+    return TEMPERATUR_REFERENZ[np.newaxis, :] + verschiebung[:, np.newaxis]
+
+
+def monatliche_gewinne_batch(spalten, anzahl, interne_gewinne):
+    """
+    Monatliche Wärmegewinne (solar + intern) in kWh, Form ``(anzahl, 12)``
+
+    Je Orientierung wird ``solarstrahlung_monat_*`` (Form ``(anzahl, 12)``)
+    verwendet, falls vorhanden, sonst die Jahressumme des Orts verteilt
+    nach ``STRAHLUNG_ANTEILE``. Die internen Jahresgewinne werden nach
+    Tagen auf die Monate verteilt.
+    """
+    explizit = None
+    # Jahresgewinne je Orientierung (+ intern), die über Profile verteilt werden
+    jahresgewinne = np.zeros((anzahl, len(ORIENTIERUNGEN) + 1))
+    jahresgewinne[:, -1] = interne_gewinne
+
+    for i, orientierung in enumerate(ORIENTIERUNGEN):
+        wirksame_flaeche = (_spalte(spalten, f'fensterflaeche_{orientierung}', anzahl)
+                            * _spalte(spalten, f'g_wert_{orientierung}', anzahl) * 0.7)  # Reduktionsfaktor
+        schluessel = f'solarstrahlung_monat_{orientierung}'
+        if schluessel in spalten:
+            beitrag = wirksame_flaeche[:, np.newaxis] * np.asarray(spalten[schluessel], dtype=float)
+            explizit = beitrag if explizit is None else explizit + beitrag
+        else:
+            jahresgewinne[:, i] = wirksame_flaeche * _spalte(spalten, f'solarstrahlung_{orientierung}', anzahl)
+
+    gewinne = jahresgewinne @ _GEWINN_PROFILMATRIX
+    if explizit is not None:
+        gewinne += explizit
+    return gewinne
+
+
+def _ausnutzungsgrad(gamma, a):
+    """
+    Ausnutzungsgrad der Wärmegewinne nach DIN V 18599-2 / DIN EN ISO 13790
+    """
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        gamma_a = np.power(gamma, a)
+        eta = (1 - gamma_a) / (1 - gamma_a * gamma)
+
+    # Sonderfälle nur für die wenigen betroffenen Monate auswerten:
+    # gamma = 1 -> a / (a + 1), sehr große gamma -> 1 / gamma
+    sonderfall = ~np.isfinite(eta)
+    if sonderfall.any():
+        a_voll = np.broadcast_to(a, gamma.shape)[sonderfall]
+        g = gamma[sonderfall]
+        eta[sonderfall] = np.where(np.abs(g - 1) < 1e-9, a_voll / (a_voll + 1), 1 / g)
+    return eta
+
+
+def berechne_heizwaermebedarf_monatlich_batch(spalten, geometrie):
+    """
+    Heizwärmebedarf nach dem Monatsbilanzverfahren (DIN V 18599-2, vereinfacht)
+
+    Bilanziert Verluste und Gewinne je Monat und rechnet die Gewinne mit
+    dem Ausnutzungsgrad statt mit dem pauschalen Faktor 0.7 an. Gibt die
+    Monatswerte (Form ``(anzahl, 12)``) und die Jahressumme in kWh zurück.
+    """
+    anzahl = len(geometrie['nf'])
+    h_gesamt = waermeverlust_koeffizient_batch(spalten, geometrie)  # W/K
+    zeitfaktor = TAGE_JE_MONAT * 24 / 1000  # kh je Monat
+
+    if 'temperatur_monat' in spalten:
+        verluste = RAUM_SOLLTEMPERATUR - monatstemperaturen_batch(spalten, anzahl)
+        verluste *= zeitfaktor[np.newaxis, :]
+        verluste *= h_gesamt[:, np.newaxis]
+    else:
+        # H * (θi - θref - Δθ) * t als ein Matrixprodukt über alle Gebäude
+        verschiebung = _spalte(spalten, 'temperatur_mittel', anzahl) - TEMPERATUR_REFERENZ.mean()
+        koeffizienten = np.column_stack([h_gesamt, h_gesamt * verschiebung])
+        profil = np.array([(RAUM_SOLLTEMPERATUR - TEMPERATUR_REFERENZ) * zeitfaktor, -zeitfaktor])
+        verluste = koeffizienten @ profil  # kWh
+
+    interne_gewinne = berechne_interne_gewinne_batch(spalten, geometrie)
+    gewinne = monatliche_gewinne_batch(spalten, anzahl, interne_gewinne)
+
+    # Zeitkonstante aus wirksamer Wärmespeicherfähigkeit (mittelschwere Bauweise)
+    c_wirk = WAERMESPEICHERFAEHIGKEIT * geometrie['nf']  # Wh/K
+    tau = np.divide(c_wirk, h_gesamt, out=np.zeros(anzahl), where=h_gesamt > 0)  # h
+    a = 1 + tau / 16
+
+    # Blockweise auswerten, damit die Zwischenergebnisse im Cache bleiben
+    monate = np.empty_like(verluste)
+    eta = np.empty_like(verluste)
+    for start in range(0, anzahl, MONATSBILANZ_BLOCKGROESSE):
+        block = slice(start, start + MONATSBILANZ_BLOCKGROESSE)
+        v, g = verluste[block], gewinne[block]
+
+        mit_verlusten = v > 0
+        gamma = np.divide(g, v, out=np.zeros_like(v), where=mit_verlusten)
+        eta_block = _ausnutzungsgrad(gamma, a[block, np.newaxis])
+        # Ohne Wärmeverluste werden keine Gewinne angerechnet
+        eta_block[~mit_verlusten] = 0.0
+
+        eta[block] = eta_block
+        np.maximum(v - eta_block * g, 0, out=monate[block])
+
+    return {
+        'monate': monate,
+        'ausnutzungsgrad': eta,
+        'jahr': monate.sum(axis=1),
+    }
+
+
+def berechne_solargewinne_batch(spalten, anzahl):
+    """
+    Vektorisierte Variante von ``berechne_solargewinne``
+    """
+    solargewinne = np.zeros(anzahl)
+    for orientierung in ORIENTIERUNGEN:
+        fensterflaeche = _spalte(spalten, f'fensterflaeche_{orientierung}', anzahl)
+        g_wert = _spalte(spalten, f'g_wert_{orientierung}', anzahl)
+        strahlung = _spalte(spalten, f'solarstrahlung_{orientierung}', anzahl)
+        solargewinne += fensterflaeche * g_wert * strahlung * 0.7  # Reduktionsfaktor
+    return solargewinne
+
+
+def berechne_interne_gewinne_batch(spalten, geometrie):
+    """
+    Vektorisierte Variante von ``berechne_interne_gewinne``
+    """
+    anzahl = len(geometrie['nf'])
+    anzahl_personen = geometrie['nf'] / _spalte(spalten, 'personendichte', anzahl)
+    personen_gewinne = anzahl_personen * 80 * 8 * 250 / 1000  # kWh/a
+    return personen_gewinne + _spalte(spalten, 'waermequellen_kwh', anzahl)
+
+
+def berechne_beleuchtungsenergie_batch(spalten, geometrie, arten_index):
+    """
+    Vektorisierte Variante von ``berechne_beleuchtungsenergie``
+    """
+    anzahl = len(geometrie['nf'])
+    beleuchtung_h_a = _spalte(spalten, 'beleuchtung_h_a', anzahl)
+
+    fallback = geometrie['nf'] * _kennwert(BELEUCHTUNG_SPEZIFISCH, arten_index, 10)
+    # 10 W/m² auf 25% der Nutzfläche je Nutzungsbereich
+    detailliert = 10 * (geometrie['nf'] * 0.25) * np.nan_to_num(beleuchtung_h_a) / 1000
+
+    return np.where(np.isnan(beleuchtung_h_a), fallback, detailliert)
+
+
+def berechne_pv_ertrag_batch(spalten, anzahl):
+    """
+    Vektorisierte Variante von ``berechne_pv_ertrag``
+    """
+    pv_ertrag = np.zeros(anzahl)
+    wirkungsgrad = _spalte(spalten, 'pv_wirkungsgrad', anzahl)
+    for orientierung in ORIENTIERUNGEN:
+        pv_gesamt = (_spalte(spalten, f'pv_vor_fenster_{orientierung}', anzahl)
+                     + _spalte(spalten, f'pv_vor_opak_{orientierung}', anzahl))
+        strahlung = _spalte(spalten, f'solarstrahlung_{orientierung}', anzahl)
+        pv_ertrag += pv_gesamt * strahlung * wirkungsgrad
+    return pv_ertrag
+
+
+@dauer_erfassen('batch')
+def berechne_energiebilanz_batch(spalten, verfahren='jahr'):
+    """
+    Energiebilanz für viele Gebäude auf einmal
+
+    ``spalten`` enthält je Eingabegröße ein Array mit einem Eintrag pro
+    Gebäude (siehe ``SPALTEN_STANDARD`` und ``PFLICHT_SPALTEN``). Das
+    Ergebnis hat dieselben Blöcke wie ``berechne_energiebilanz``, jedoch
+    mit ungerundeten Arrays als Werten.
+
+    Mit ``verfahren='monat'`` wird der Heizwärmebedarf nach dem
+    Monatsbilanzverfahren statt über die Heizgradtage berechnet.
+    """
+    if verfahren not in VERFAHREN:
+        raise ValueError(f'Unbekanntes Verfahren "{verfahren}"')
+
+    geometrie = geometrie_batch(spalten)
+    anzahl = len(geometrie['nf'])
+    nf = geometrie['nf']
+    BATCH_GROESSE.beobachten(anzahl)
+
+    if 'gebaeudeart' in spalten:
+        arten_index = _gebaeudearten_index(spalten['gebaeudeart'])
+    else:
+        arten_index = (np.array([SPALTEN_STANDARD['gebaeudeart']]), np.zeros(anzahl, dtype=int))
+
+    # Nutzenergiebedarf
+    ne_tww = nf * _kennwert(TWW_SPEZIFISCH, arten_index, 15)
+
+    if verfahren == 'monat':
+        # Gewinne sind über den Ausnutzungsgrad bereits berücksichtigt
+        ne_heizung = berechne_heizwaermebedarf_monatlich_batch(spalten, geometrie)['jahr']
+    else:
+        ne_heizung = berechne_heizwaermebedarf_batch(spalten, geometrie)
+
+        # Solare und interne Gewinne
+        solargewinne = berechne_solargewinne_batch(spalten, anzahl)
+        interne_gewinne = berechne_interne_gewinne_batch(spalten, geometrie)
+
+        ne_heizung = np.maximum(0, ne_heizung - (solargewinne + interne_gewinne) * 0.7)
+
+    ne_gesamt = ne_heizung + ne_tww
+
+    # Endenergiebedarf (vereinfacht mit Anlagenwirkungsgrad 0.9)
+    ee_heizung = ne_heizung / 0.9
+    ee_tww = ne_tww / 0.9
+    lueftung = np.asarray(spalten.get('lueftung', np.zeros(anzahl, dtype=bool)), dtype=bool)
+    ee_lueftung = np.where(lueftung, nf * _kennwert(LUEFTUNG_SPEZIFISCH, arten_index, 8), 0.0)
+    ee_beleuchtung = berechne_beleuchtungsenergie_batch(spalten, geometrie, arten_index)
+    ee_prozesse = nf * _kennwert(PROZESSE_SPEZIFISCH, arten_index, 5)
+
+    ee_gesamt = ee_heizung + ee_tww + ee_lueftung + ee_beleuchtung + ee_prozesse
+
+    # Primärenergiebedarf (Faktor 1.8 für Strom, 1.1 für Gas)
+    pe_gesamt = (ee_heizung + ee_tww) * 1.1 + (ee_lueftung + ee_beleuchtung + ee_prozesse) * 1.8
+
+    # PV-Ertrag
+    pv_ertrag = berechne_pv_ertrag_batch(spalten, anzahl)
+    strom_ueberschuss = np.maximum(0, pv_ertrag - (ee_lueftung + ee_beleuchtung + ee_prozesse))
+
+    # GWP (vereinfacht)
+    gwp_var1 = ee_gesamt * 0.5  # kg CO2-eq/a
+    gwp_var2 = ee_gesamt * 0.3  # kg CO2-eq/a
+
+    nf_positiv = nf > 0
+    nf_sicher = np.where(nf_positiv, nf, 1.0)
+
+    return {
+        'nutzenergie': {
+            'ne_heizung': ne_heizung,
+            'ne_tww': ne_tww,
+            'ne_gesamt': ne_gesamt,
+            'ne_spezifisch': np.where(nf_positiv, ne_gesamt / nf_sicher, 0.0),
+        },
+        'endenergie': {
+            'ee_heizung': ee_heizung,
+            'ee_tww': ee_tww,
+            'ee_lueftung': ee_lueftung,
+            'ee_beleuchtung': ee_beleuchtung,
+            'ee_prozesse': ee_prozesse,
+            'ee_gesamt': ee_gesamt,
+            'ee_spezifisch': np.where(nf_positiv, ee_gesamt / nf_sicher, 0.0),
+        },
+        'primaerenergie': {
+            'pe_gesamt': pe_gesamt,
+            'pe_spezifisch': np.where(nf_positiv, pe_gesamt / nf_sicher, 0.0),
+        },
+        'pv': {
+            'pv_ertrag': pv_ertrag,
+            'strom_ueberschuss': strom_ueberschuss,
+        },
+        'gwp': {
+            'gwp_var1': gwp_var1,
+            'gwp_var2': gwp_var2,
+        },
+        'gebaeudedaten': geometrie,
+    }
+
+
+def ergebnis_zeilen(ergebnis):
+    """
+    Zerlegt ein Batch-Ergebnis in gerundete Einzelergebnisse im Format von
+    ``berechne_energiebilanz``
+    """
+    listen = {
+        block: {schluessel: werte.tolist() for schluessel, werte in inhalt.items()}
+        for block, inhalt in ergebnis.items()
+    }
+    anzahl = len(listen['gebaeudedaten']['nf'])
+
+    for i in range(anzahl):
+        yield {
+            block: {schluessel: round(werte[i], 1) for schluessel, werte in inhalt.items()}
+            for block, inhalt in listen.items()
+        }
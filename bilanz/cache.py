@@ -0,0 +1,199 @@
+"""
+Ergebnis-Cache für die Live-Berechnung
+
+Die Wizard-Seiten rufen /api/berechnung/ bei jeder Eingabe auf, dabei
+wiederholen sich die Parametersätze häufig. Der Cache hält die Ergebnisse
+von berechne_energiebilanz pro Prozess (LRU mit TTL) und kann zusätzlich
+einen Django-Cache nutzen, damit mehrere Worker Treffer teilen.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+STANDARD_EINSTELLUNGEN = {
+    'GROESSE': 1024,
+    'TTL': 300,
+    'DJANGO_CACHE': None,
+}
+
+
+def berechnungs_schluessel(gebaeude, bauteile_dict, klimadaten):
+    """
+    Kanonischer Schlüssel aus GebaeudeEingabe, U-Werten und Klimadaten
+
+    Alle Zahlen werden als float normalisiert, damit z.B. '20' und '20.0'
+    denselben Eintrag treffen.
+    """
+    return (
+        float(gebaeude.laenge_ns),
+        float(gebaeude.breite_ow),
+        int(gebaeude.geschosse),
+        float(gebaeude.geschosshoehe),
+        float(gebaeude.personendichte),
+        str(gebaeude.gebaeudeart),
+        tuple(float(f) for f in gebaeude.fensterflaechen),
+        tuple(float(g) for g in gebaeude.g_werte),
+        tuple(sorted((typ, float(u)) for typ, u in bauteile_dict.items())),
+        tuple(sorted((k, float(v)) for k, v in klimadaten.items())),
+    )
+
+
+class ErgebnisCache:
+    """
+    Begrenzter LRU-Cache mit Ablaufzeit und Treffer-Zählern
+    """
+
+    def __init__(self, groesse=1024, ttl=300, django_cache=None):
+        self.groesse = groesse
+        self.ttl = ttl
+        self.django_cache = caches[django_cache] if django_cache else None
+        self._eintraege = OrderedDict()
+        self._lock = threading.Lock()
+        self.treffer = 0
+        self.treffer_geteilt = 0
+        self.fehlschlaege = 0
+        self.abgelaufen = 0
+        self.verdraengt = 0
+
+    @staticmethod
+    def _django_schluessel(schluessel):
+        return 'bilanz:ergebnis:' + hashlib.sha1(repr(schluessel).encode()).hexdigest()
+
+    def get(self, schluessel):
+        """Gibt das gespeicherte Ergebnis oder None zurück"""
+        jetzt = time.monotonic()
+        with self._lock:
+            eintrag = self._eintraege.get(schluessel)
+            if eintrag is not None:
+                ablauf, ergebnis = eintrag
+                if ablauf > jetzt:
+                    self._eintraege.move_to_end(schluessel)
+                    self.treffer += 1
+                    return ergebnis
+                del self._eintraege[schluessel]
+                self.abgelaufen += 1
+
+        if self.django_cache is not None:
+            ergebnis = self.django_cache.get(self._django_schluessel(schluessel))
+            if ergebnis is not None:
+                self._speichern_lokal(schluessel, ergebnis, jetzt)
+                with self._lock:
+                    self.treffer_geteilt += 1
+                return ergebnis
+
+        with self._lock:
+            self.fehlschlaege += 1
+        return None
+
+    def set(self, schluessel, ergebnis):
+        """Speichert ein Ergebnis lokal und ggf. im Django-Cache"""
+        self._speichern_lokal(schluessel, ergebnis, time.monotonic())
+        if self.django_cache is not None:
+            self.django_cache.set(self._django_schluessel(schluessel), ergebnis, timeout=self.ttl)
+
+    def _speichern_lokal(self, schluessel, ergebnis, jetzt):
+        with self._lock:
+            self._eintraege[schluessel] = (jetzt + self.ttl, ergebnis)
+            self._eintraege.move_to_end(schluessel)
+            while len(self._eintraege) > self.groesse:
+                self._eintraege.popitem(last=False)
+                self.verdraengt += 1
+
+    def hole_oder_berechne(self, schluessel, berechnung):
+        """Gibt das gespeicherte Ergebnis zurück oder berechnet und speichert es"""
+        ergebnis = self.get(schluessel)
+        if ergebnis is None:
+            ergebnis = berechnung()
+            self.set(schluessel, ergebnis)
+        return ergebnis
+
+    def leeren(self):
+        with self._lock:
+            self._eintraege.clear()
+
+    def statistik(self):
+        with self._lock:
+            anfragen = self.treffer + self.treffer_geteilt + self.fehlschlaege
+            return {
+                'eintraege': len(self._eintraege),
+                'groesse': self.groesse,
+                'ttl': self.ttl,
+                'treffer': self.treffer,
+                'treffer_geteilt': self.treffer_geteilt,
+                'fehlschlaege': self.fehlschlaege,
+                'abgelaufen': self.abgelaufen,
+                'verdraengt': self.verdraengt,
+                'trefferquote': (self.treffer + self.treffer_geteilt) / anfragen if anfragen else 0,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _cache_aus_einstellungen(setting):
+    """Prozessweiter ErgebnisCache gemäß dem Setting, None bei GROESSE = 0"""
+    cache = _caches.get(setting)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(setting)
+            if cache is None:
+                einstellungen = {
+                    **STANDARD_EINSTELLUNGEN,
+                    **getattr(settings, setting, {}),
+                }
+                cache = _caches[setting] = ErgebnisCache(
+                    groesse=einstellungen['GROESSE'],
+                    ttl=einstellungen['TTL'],
+                    django_cache=einstellungen['DJANGO_CACHE'],
+                )
+    if cache.groesse <= 0:
+        return None
+    return cache
+
+
+def get_ergebnis_cache():
+    """
+    Prozessweiter Ergebnis-Cache gemäß settings.BILANZ_ERGEBNIS_CACHE
+
+    Gibt None zurück, wenn der Cache mit GROESSE = 0 deaktiviert ist.
+    """
+    return _cache_aus_einstellungen('BILANZ_ERGEBNIS_CACHE')
+
+
+def get_term_cache():
+    """
+    Prozessweiter Cache der einzelnen Bilanzterme gemäß
+    settings.BILANZ_TERM_CACHE (siehe berechne_energiebilanz_inkrementell)
+    """
+    return _cache_aus_einstellungen('BILANZ_TERM_CACHE')
+
+
+CACHE_NAMEN = {
+    'BILANZ_ERGEBNIS_CACHE': 'ergebnis',
+    'BILANZ_TERM_CACHE': 'terme',
+}
+
+
+def aktive_caches():
+    """Statistik der bereits angelegten Caches nach Name (siehe CACHE_NAMEN)"""
+    return {
+        CACHE_NAMEN.get(setting, setting): cache.statistik()
+        for setting, cache in list(_caches.items())
+        if cache.groesse > 0
+    }
+
+
+@receiver(setting_changed)
+def _einstellungen_geaendert(sender, setting, **kwargs):
+    if setting == 'CACHES':
+        _caches.clear()
+    else:
+        _caches.pop(setting, None)
@@ -0,0 +1,150 @@
+"""
+Umwandlung von API-Parametern und Orten in Berechnungseingaben
+"""
+import math
+
+from .berechnungen import ORIENTIERUNGEN, GebaeudeEingabe
+from .berechnungen_batch import BAUTEIL_TYPEN
+
+
+# Standard-Klimadaten (München), wenn kein bekannter Ort angegeben ist
+STANDARD_KLIMADATEN = {
+    'heizgradtage': 3500,
+    'temperatur_mittel': 9.1,
+    'solarstrahlung_nord': 300,
+    'solarstrahlung_sued': 1100,
+    'solarstrahlung_ost': 700,
+    'solarstrahlung_west': 700,
+}
+
+# Gebäude-Parameter von berechnung_api: Request-Name -> (Spalte, Standardwert)
+API_PARAMETER = {
+    'laenge_ns': ('laenge_ns', 20),
+    'breite_ow': ('breite_ow', 15),
+    'geschosshoehe': ('geschosshoehe', 2.8),
+    'personendichte': ('personendichte', 15),
+    **{f'fenster_{o}': (f'fensterflaeche_{o}', 0) for o in ORIENTIERUNGEN},
+    **{f'g_wert_{o}': (f'g_wert_{o}', 0.6) for o in ORIENTIERUNGEN},
+}
+
+# Alle Parameternamen, die berechnung_api auswertet
+PARAMETER_NAMEN = frozenset(
+    [*API_PARAMETER, 'geschosse', 'geb_klasse', 'ort']
+    + [f'u_wert_{typ}' for typ in BAUTEIL_TYPEN]
+)
+
+# Spalten, die größer als 0 sein müssen (vektorisiert ergäbe 0 sonst inf
+# statt eines Fehlers wie bei berechnung_api)
+POSITIVE_SPALTEN = ('laenge_ns', 'breite_ow', 'geschosse', 'geschosshoehe', 'personendichte')
+
+
+def zuweisung_lesen(text):
+    """
+    ``NAME=WERT`` (z.B. von der Kommandozeile) als (Name, Wert)
+
+    Wirft einen ValueError, wenn kein ``=`` enthalten ist.
+    """
+    if '=' not in text:
+        raise ValueError(f'Erwartet NAME=WERT, erhalten: "{text}"')
+    name, wert = text.split('=', 1)
+    return name.strip(), wert.strip()
+
+
+def gebaeude_eingabe_aus_parametern(params):
+    """
+    Erzeugt die GebaeudeEingabe aus den Parametern von berechnung_api
+    """
+    return GebaeudeEingabe(
+        float(params.get('laenge_ns', 20)),
+        float(params.get('breite_ow', 15)),
+        int(params.get('geschosse', 3)),
+        float(params.get('geschosshoehe', 2.8)),
+        float(params.get('personendichte', 15)),
+        params.get('geb_klasse', 'buero'),
+        fensterflaechen=[float(params.get(f'fenster_{o}', 0)) for o in ORIENTIERUNGEN],
+        g_werte=[float(params.get(f'g_wert_{o}', 0.6)) for o in ORIENTIERUNGEN],
+    )
+
+
+def bauteile_aus_parametern(params):
+    """
+    U-Werte aus den Parametern von berechnung_api (ungültige Angaben werden ignoriert)
+    """
+    bauteile_dict = {}
+    for typ in BAUTEIL_TYPEN:
+        u_wert_key = f'u_wert_{typ}'
+        if u_wert_key in params and params[u_wert_key]:
+            try:
+                bauteile_dict[typ] = float(params[u_wert_key])
+            except (TypeError, ValueError):
+                pass
+    return bauteile_dict
+
+
+def parameter_aus_gebaeude(gebaeude):
+    """
+    Parameter im Format von berechnung_api aus einem gespeicherten Gebäude
+    """
+    params = {
+        parameter: getattr(gebaeude, spalte)
+        for parameter, (spalte, _) in API_PARAMETER.items()
+    }
+    params['geschosse'] = gebaeude.geschosse
+    params['geb_klasse'] = gebaeude.gebaeudeart
+    params['ort'] = gebaeude.ort.name
+    for bauteil in gebaeude.bauteile.all():
+        params[f'u_wert_{bauteil.typ}'] = bauteil.u_wert
+    return params
+
+
+def klimadaten_aus_ort(ort):
+    """Klimadaten-Dict aus einem Ort"""
+    return {
+        'heizgradtage': ort.heizgradtage,
+        'temperatur_mittel': ort.temperatur_mittel,
+        'solarstrahlung_nord': ort.solarstrahlung_nord,
+        'solarstrahlung_sued': ort.solarstrahlung_sued,
+        'solarstrahlung_ost': ort.solarstrahlung_ost,
+        'solarstrahlung_west': ort.solarstrahlung_west,
+    }
+
+
+def datensatz_aus_parametern(params, klimadaten):
+    """
+    Wandelt einen Parametersatz von berechnung_api in einen Datensatz für
+    die Batch-Berechnung um
+    """
+    datensatz = {
+        spalte: float(params.get(parameter, standard))
+        for parameter, (spalte, standard) in API_PARAMETER.items()
+    }
+    datensatz['geschosse'] = int(params.get('geschosse', 3))
+    datensatz['gebaeudeart'] = params.get('geb_klasse', 'buero')
+
+    for typ, u_wert in bauteile_aus_parametern(params).items():
+        datensatz[f'u_wert_{typ}'] = u_wert
+
+    datensatz.update(klimadaten)
+    return datensatz
+
+
+def wert_pruefen(name, wert):
+    """
+    Wirft einen ValueError, wenn ein Wert nicht endlich ist oder ein Parameter
+    aus ``POSITIVE_SPALTEN`` nicht größer als 0
+    """
+    if not math.isfinite(wert):
+        raise ValueError(f'{name} muss ein endlicher Wert sein')
+    if name in POSITIVE_SPALTEN and wert <= 0:
+        raise ValueError(f'{name} muss größer als 0 sein')
+
+
+def datensatz_pruefen(datensatz):
+    """Prüft die Gebäudewerte eines Datensatzes aus ``datensatz_aus_parametern``"""
+    for parameter, (spalte, _) in API_PARAMETER.items():
+        wert_pruefen(parameter, datensatz[spalte])
+    wert_pruefen('geschosse', datensatz['geschosse'])
+    for typ in BAUTEIL_TYPEN:
+        if f'u_wert_{typ}' in datensatz:
+            wert_pruefen(f'u_wert_{typ}', datensatz[f'u_wert_{typ}'])
+    return datensatz
@@ -0,0 +1,191 @@
+"""
+Gespeicherte Berechnungsergebnisse mit Fingerabdruck der Eingaben
+
+Berechnung speichert das Ergebnis von berechne_energiebilanz zusammen mit
+einem Hash über alle Eingaben (Gebäude, Bauteile, PV, Lüftung,
+Beleuchtung, Wärmequellen, Klimadaten). Neu berechnet wird nur, wenn
+sich dieser Fingerabdruck geändert hat.
+"""
+import hashlib
+import json
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Berechnung
+
+
+# Bei Änderungen an den Berechnungsformeln erhöhen, damit gespeicherte
+# Ergebnisse neu berechnet werden
+BERECHNUNGS_VERSION = 1
+
+GEBAEUDE_AUSGENOMMEN = {'id', 'name', 'beschreibung', 'ort', 'erstellt_am', 'aktualisiert_am'}
+RELATION_AUSGENOMMEN = {'id', 'gebaeude'}
+
+# Zuordnung der Berechnung-Felder zu den Ergebnisblöcken
+ERGEBNIS_FELDER = {
+    'ne_heizung': ('nutzenergie', 'ne_heizung'),
+    'ne_trinkwarmwasser': ('nutzenergie', 'ne_tww'),
+    'ne_gesamt': ('nutzenergie', 'ne_gesamt'),
+    'ee_heizung': ('endenergie', 'ee_heizung'),
+    'ee_lueftung': ('endenergie', 'ee_lueftung'),
+    'ee_beleuchtung': ('endenergie', 'ee_beleuchtung'),
+    'ee_prozesse': ('endenergie', 'ee_prozesse'),
+    'ee_gesamt': ('endenergie', 'ee_gesamt'),
+    'pe_gesamt': ('primaerenergie', 'pe_gesamt'),
+    'pv_ertrag': ('pv', 'pv_ertrag'),
+    'strom_ueberschuss': ('pv', 'strom_ueberschuss'),
+    'gwp_var1': ('gwp', 'gwp_var1'),
+    'gwp_var2': ('gwp', 'gwp_var2'),
+}
+
+# Gespeicherte Felder von Berechnung (ohne Zeitstempel)
+SPEICHER_FELDER = (*ERGEBNIS_FELDER, 'ergebnis', 'eingabe_hash')
+
+
+def _felder(objekt, ausgenommen):
+    """Werte aller konkreten Modellfelder außer den ausgenommenen"""
+    if objekt is None:
+        return None
+    return {
+        feld.name: getattr(objekt, feld.attname)
+        for feld in objekt._meta.concrete_fields
+        if feld.name not in ausgenommen
+    }
+
+
+def eingabe_fingerabdruck(eingaben):
+    """
+    SHA-256 über alle Eingaben einer BerechnungsEingabe
+    """
+    daten = {
+        'version': BERECHNUNGS_VERSION,
+        'gebaeude': _felder(eingaben.gebaeude, GEBAEUDE_AUSGENOMMEN),
+        'bauteile': sorted(eingaben.bauteile_dict.items()),
+        'pv': _felder(eingaben.pv_data, RELATION_AUSGENOMMEN),
+        'lueftung': _felder(eingaben.lueftung_data, RELATION_AUSGENOMMEN),
+        'beleuchtungen': sorted(
+            (_felder(b, RELATION_AUSGENOMMEN) for b in eingaben.beleuchtungen_data),
+            key=lambda b: b['nutzungsbereich'],
+        ),
+        'waermequellen': [_felder(q, RELATION_AUSGENOMMEN) for q in eingaben.waermequellen_data],
+        'klimadaten': dict(eingaben.klimadaten),
+    }
+    kodiert = json.dumps(daten, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(kodiert.encode('utf-8')).hexdigest()
+
+
+def gespeicherte_berechnung(eingaben):
+    """
+    (Berechnung, Fingerabdruck, aktuell) zu den Eingaben, ohne zu rechnen
+
+    Ohne gespeicherte Berechnung ist die Berechnung eine neue, ungespeicherte
+    Instanz; ``aktuell`` gibt an, ob ihr Ergebnis zu den Eingaben passt.
+    """
+    fingerabdruck = eingabe_fingerabdruck(eingaben)
+    gebaeude = eingaben.gebaeude
+
+    try:
+        berechnung = gebaeude.berechnung
+    except Berechnung.DoesNotExist:
+        berechnung = Berechnung(gebaeude=gebaeude)
+
+    aktuell = berechnung.pk is not None and berechnung.eingabe_hash == fingerabdruck
+    return berechnung, fingerabdruck, aktuell
+
+
+def _ergebnis_uebernehmen(berechnung, ergebnis, fingerabdruck):
+    for feld, (block, schluessel) in ERGEBNIS_FELDER.items():
+        setattr(berechnung, feld, ergebnis[block][schluessel])
+    berechnung.ergebnis = ergebnis
+    berechnung.eingabe_hash = fingerabdruck
+
+
+def _speicherwerte(berechnung):
+    """Werte der SPEICHER_FELDER einer Berechnung"""
+    return {feld: getattr(berechnung, feld) for feld in SPEICHER_FELDER}
+
+
+def aktuelle_berechnung(eingaben):
+    """
+    Gibt die gespeicherte Berechnung zum Gebäude zurück und berechnet sie
+    nur neu, wenn sich die Eingaben geändert haben
+
+    Rückgabe: (Berechnung, neu_berechnet)
+    """
+    berechnung, fingerabdruck, aktuell = gespeicherte_berechnung(eingaben)
+    if aktuell:
+        return berechnung, False
+
+    _ergebnis_uebernehmen(berechnung, eingaben.berechnen(), fingerabdruck)
+    # Gleichzeitige erste Berechnungen desselben Gebäudes aktualisieren
+    # dieselbe Zeile, statt am Unique-Constraint von gebaeude zu scheitern
+    berechnung, _ = Berechnung.objects.update_or_create(
+        gebaeude=eingaben.gebaeude, defaults=_speicherwerte(berechnung),
+    )
+    return berechnung, True
+
+
+async def aaktuelle_berechnung(eingaben, ausfuehren):
+    """
+    Wie aktuelle_berechnung für asynchrone Views; die Berechnung läuft über
+    ``ausfuehren`` (z.B. BegrenzterExecutor.ausfuehren), gespeichert wird
+    über das asynchrone ORM
+    """
+    berechnung, fingerabdruck, aktuell = gespeicherte_berechnung(eingaben)
+    if aktuell:
+        return berechnung, False
+
+    _ergebnis_uebernehmen(berechnung, await ausfuehren(eingaben.berechnen), fingerabdruck)
+    berechnung, _ = await Berechnung.objects.aupdate_or_create(
+        gebaeude=eingaben.gebaeude, defaults=_speicherwerte(berechnung),
+    )
+    return berechnung, True
+
+
+def berechnungen_aktualisieren(eingaben_liste, erzwingen=False):
+    """
+    Berechnet die Ergebnisse mehrerer Gebäude, deren Eingaben sich geändert
+    haben (bzw. aller mit ``erzwingen``), ohne zu speichern
+
+    Gibt eine Liste von Dicts mit 'id' (None für neue Berechnungen),
+    'gebaeude_id' und den SPEICHER_FELDER zurück; siehe berechnungen_speichern.
+    """
+    zeilen = []
+    for eingaben in eingaben_liste:
+        berechnung, fingerabdruck, aktuell = gespeicherte_berechnung(eingaben)
+        if aktuell and not erzwingen:
+            continue
+        _ergebnis_uebernehmen(berechnung, eingaben.berechnen(), fingerabdruck)
+        zeilen.append({
+            'id': berechnung.pk,
+            'gebaeude_id': berechnung.gebaeude_id,
+            **_speicherwerte(berechnung),
+        })
+    return zeilen
+
+
+def berechnungen_speichern(zeilen, batch_size=500):
+    """
+    Schreibt Zeilen aus berechnungen_aktualisieren per bulk_create
+
+    Vorhandene Berechnungen werden über update_conflicts auf gebaeude in
+    derselben Anweisung aktualisiert (bulk_update mit CASE WHEN je Feld
+    wird bei großen Blöcken sehr langsam). Gibt (angelegt, aktualisiert)
+    zurück.
+    """
+    jetzt = timezone.now()
+    berechnungen = [
+        Berechnung(berechnet_am=jetzt, **{k: v for k, v in zeile.items() if k != 'id'})
+        for zeile in zeilen
+    ]
+    with transaction.atomic():
+        Berechnung.objects.bulk_create(
+            berechnungen,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['gebaeude'],
+            update_fields=[*SPEICHER_FELDER, 'berechnet_am'],
+        )
+    aktualisiert = sum(1 for zeile in zeilen if zeile['id'] is not None)
+    return len(zeilen) - aktualisiert, aktualisiert
@@ -0,0 +1,145 @@
+"""
+Streaming-Export der Berechnungsergebnisse als JSON Lines oder CSV
+
+Die Gebäude werden per QuerySet.iterator() blockweise geladen und die
+Ausgabe als Generator erzeugt; der Speicherbedarf hängt nur von der
+Blockgröße ab, nicht von der Anzahl der Gebäude.
+
+Quellen:
+
+- ``aktuell``: gespeicherte Berechnung, wenn der Fingerabdruck der
+  Eingaben passt, sonst wird neu berechnet (ohne zu speichern)
+- ``gespeichert``: nur die gespeicherten Berechnungen, ohne Relationen zu
+  laden; Gebäude ohne Berechnung fehlen, veraltete Ergebnisse werden
+  unverändert ausgegeben
+"""
+import csv
+import json
+
+from .berechnungen import ERGEBNIS_BLOECKE, auswahl_aus_ergebnis
+from .ergebnisse import gespeicherte_berechnung
+from .lader import BerechnungsEingabe, gebaeude_mit_eingaben
+from .models import Gebaeude
+
+
+EXPORT_FORMATE = ('jsonl', 'csv')
+EXPORT_QUELLEN = ('aktuell', 'gespeichert')
+KOPF_FELDER = ('id', 'name', 'ort', 'gebaeudeart')
+STANDARD_BLOCK = 500
+
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def gebaeude_filtern(queryset, ort=None, gebaeudeart=None, ids=None, ab=None):
+    """Filtert Gebäude nach Ortsname, Gebäudeart, ids und id > ab, sortiert nach id"""
+    if ort:
+        queryset = queryset.filter(ort__name=ort)
+    if gebaeudeart:
+        queryset = queryset.filter(gebaeudeart=gebaeudeart)
+    if ids is not None:
+        queryset = queryset.filter(id__in=ids)
+    if ab is not None:
+        queryset = queryset.filter(id__gt=ab)
+    return queryset.order_by('id')
+
+
+def ergebnisse_iterieren(quelle='aktuell', auswahl=None, block=STANDARD_BLOCK, **kriterien):
+    """
+    Liefert (Gebäude, Ergebnis) für alle Gebäude nach gebaeude_filtern(**kriterien)
+
+    Schlägt die Berechnung eines Gebäudes fehl, ist das Ergebnis die
+    Fehlermeldung (str).
+    """
+    if quelle not in EXPORT_QUELLEN:
+        raise ValueError(f'Unbekannte Quelle "{quelle}"')
+
+    if quelle == 'gespeichert':
+        gebaeude = gebaeude_filtern(
+            Gebaeude.objects.select_related('ort', 'berechnung').filter(berechnung__eingabe_hash__gt=''),
+            **kriterien,
+        )
+    else:
+        gebaeude = gebaeude_filtern(gebaeude_mit_eingaben().select_related('ort'), **kriterien)
+
+    for g in gebaeude.iterator(chunk_size=block):
+        if quelle == 'gespeichert':
+            ergebnis = g.berechnung.ergebnis
+        else:
+            try:
+                eingaben = BerechnungsEingabe(g)
+                berechnung, _, aktuell = gespeicherte_berechnung(eingaben)
+                ergebnis = berechnung.ergebnis if aktuell else eingaben.berechnen()
+            except Exception as e:
+                yield g, str(e)
+                continue
+        if auswahl is not None:
+            ergebnis = auswahl_aus_ergebnis(ergebnis, auswahl)
+        yield g, ergebnis
+
+
+def _kopf(gebaeude):
+    return {
+        'id': gebaeude.id,
+        'name': gebaeude.name,
+        'ort': gebaeude.ort.name,
+        'gebaeudeart': gebaeude.gebaeudeart,
+    }
+
+
+def jsonl_zeilen(ergebnisse):
+    """Eine JSON-Zeile je Gebäude: Kopffelder und die Ergebnisblöcke"""
+    for gebaeude, ergebnis in ergebnisse:
+        if isinstance(ergebnis, str):
+            zeile = {**_kopf(gebaeude), 'error': ergebnis}
+        else:
+            zeile = {**_kopf(gebaeude), **ergebnis}
+        yield json.dumps(zeile, ensure_ascii=False) + '\n'
+
+
+class _Zeilenpuffer:
+    """Pseudo-Datei für csv.writer, die die geschriebene Zeile zurückgibt"""
+
+    def write(self, zeile):
+        return zeile
+
+
+def csv_zeilen(ergebnisse, auswahl):
+    """
+    Kopfzeile und eine Zeile je Gebäude; eine Spalte je Ergebnisfeld der
+    Auswahl (ohne Auswahl alle), die Spalte error ist nur bei
+    fehlgeschlagener Berechnung gefüllt
+    """
+    if auswahl is None:
+        auswahl = ERGEBNIS_BLOECKE
+    felder = [(block, feld) for block, block_felder in auswahl.items() for feld in block_felder]
+    writer = csv.writer(_Zeilenpuffer(), lineterminator='\n')
+    yield writer.writerow([*KOPF_FELDER, *(feld for _, feld in felder), 'error'])
+    for gebaeude, ergebnis in ergebnisse:
+        kopf = _kopf(gebaeude).values()
+        if isinstance(ergebnis, str):
+            yield writer.writerow([*kopf, *([''] * len(felder)), ergebnis])
+        else:
+            yield writer.writerow([*kopf, *(ergebnis[block][feld] for block, feld in felder), ''])
+
+
+def export_zeilen(format, ergebnisse, auswahl, zeilen_pro_teil=100):
+    """
+    Exportzeilen im gewünschten Format, zu Teilen von ``zeilen_pro_teil``
+    Zeilen zusammengefasst (weniger Schreibaufrufe beim Streaming)
+    """
+    if format == 'csv':
+        zeilen = csv_zeilen(ergebnisse, auswahl)
+    else:
+        zeilen = jsonl_zeilen(ergebnisse)
+
+    teil = []
+    for zeile in zeilen:
+        teil.append(zeile)
+        if len(teil) >= zeilen_pro_teil:
+            yield ''.join(teil)
+            teil = []
+    if teil:
+        yield ''.join(teil)
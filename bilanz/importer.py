@@ -0,0 +1,260 @@
+"""
+Streaming-Import von Gebäuden samt Bauteilen, PV, Lüftung, Beleuchtung
+und Wärmequellen aus CSV oder JSON Lines
+
+Jede Zeile beschreibt ein Gebäude. In JSON Lines (gekürzt):
+
+    {"name": "Rathaus", "ort": "München", "laenge_ns": 30, "breite_ow": 12,
+     "geschosse": 4, "geschosshoehe": 2.8, ..., "bauteile": {"dach": 0.2},
+     "pv_anlage": {"pv_vor_opak_sued": 40, ...}, "lueftung": {"typ": "mechanisch", ...},
+     "beleuchtungen": [{"nutzungsbereich": "buero", ...}],
+     "waermequellen": [{"typ": "geraet", "name": "PC", "anzahl": 20, "leistung": 80, ...}]}
+
+In CSV stehen die Gebäudefelder als Spalten, dazu ``u_wert_<typ>``,
+``pv_vor_*``/``pv_wirkungsgrad``, ``lueftung_<feld>`` und optional
+``beleuchtungen``/``waermequellen`` als JSON-Array in einer Zelle.
+
+Geprüft wird mit den Formularfeldern der ModelForms aus forms.py und den
+Validatoren der Modellfelder, ohne pro Zeile ein Formular zu instanziieren.
+Pflichtfelder sind wie im Formular alle Felder ohne blank=True, auch
+solche mit Standardwert.
+Gespeichert wird blockweise per bulk_create in je einer Transaktion, der
+Speicherbedarf hängt nur von der Blockgröße ab.
+"""
+import csv
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .forms import (
+    GebaeudeAllgForm, BauteilForm, PVForm, LueftungForm, BeleuchtungForm, WaermequelleForm,
+)
+from .models import Gebaeude, Bauteil, PVAnlage, Lueftung, Beleuchtung, Waermequelle, Ort
+
+
+IMPORT_FORMATE = ('csv', 'jsonl')
+MAX_FEHLER_MELDUNGEN = 100
+
+
+class _FeldPruefer:
+    """Prüft Werte mit den Feldern eines ModelForms und den Validatoren der Modellfelder"""
+
+    def __init__(self, formular, ausgenommen=()):
+        self.modell = formular._meta.model
+        self.felder = [
+            (formular.base_fields[name], self.modell._meta.get_field(name))
+            for name in formular._meta.fields if name not in ausgenommen
+        ]
+        self.namen = frozenset(feld.name for _, feld in self.felder)
+
+    def pruefen(self, daten, fehler, praefix=''):
+        if not isinstance(daten, dict):
+            fehler[praefix.rstrip('.') or 'zeile'] = ['Erwartet ein Objekt']
+            return {}
+        werte = {}
+        for formularfeld, feld in self.felder:
+            wert = daten.get(feld.name)
+            if wert is None or wert == '':
+                if formularfeld.required:
+                    fehler[praefix + feld.name] = ['Pflichtfeld']
+                continue
+            try:
+                wert = formularfeld.clean(wert)
+                feld.run_validators(wert)
+            except ValidationError as e:
+                fehler[praefix + feld.name] = e.messages
+                continue
+            werte[feld.attname] = wert
+        unbekannt = set(daten) - self.namen
+        if unbekannt:
+            fehler[praefix + 'unbekannt'] = [f'Unbekannte Felder: {", ".join(sorted(unbekannt))}']
+        return werte
+
+
+GEBAEUDE_PRUEFER = _FeldPruefer(GebaeudeAllgForm, ausgenommen=('ort',))
+BAUTEIL_PRUEFER = _FeldPruefer(BauteilForm)
+PV_PRUEFER = _FeldPruefer(PVForm)
+LUEFTUNG_PRUEFER = _FeldPruefer(LueftungForm)
+BELEUCHTUNG_PRUEFER = _FeldPruefer(BeleuchtungForm)
+WAERMEQUELLE_PRUEFER = _FeldPruefer(WaermequelleForm)
+
+RELATIONEN = ('bauteile', 'pv_anlage', 'lueftung', 'beleuchtungen', 'waermequellen')
+
+
+def _liste_pruefen(pruefer, daten, schluessel, fehler, eindeutig=None):
+    if daten is None:
+        return []
+    if not isinstance(daten, list):
+        fehler[schluessel] = ['Erwartet eine Liste']
+        return []
+    werte = [pruefer.pruefen(eintrag, fehler, f'{schluessel}.{i}.') for i, eintrag in enumerate(daten)]
+    if eindeutig:
+        schluesselwerte = [w.get(eindeutig) for w in werte]
+        if len(set(schluesselwerte)) != len(schluesselwerte):
+            fehler[schluessel] = [f'{eindeutig} muss je Gebäude eindeutig sein']
+    return werte
+
+
+def zeile_pruefen(daten, orte):
+    """
+    Prüft einen Gebäude-Datensatz
+
+    ``orte`` ordnet Ortsnamen (und ids) der Ort-id zu. Gibt ein Dict mit den
+    bereinigten Werten für Gebäude und Relationen zurück oder wirft einen
+    ValidationError mit einem Dict Feld -> Meldungen.
+    """
+    if not isinstance(daten, dict):
+        raise ValidationError({'zeile': ['Datensatz muss ein JSON-Objekt sein']})
+    fehler = {}
+    gebaeude_daten = {k: v for k, v in daten.items() if k not in RELATIONEN and k != 'ort'}
+    gebaeude = GEBAEUDE_PRUEFER.pruefen(gebaeude_daten, fehler)
+
+    ort = daten.get('ort')
+    ort_id = orte.get(ort) if isinstance(ort, (str, int)) else None
+    if ort_id is None:
+        fehler['ort'] = [f'Unbekannter Ort "{daten.get("ort")}"']
+    gebaeude['ort_id'] = ort_id
+
+    bauteile = daten.get('bauteile')
+    if isinstance(bauteile, dict):
+        bauteile = [{'typ': typ, 'u_wert': u_wert} for typ, u_wert in bauteile.items()]
+
+    pv_anlage = daten.get('pv_anlage')
+    lueftung = daten.get('lueftung')
+    ergebnis = {
+        'gebaeude': gebaeude,
+        'bauteile': _liste_pruefen(BAUTEIL_PRUEFER, bauteile, 'bauteile', fehler, eindeutig='typ'),
+        'pv_anlage': PV_PRUEFER.pruefen(pv_anlage, fehler, 'pv_anlage.') if pv_anlage is not None else None,
+        'lueftung': LUEFTUNG_PRUEFER.pruefen(lueftung, fehler, 'lueftung.') if lueftung is not None else None,
+        'beleuchtungen': _liste_pruefen(
+            BELEUCHTUNG_PRUEFER, daten.get('beleuchtungen'), 'beleuchtungen', fehler,
+            eindeutig='nutzungsbereich',
+        ),
+        'waermequellen': _liste_pruefen(
+            WAERMEQUELLE_PRUEFER, daten.get('waermequellen'), 'waermequellen', fehler,
+        ),
+    }
+    if fehler:
+        raise ValidationError(fehler)
+    return ergebnis
+
+
+def csv_zeile_umwandeln(zeile):
+    """Wandelt eine flache CSV-Zeile in die verschachtelte Form von JSON Lines um"""
+    daten = {}
+    pv_anlage = {}
+    lueftung = {}
+    bauteile = {}
+    for spalte, wert in zeile.items():
+        if spalte is None or wert is None or wert == '':
+            continue
+        if spalte.startswith('u_wert_'):
+            bauteile[spalte[len('u_wert_'):]] = wert
+        elif spalte.startswith('pv_vor_'):
+            pv_anlage[spalte] = wert
+        elif spalte == 'pv_wirkungsgrad':
+            pv_anlage['wirkungsgrad'] = wert
+        elif spalte.startswith('lueftung_'):
+            lueftung[spalte[len('lueftung_'):]] = wert
+        elif spalte in ('beleuchtungen', 'waermequellen'):
+            daten[spalte] = json.loads(wert)
+        else:
+            daten[spalte] = wert
+    if bauteile:
+        daten['bauteile'] = bauteile
+    if pv_anlage:
+        daten['pv_anlage'] = pv_anlage
+    if lueftung:
+        daten['lueftung'] = lueftung
+    return daten
+
+
+def datensaetze_lesen(zeilen, format):
+    """
+    Liest Datensätze aus einem Iterator über Textzeilen
+
+    Erzeugt (Zeilennummer, Datensatz); nicht lesbare Zeilen liefern statt
+    des Datensatzes einen ValidationError.
+    """
+    if format == 'csv':
+        reader = csv.DictReader(zeilen)
+        for zeile in reader:
+            try:
+                yield reader.line_num, csv_zeile_umwandeln(zeile)
+            except json.JSONDecodeError as e:
+                yield reader.line_num, ValidationError({'zeile': [f'Ungültiges JSON ({e.msg})']})
+    elif format == 'jsonl':
+        for nummer, zeile in enumerate(zeilen, start=1):
+            if not zeile.strip():
+                continue
+            try:
+                yield nummer, json.loads(zeile)
+            except json.JSONDecodeError as e:
+                yield nummer, ValidationError({'zeile': [f'Ungültiges JSON ({e.msg})']})
+    else:
+        raise ValueError(f'Unbekanntes Format "{format}"')
+
+
+def _block_speichern(block):
+    """Speichert einen Block geprüfter Datensätze in einer Transaktion"""
+    with transaction.atomic():
+        gebaeude = Gebaeude.objects.bulk_create([Gebaeude(**z['gebaeude']) for z in block])
+        if gebaeude and gebaeude[0].pk is None:
+            raise RuntimeError('Die Datenbank liefert bei bulk_create keine ids zurück')
+
+        kinder = {Bauteil: [], PVAnlage: [], Lueftung: [], Beleuchtung: [], Waermequelle: []}
+        for objekt, zeile in zip(gebaeude, block):
+            for werte in zeile['bauteile']:
+                kinder[Bauteil].append(Bauteil(gebaeude_id=objekt.pk, **werte))
+            if zeile['pv_anlage'] is not None:
+                kinder[PVAnlage].append(PVAnlage(gebaeude_id=objekt.pk, **zeile['pv_anlage']))
+            if zeile['lueftung'] is not None:
+                kinder[Lueftung].append(Lueftung(gebaeude_id=objekt.pk, **zeile['lueftung']))
+            for werte in zeile['beleuchtungen']:
+                kinder[Beleuchtung].append(Beleuchtung(gebaeude_id=objekt.pk, **werte))
+            for werte in zeile['waermequellen']:
+                kinder[Waermequelle].append(Waermequelle(gebaeude_id=objekt.pk, **werte))
+
+        for modell, objekte in kinder.items():
+            modell.objects.bulk_create(objekte)
+    return len(gebaeude)
+
+
+def importieren(datensaetze, block_groesse=1000, fortschritt=None):
+    """
+    Prüft und speichert Datensätze aus datensaetze_lesen blockweise
+
+    Fehlerhafte Datensätze werden übersprungen und (bis MAX_FEHLER_MELDUNGEN)
+    mit Zeilennummer gemeldet. ``fortschritt`` wird nach jedem Block mit dem
+    Zwischenstand aufgerufen.
+    """
+    orte = {}
+    for ort_id, name in Ort.objects.values_list('id', 'name'):
+        orte[name] = ort_id
+        orte[ort_id] = ort_id
+
+    stand = {'angelegt': 0, 'fehlerhaft': 0, 'fehler': []}
+    block = []
+
+    def speichern():
+        stand['angelegt'] += _block_speichern(block)
+        block.clear()
+        if fortschritt is not None:
+            fortschritt(stand)
+
+    for nummer, daten in datensaetze:
+        try:
+            if isinstance(daten, ValidationError):
+                raise daten
+            block.append(zeile_pruefen(daten, orte))
+        except ValidationError as e:
+            stand['fehlerhaft'] += 1
+            if len(stand['fehler']) < MAX_FEHLER_MELDUNGEN:
+                stand['fehler'].append({'zeile': nummer, 'fehler': e.message_dict})
+            continue
+        if len(block) >= block_groesse:
+            speichern()
+    if block:
+        speichern()
+    return stand
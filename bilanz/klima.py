@@ -0,0 +1,155 @@
+"""
+Prozessweites Register der Klimadaten aller Orte
+
+Die Orte werden einmal geladen und nach Name und id indiziert. Die
+Klimadaten-Dicts werden ohne Datenbankzugriff ausgeliefert. Änderungen
+an Ort invalidieren das Register nach dem Commit über
+post_save/post_delete (siehe signals.py); andere Worker-Prozesse laden
+spätestens nach settings.BILANZ_KLIMA_NEULADEN Sekunden neu.
+
+Jedes Invalidieren erhöht eine Generation. Ein Ladevorgang, der vor dem
+Invalidieren begonnen hat, liefert seine Daten noch aus, gilt aber nicht
+als aktueller Stand, sodass der nächste Zugriff neu lädt.
+"""
+import threading
+import time
+from types import MappingProxyType
+
+from django.conf import settings
+
+from .models import Ort
+from .eingaben import STANDARD_KLIMADATEN
+from .metriken import ORT_ABFRAGEN
+
+
+STANDARD_NEULADEN = 300
+
+
+def _gezaehlt(klimadaten):
+    ORT_ABFRAGEN.erhoehen('gefunden' if klimadaten is not None else 'unbekannt')
+    return klimadaten
+
+
+class KlimaRegister:
+    """
+    Klimadaten aller Orte im Speicher
+
+    Die zurückgegebenen Klimadaten sind schreibgeschützte Mappings, die von
+    allen Aufrufern gemeinsam genutzt werden.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stand = None
+        self._generation = 0
+        self._nach_name = {}
+        self._nach_id = {}
+        self._namen = ()
+        self.ladevorgaenge = 0
+
+    def _veraltet(self):
+        neuladen = getattr(settings, 'BILANZ_KLIMA_NEULADEN', STANDARD_NEULADEN)
+        stand = self._stand
+        return stand is None or (neuladen is not None and time.monotonic() - stand >= neuladen)
+
+    def _aktueller_stand(self):
+        if self._veraltet():
+            self._laden()
+
+    async def _aaktueller_stand(self):
+        if self._veraltet():
+            await self._aladen()
+
+    @staticmethod
+    def _abfrage():
+        return Ort.objects.order_by('id').values_list(
+            'id', 'name', 'heizgradtage', 'temperatur_mittel',
+            'solarstrahlung_nord', 'solarstrahlung_sued',
+            'solarstrahlung_ost', 'solarstrahlung_west',
+        )
+
+    def _laden(self):
+        generation = self._generation
+        self._uebernehmen(self._abfrage(), generation)
+
+    async def _aladen(self):
+        generation = self._generation
+        self._uebernehmen([zeile async for zeile in self._abfrage()], generation)
+
+    def _uebernehmen(self, zeilen, generation):
+        nach_name = {}
+        nach_id = {}
+        for ort_id, name, hgt, temperatur, nord, sued, ost, west in zeilen:
+            klimadaten = MappingProxyType({
+                'heizgradtage': hgt,
+                'temperatur_mittel': temperatur,
+                'solarstrahlung_nord': nord,
+                'solarstrahlung_sued': sued,
+                'solarstrahlung_ost': ost,
+                'solarstrahlung_west': west,
+            })
+            nach_name[name] = klimadaten
+            nach_id[ort_id] = klimadaten
+
+        with self._lock:
+            self._nach_name = nach_name
+            self._nach_id = nach_id
+            self._namen = tuple(nach_name)
+            # Seit Beginn des Ladens invalidiert: beim nächsten Zugriff neu laden
+            self._stand = time.monotonic() if generation == self._generation else None
+            self.ladevorgaenge += 1
+
+    def klimadaten(self, name):
+        """Klimadaten zum Ortsnamen oder None, wenn der Ort unbekannt ist"""
+        self._aktueller_stand()
+        return _gezaehlt(self._nach_name.get(name))
+
+    def klimadaten_fuer_id(self, ort_id):
+        """Klimadaten zur Ort-id; unbekannte ids lösen einmal ein Neuladen aus"""
+        self._aktueller_stand()
+        klimadaten = self._nach_id.get(ort_id)
+        if klimadaten is None:
+            self._laden()
+            klimadaten = self._nach_id.get(ort_id)
+        return _gezaehlt(klimadaten)
+
+    async def aklimadaten(self, name):
+        """Wie klimadaten, lädt aber über das asynchrone ORM"""
+        await self._aaktueller_stand()
+        return _gezaehlt(self._nach_name.get(name))
+
+    async def aklimadaten_fuer_id(self, ort_id):
+        """Wie klimadaten_fuer_id, lädt aber über das asynchrone ORM"""
+        await self._aaktueller_stand()
+        klimadaten = self._nach_id.get(ort_id)
+        if klimadaten is None:
+            await self._aladen()
+            klimadaten = self._nach_id.get(ort_id)
+        return _gezaehlt(klimadaten)
+
+    def namen(self):
+        """Namen aller Orte (nach id sortiert)"""
+        self._aktueller_stand()
+        return self._namen
+
+    def invalidieren(self):
+        with self._lock:
+            self._generation += 1
+            self._stand = None
+
+
+klima_register = KlimaRegister()
+
+
+def klimadaten_fuer_ort(name):
+    """Klimadaten zum Ortsnamen, Standard-Klimadaten bei unbekanntem oder fehlendem Ort"""
+    if not name or not isinstance(name, str):
+        return STANDARD_KLIMADATEN
+    return klima_register.klimadaten(name) or STANDARD_KLIMADATEN
+
+
+async def aklimadaten_fuer_ort(name):
+    """Wie klimadaten_fuer_ort, lädt aber über das asynchrone ORM"""
+    if not name or not isinstance(name, str):
+        return STANDARD_KLIMADATEN
+    return await klima_register.aklimadaten(name) or STANDARD_KLIMADATEN
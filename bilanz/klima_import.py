@@ -0,0 +1,173 @@
+"""
+Import von Klimadaten (Orte bzw. Wetterstationen) aus CSV, JSON oder
+JSON Lines
+
+Jeder Datensatz enthält die Felder von Ort (``name``,
+``temperatur_mittel``, ``heizgradtage``, ``solarstrahlung_*``); weitere
+Spalten externer Stationsdateien werden ignoriert, abweichende
+Spaltennamen lassen sich über ``spalten`` zuordnen.
+
+Gespeichert wird blockweise per bulk_create mit update_conflicts auf
+``name``; Orte, deren Werte sich nicht geändert haben, werden nicht
+geschrieben. Da bulk_create keine Signale sendet, wird das
+Klimadaten-Register danach explizit invalidiert.
+"""
+import csv
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .importer import MAX_FEHLER_MELDUNGEN
+from .klima import klima_register
+from .models import Ort
+
+
+KLIMA_FORMATE = ('csv', 'json', 'jsonl')
+KLIMA_FELDER = tuple(feld for feld in Ort._meta.concrete_fields if not feld.primary_key)
+WERT_FELDER = tuple(feld.name for feld in KLIMA_FELDER if feld.name != 'name')
+
+
+def ort_pruefen(daten):
+    """
+    Prüft einen Ort-Datensatz mit den Validatoren der Modellfelder
+
+    Gibt die bereinigten Werte zurück oder wirft einen ValidationError mit
+    einem Dict Feld -> Meldungen.
+    """
+    if not isinstance(daten, dict):
+        raise ValidationError({'zeile': ['Datensatz muss ein JSON-Objekt sein']})
+    fehler = {}
+    werte = {}
+    for feld in KLIMA_FELDER:
+        wert = daten.get(feld.name)
+        if wert is None or wert == '':
+            fehler[feld.name] = ['Pflichtfeld']
+            continue
+        try:
+            werte[feld.name] = feld.clean(wert, None)
+        except ValidationError as e:
+            fehler[feld.name] = e.messages
+    if fehler:
+        raise ValidationError(fehler)
+    return werte
+
+
+def _umbenennen(daten, spalten):
+    if spalten and isinstance(daten, dict):
+        for ziel, quelle in spalten.items():
+            if quelle in daten:
+                daten[ziel] = daten.pop(quelle)
+    return daten
+
+
+def orte_lesen(datei, format, spalten=None):
+    """
+    Liest Ort-Datensätze aus einer Textdatei
+
+    ``spalten`` ordnet Feldnamen von Ort den Spaltennamen der Datei zu.
+    Erzeugt (Zeilen- bzw. Eintragsnummer, Datensatz oder ValidationError).
+    """
+    if format == 'csv':
+        reader = csv.DictReader(datei)
+        for zeile in reader:
+            yield reader.line_num, _umbenennen(zeile, spalten)
+    elif format == 'jsonl':
+        for nummer, zeile in enumerate(datei, start=1):
+            if not zeile.strip():
+                continue
+            try:
+                yield nummer, _umbenennen(json.loads(zeile), spalten)
+            except json.JSONDecodeError as e:
+                yield nummer, ValidationError({'zeile': [f'Ungültiges JSON ({e.msg})']})
+    elif format == 'json':
+        try:
+            eintraege = json.load(datei)
+        except json.JSONDecodeError as e:
+            yield 0, ValidationError({'datei': [f'Ungültiges JSON ({e.msg})']})
+            return
+        if not isinstance(eintraege, list):
+            yield 0, ValidationError({'datei': ['Erwartet ein JSON-Array']})
+            return
+        for nummer, eintrag in enumerate(eintraege, start=1):
+            yield nummer, _umbenennen(eintrag, spalten)
+    else:
+        raise ValueError(f'Unbekanntes Format "{format}"')
+
+
+def _block_speichern(block, aktualisieren):
+    """Speichert einen Block geprüfter Orte; gibt (angelegt, aktualisiert) zurück"""
+    vorhanden = {
+        name: werte
+        for name, *werte in Ort.objects.filter(
+            name__in=[ort['name'] for ort in block]
+        ).values_list('name', *WERT_FELDER)
+    }
+    neu = [ort for ort in block if ort['name'] not in vorhanden]
+    geaendert = [
+        ort for ort in block
+        if aktualisieren and ort['name'] in vorhanden
+        and [ort[feld] for feld in WERT_FELDER] != vorhanden[ort['name']]
+    ]
+    if not neu and not geaendert:
+        return 0, 0
+
+    with transaction.atomic():
+        Ort.objects.bulk_create(
+            [Ort(**ort) for ort in neu + geaendert],
+            update_conflicts=True,
+            unique_fields=['name'],
+            update_fields=list(WERT_FELDER),
+        )
+    return len(neu), len(geaendert)
+
+
+def orte_speichern(datensaetze, block_groesse=1000, aktualisieren=True):
+    """
+    Prüft und speichert Ort-Datensätze aus orte_lesen
+
+    Mit ``aktualisieren=False`` werden vorhandene Orte nicht verändert.
+    Doppelte Namen in der Eingabe werden ab dem zweiten Vorkommen als
+    fehlerhaft gemeldet. Gibt ein Dict mit 'angelegt', 'aktualisiert',
+    'unveraendert', 'fehlerhaft' und 'fehler' (Liste mit 'zeile' und
+    'fehler') zurück.
+    """
+    stand = {'angelegt': 0, 'aktualisiert': 0, 'unveraendert': 0, 'fehlerhaft': 0, 'fehler': []}
+    gesehen = set()
+    block = []
+
+    def fehler_melden(nummer, fehler):
+        stand['fehlerhaft'] += 1
+        if len(stand['fehler']) < MAX_FEHLER_MELDUNGEN:
+            stand['fehler'].append({'zeile': nummer, 'fehler': fehler})
+
+    def block_speichern():
+        angelegt, aktualisiert = _block_speichern(block, aktualisieren)
+        stand['angelegt'] += angelegt
+        stand['aktualisiert'] += aktualisiert
+        stand['unveraendert'] += len(block) - angelegt - aktualisiert
+
+    for nummer, daten in datensaetze:
+        try:
+            if isinstance(daten, ValidationError):
+                raise daten
+            ort = ort_pruefen(daten)
+        except ValidationError as e:
+            fehler_melden(nummer, e.message_dict)
+            continue
+        if ort['name'] in gesehen:
+            fehler_melden(nummer, {'name': [f'Ort "{ort["name"]}" kommt mehrfach vor']})
+            continue
+        gesehen.add(ort['name'])
+
+        block.append(ort)
+        if len(block) >= block_groesse:
+            block_speichern()
+            block = []
+    if block:
+        block_speichern()
+
+    if stand['angelegt'] or stand['aktualisiert']:
+        # bulk_create/bulk_update senden keine Signale, siehe signals.py
+        transaction.on_commit(klima_register.invalidieren)
+    return stand
@@ -0,0 +1,341 @@
+"""
+Stündliche Klimadaten (Testreferenzjahre) je Ort als Memory-Mapped-Datei
+
+Alle Stationen liegen in einer Binärdatei: ein kurzer Kopf (Magic,
+Länge und JSON mit den Ort-ids) und danach je Ort ein float32-Block
+``(len(KANAELE), STUNDEN)``. Die Datei wird schreibgeschützt per
+np.memmap geöffnet; alle Worker-Prozesse teilen sich dieselben Seiten im
+Page-Cache, ein Ort ist nach dem Öffnen ohne Datenbankzugriff und ohne
+Kopie verfügbar.
+
+Geschrieben wird immer eine neue Datei, die per os.replace die alte
+ersetzt; offene Mappings bleiben gültig, get_klima_stunden() öffnet bei
+geänderter Datei neu.
+
+Eingelesen werden DWD-Testreferenzjahre (TRY 2011/2015/2017, .dat),
+EnergyPlus-Wetterdateien (.epw) und CSV mit den Kanälen als Spalten.
+Die Strahlung auf die senkrechten Fassaden wird aus Direkt- und
+Diffusstrahlung mit isotropem Himmelsmodell berechnet.
+"""
+import csv
+import json
+import os
+import struct
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .berechnungen import ORIENTIERUNGEN
+from .berechnungen_batch import TAGE_JE_MONAT
+
+
+MAGIC = b'BILANZKLIMA\x01'
+STUNDEN = 8760
+KANAELE = ('temperatur', 'strahlung_horizontal', *(f'strahlung_{o}' for o in ORIENTIERUNGEN))
+DTYPE = np.dtype('<f4')
+AUSRICHTUNG = 64
+
+# Azimut der Fassaden (Süd = 0, West = +90) und Albedo des Bodens
+FASSADEN_AZIMUT = {'nord': 180.0, 'sued': 0.0, 'ost': -90.0, 'west': 90.0}
+ALBEDO = 0.2
+
+_MONAT_JE_STUNDE = np.repeat(np.arange(12), (TAGE_JE_MONAT * 24).astype(int))
+
+
+class Stundenreihen:
+    """
+    Stundenwerte eines Orts: Lufttemperatur in °C und Strahlung in W/m²
+    (Stundenmittel, entspricht Wh/m² je Stunde)
+    """
+    __slots__ = ('werte',)
+
+    def __init__(self, werte):
+        self.werte = werte
+
+    def __getitem__(self, kanal):
+        return self.werte[KANAELE.index(kanal)]
+
+    def monatswerte(self):
+        """Monatsmitteltemperaturen (°C) und Monatssummen der Strahlung (kWh/m²)"""
+        temperatur = np.bincount(_MONAT_JE_STUNDE, self['temperatur'], minlength=12) / (TAGE_JE_MONAT * 24)
+        strahlung = {
+            kanal: np.bincount(_MONAT_JE_STUNDE, self[kanal], minlength=12) / 1000
+            for kanal in KANAELE[1:]
+        }
+        return {'temperatur': temperatur, **strahlung}
+
+
+# Einlesen
+
+def strahlung_auf_flaechen(tag_im_jahr, stunde, diffus_horizontal, breite, laenge, zeitzone,
+                           direkt_horizontal=None, direkt_normal=None):
+    """
+    Strahlung horizontal und auf die vier Fassaden (W/m²)
+
+    ``stunde`` ist das Ende des Stundenintervalls in Normalzeit der
+    ``zeitzone`` (1 = MEZ); der Sonnenstand wird zur Intervallmitte
+    berechnet. Die Direktstrahlung wird horizontal oder normal zur Sonne
+    angegeben.
+    """
+    tag_im_jahr = np.asarray(tag_im_jahr, dtype=float)
+    phi = np.radians(breite)
+    delta = np.radians(23.45) * np.sin(2 * np.pi * (284 + tag_im_jahr) / 365)
+    b = 2 * np.pi * (tag_im_jahr - 81) / 364
+    zeitgleichung = 9.87 * np.sin(2 * b) - 7.53 * np.cos(b) - 1.5 * np.sin(b)  # Minuten
+    sonnenzeit = np.asarray(stunde, dtype=float) - 0.5 + (4 * (laenge - 15 * zeitzone) + zeitgleichung) / 60
+    omega = np.radians(15 * (sonnenzeit - 12))
+
+    sin_hoehe = np.sin(phi) * np.sin(delta) + np.cos(phi) * np.cos(delta) * np.cos(omega)
+    sonne_oben = sin_hoehe > 0.01
+    diffus_horizontal = np.asarray(diffus_horizontal, dtype=float)
+
+    if direkt_normal is not None:
+        direkt_normal = np.where(sonne_oben, np.asarray(direkt_normal, dtype=float), 0.0)
+        direkt_horizontal = direkt_normal * np.clip(sin_hoehe, 0, None)
+    else:
+        direkt_horizontal = np.asarray(direkt_horizontal, dtype=float)
+        direkt_normal = np.where(sonne_oben, direkt_horizontal / np.where(sonne_oben, sin_hoehe, 1.0), 0.0)
+
+    global_horizontal = direkt_horizontal + diffus_horizontal
+    strahlung = {'strahlung_horizontal': global_horizontal}
+    for orientierung in ORIENTIERUNGEN:
+        gamma = np.radians(FASSADEN_AZIMUT[orientierung])
+        cos_theta = (
+            -np.sin(delta) * np.cos(phi) * np.cos(gamma)
+            + np.cos(delta) * np.sin(phi) * np.cos(gamma) * np.cos(omega)
+            + np.cos(delta) * np.sin(gamma) * np.sin(omega)
+        )
+        strahlung[f'strahlung_{orientierung}'] = (
+            direkt_normal * np.clip(cos_theta, 0, None)
+            + diffus_horizontal * 0.5
+            + global_horizontal * ALBEDO * 0.5
+        )
+    return strahlung
+
+
+def _tag_im_jahr(monat, tag):
+    monatsbeginn = np.concatenate([[0], np.cumsum(TAGE_JE_MONAT)[:-1]])
+    return monatsbeginn[np.asarray(monat, dtype=int) - 1] + np.asarray(tag, dtype=float)
+
+
+def _reihen(temperatur, strahlung):
+    werte = np.empty((len(KANAELE), STUNDEN), dtype=DTYPE)
+    werte[0] = temperatur
+    for i, kanal in enumerate(KANAELE[1:], start=1):
+        werte[i] = strahlung[kanal]
+    return werte
+
+
+def _pruefe_stunden(anzahl, quelle):
+    if anzahl != STUNDEN:
+        raise ValueError(f'{quelle}: {STUNDEN} Stundenwerte erwartet, gefunden {anzahl}')
+
+
+def lese_try(datei, breite, laenge, zeitzone=1):
+    """
+    DWD-Testreferenzjahr (TRY 2011/2015/2017)
+
+    Die Spalten werden über die Kopfzeile vor ``***`` gefunden (t, B, D,
+    MM, DD, HH). Die Koordinaten stehen im TRY nur als Lambert-Projektion
+    und werden deshalb als geographische Breite/Länge übergeben.
+    """
+    spalten = None
+    vorherige = ''
+    zeilen = []
+    for zeile in datei:
+        if spalten is None:
+            if zeile.startswith('***'):
+                spalten = vorherige.split()
+            elif zeile.strip():
+                vorherige = zeile
+            continue
+        if zeile.strip():
+            zeilen.append(zeile.split())
+    if spalten is None:
+        raise ValueError('TRY: Datenbeginn (***) nicht gefunden')
+    try:
+        index = {name: spalten.index(name) for name in ('MM', 'DD', 'HH', 't', 'B', 'D')}
+    except ValueError as e:
+        raise ValueError(f'TRY: Spalte fehlt ({e})')
+    _pruefe_stunden(len(zeilen), 'TRY')
+
+    daten = np.array(zeilen, dtype=float)
+    strahlung = strahlung_auf_flaechen(
+        _tag_im_jahr(daten[:, index['MM']], daten[:, index['DD']]), daten[:, index['HH']],
+        daten[:, index['D']], breite, laenge, zeitzone, direkt_horizontal=daten[:, index['B']],
+    )
+    return _reihen(daten[:, index['t']], strahlung)
+
+
+def lese_epw(datei):
+    """EnergyPlus-Wetterdatei; Koordinaten und Zeitzone aus der LOCATION-Zeile"""
+    reader = csv.reader(datei)
+    kopf = next(reader, None)
+    if not kopf or kopf[0] != 'LOCATION':
+        raise ValueError('EPW: LOCATION-Zeile fehlt')
+    breite, laenge, zeitzone = float(kopf[6]), float(kopf[7]), float(kopf[8])
+    for _ in range(7):
+        next(reader, None)
+
+    zeilen = [(z[1], z[2], z[3], z[6], z[14], z[15]) for z in reader if z]
+    _pruefe_stunden(len(zeilen), 'EPW')
+
+    monat, tag, stunde, temperatur, direkt_normal, diffus = np.array(zeilen, dtype=float).T
+    strahlung = strahlung_auf_flaechen(
+        _tag_im_jahr(monat, tag), stunde, diffus, breite, laenge, zeitzone, direkt_normal=direkt_normal,
+    )
+    return _reihen(temperatur, strahlung)
+
+
+def lese_csv(datei):
+    """CSV mit einer Spalte je Kanal (siehe KANAELE) und einer Zeile je Stunde"""
+    reader = csv.DictReader(datei)
+    fehlend = set(KANAELE) - set(reader.fieldnames or ())
+    if fehlend:
+        raise ValueError(f'CSV: Spalten fehlen: {", ".join(sorted(fehlend))}')
+    zeilen = [[zeile[kanal] for kanal in KANAELE] for zeile in reader]
+    _pruefe_stunden(len(zeilen), 'CSV')
+    return np.array(zeilen, dtype=DTYPE).T.copy()
+
+
+STUNDEN_FORMATE = {
+    'try': lese_try,
+    'epw': lese_epw,
+    'csv': lese_csv,
+}
+
+
+# Speicher
+
+class KlimaStundenSpeicher:
+    """Schreibgeschützter Zugriff auf eine Stundenklima-Datei"""
+
+    def __init__(self, pfad):
+        self.pfad = os.fspath(pfad)
+        with open(self.pfad, 'rb') as datei:
+            if datei.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{self.pfad} ist keine Stundenklima-Datei')
+            (laenge,) = struct.unpack('<Q', datei.read(8))
+            kopf = json.loads(datei.read(laenge))
+        if tuple(kopf['kanaele']) != KANAELE or kopf['stunden'] != STUNDEN:
+            raise ValueError(f'{self.pfad}: Kanäle oder Stunden passen nicht')
+
+        self.ids = kopf['orte']
+        self._zeile = {ort_id: i for i, ort_id in enumerate(self.ids)}
+        self.daten = np.memmap(
+            self.pfad, dtype=DTYPE, mode='r', offset=kopf['daten_ab'],
+            shape=(len(self.ids), len(KANAELE), STUNDEN),
+        ) if self.ids else np.empty((0, len(KANAELE), STUNDEN), dtype=DTYPE)
+
+    def __contains__(self, ort_id):
+        return ort_id in self._zeile
+
+    def __len__(self):
+        return len(self.ids)
+
+    def stundenwerte(self, ort_id):
+        """Stundenreihen des Orts (Sicht auf die Datei, keine Kopie) oder None"""
+        zeile = self._zeile.get(ort_id)
+        if zeile is None:
+            return None
+        return Stundenreihen(self.daten[zeile])
+
+
+def _kopf(ids):
+    kopf = {'kanaele': list(KANAELE), 'stunden': STUNDEN, 'orte': ids, 'daten_ab': 0}
+    # daten_ab hängt von der Länge des Kopfs ab; mit Platzhalter maximaler Länge rechnen
+    laenge = len(json.dumps({**kopf, 'daten_ab': 10 ** 12}).encode())
+    daten_ab = -(-(len(MAGIC) + 8 + laenge) // AUSRICHTUNG) * AUSRICHTUNG
+    kodiert = json.dumps({**kopf, 'daten_ab': daten_ab}).encode()
+    kodiert += b' ' * (daten_ab - len(MAGIC) - 8 - len(kodiert))
+    return MAGIC + struct.pack('<Q', len(kodiert)) + kodiert
+
+
+def klima_stunden_schreiben(pfad, reihen):
+    """
+    Schreibt die Stundenklima-Datei neu
+
+    ``reihen`` ordnet Ort-ids Arrays der Form (len(KANAELE), STUNDEN) zu.
+    Die Datei wird unter einem temporären Namen geschrieben und dann
+    atomar ersetzt.
+    """
+    pfad = os.fspath(pfad)
+    ids = sorted(reihen)
+    temporaer = f'{pfad}.{os.getpid()}.tmp'
+    try:
+        with open(temporaer, 'wb') as datei:
+            datei.write(_kopf(ids))
+            for ort_id in ids:
+                werte = np.asarray(reihen[ort_id], dtype=DTYPE)
+                if werte.shape != (len(KANAELE), STUNDEN):
+                    raise ValueError(f'Ort {ort_id}: Form {werte.shape} statt {(len(KANAELE), STUNDEN)}')
+                datei.write(werte.tobytes())
+        os.replace(temporaer, pfad)
+    finally:
+        if os.path.exists(temporaer):
+            os.unlink(temporaer)
+
+
+def klima_stunden_aktualisieren(pfad, neue_reihen, entfernen=()):
+    """
+    Ergänzt bzw. ersetzt Orte in der Stundenklima-Datei
+
+    Vorhandene Orte werden direkt aus dem Mapping der alten Datei
+    übernommen, ohne sie komplett in den Speicher zu laden.
+    """
+    reihen = {}
+    if os.path.exists(pfad):
+        alt = KlimaStundenSpeicher(pfad)
+        reihen.update((ort_id, alt.daten[i]) for i, ort_id in enumerate(alt.ids))
+    reihen.update(neue_reihen)
+    for ort_id in entfernen:
+        reihen.pop(ort_id, None)
+    klima_stunden_schreiben(pfad, reihen)
+
+
+# Prozessweiter Zugriff
+
+_speicher = None
+_speicher_stand = None
+_speicher_lock = threading.Lock()
+
+
+def get_klima_stunden():
+    """
+    Prozessweiter KlimaStundenSpeicher gemäß settings.BILANZ_KLIMA_STUNDEN
+
+    Gibt None zurück, wenn kein Pfad eingestellt ist oder die Datei fehlt.
+    Eine ersetzte Datei wird beim nächsten Zugriff neu geöffnet.
+    """
+    global _speicher, _speicher_stand
+    pfad = getattr(settings, 'BILANZ_KLIMA_STUNDEN', None)
+    if not pfad:
+        return None
+    try:
+        status = os.stat(pfad)
+    except FileNotFoundError:
+        return None
+    stand = (status.st_ino, status.st_mtime_ns, status.st_size)
+    if stand != _speicher_stand:
+        with _speicher_lock:
+            if stand != _speicher_stand:
+                _speicher = KlimaStundenSpeicher(pfad)
+                _speicher_stand = stand
+    return _speicher
+
+
+def stundenwerte_fuer_ort(ort_id):
+    """Stundenreihen zur Ort-id oder None"""
+    speicher = get_klima_stunden()
+    return speicher.stundenwerte(ort_id) if speicher is not None else None
+
+
+@receiver(setting_changed)
+def _einstellungen_geaendert(sender, setting, **kwargs):
+    global _speicher, _speicher_stand
+    if setting == 'BILANZ_KLIMA_STUNDEN':
+        _speicher = None
+        _speicher_stand = None
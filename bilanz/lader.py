@@ -0,0 +1,102 @@
+"""
+Laden kompletter Gebäude inklusive aller Berechnungseingaben
+
+Ein Gebäude samt PV-Anlage, Lüftung und gespeicherter Berechnung wird per
+select_related in einer Abfrage geladen, Bauteile, Beleuchtungen und Wärmequellen per
+prefetch_related in je einer weiteren; die Klimadaten kommen aus dem
+Klimadaten-Register. Die Anzahl der Abfragen ist damit unabhängig davon,
+wie viele Gebäude geladen werden.
+"""
+from .models import Gebaeude, PVAnlage, Lueftung
+from .berechnungen import GebaeudeEingabe, berechne_energiebilanz
+from .berechnungen_batch import datensatz_aus_objekten
+from .klima import klima_register
+
+
+class BerechnungsEingabe:
+    """
+    Alle Eingaben für berechne_energiebilanz zu einem Gebäude
+    """
+    __slots__ = (
+        'gebaeude', 'eingabe', 'bauteile_dict', 'pv_data', 'lueftung_data',
+        'beleuchtungen_data', 'waermequellen_data', 'klimadaten',
+    )
+
+    def __init__(self, gebaeude, klimadaten=None):
+        self.gebaeude = gebaeude
+        self.eingabe = GebaeudeEingabe.aus_gebaeude(gebaeude)
+        self.bauteile_dict = {bt.typ: bt.u_wert for bt in gebaeude.bauteile.all()}
+        self.pv_data = _optional(gebaeude, 'pv_anlage', PVAnlage)
+        self.lueftung_data = _optional(gebaeude, 'lueftung', Lueftung)
+        self.beleuchtungen_data = list(gebaeude.beleuchtungen.all())
+        self.waermequellen_data = list(gebaeude.waermequellen.all())
+        if klimadaten is None:
+            klimadaten = klima_register.klimadaten_fuer_id(gebaeude.ort_id)
+        self.klimadaten = klimadaten
+
+    def argumente(self):
+        """Argumente in der Reihenfolge von berechne_energiebilanz"""
+        return (
+            self.eingabe, self.bauteile_dict, self.pv_data, self.lueftung_data,
+            self.beleuchtungen_data, self.waermequellen_data, self.klimadaten,
+        )
+
+    def berechnen(self):
+        return berechne_energiebilanz(*self.argumente())
+
+    def datensatz(self):
+        """Datensatz für die Batch-Berechnung"""
+        return datensatz_aus_objekten(*self.argumente())
+
+
+def _optional(gebaeude, feld, modell):
+    """Optionale 1:1-Relation oder None, wenn sie nicht existiert"""
+    try:
+        return getattr(gebaeude, feld)
+    except modell.DoesNotExist:
+        return None
+
+
+def gebaeude_mit_eingaben():
+    """QuerySet über Gebäude mit allen für die Berechnung nötigen Relationen"""
+    return Gebaeude.objects.select_related(
+        'pv_anlage', 'lueftung', 'berechnung',
+    ).prefetch_related(
+        'bauteile', 'beleuchtungen', 'waermequellen',
+    )
+
+
+def lade_berechnungseingaben(gebaeude_ids):
+    """
+    Lädt die Berechnungseingaben mehrerer Gebäude
+
+    Gibt ein Dict id -> BerechnungsEingabe in der Reihenfolge von
+    ``gebaeude_ids`` zurück; unbekannte ids fehlen im Ergebnis.
+    """
+    gebaeude_ids = list(gebaeude_ids)
+    geladen = {g.id: g for g in gebaeude_mit_eingaben().filter(id__in=gebaeude_ids)}
+    return {
+        gebaeude_id: BerechnungsEingabe(geladen[gebaeude_id])
+        for gebaeude_id in gebaeude_ids if gebaeude_id in geladen
+    }
+
+
+def lade_berechnungseingabe(gebaeude_id):
+    """
+    Lädt die Berechnungseingaben eines Gebäudes
+
+    Wirft Gebaeude.DoesNotExist, wenn es das Gebäude nicht gibt.
+    """
+    return BerechnungsEingabe(gebaeude_mit_eingaben().get(id=gebaeude_id))
+
+
+async def alade_berechnungseingabe(gebaeude_id):
+    """
+    Wie lade_berechnungseingabe, über das asynchrone ORM
+
+    Relationen werden wie im synchronen Fall per select_related und
+    prefetch_related mitgeladen.
+    """
+    gebaeude = await gebaeude_mit_eingaben().aget(id=gebaeude_id)
+    klimadaten = await klima_register.aklimadaten_fuer_id(gebaeude.ort_id)
+    return BerechnungsEingabe(gebaeude, klimadaten)
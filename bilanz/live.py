@@ -0,0 +1,141 @@
+"""
+Live-Berechnung mit Berechnungskontext in der Session
+
+Der Wizard öffnet einmal einen Kontext mit allen Parametern (bzw. denen
+des Gebäudes aus der Session) und schickt danach nur noch geänderte
+Parameter. Zurückgegeben werden nur die Ergebnisfelder, die sich dadurch
+geändert haben. Berechnet wird über den Term-Cache, sodass nur die von
+der Änderung betroffenen Bilanzterme neu berechnet werden.
+
+In der Session stehen nur Version und Parameter; das Ergebnis wird bei
+Bedarf über den Term-Cache neu gebildet. Ändert ein Delta die Parameter
+nicht, wird die Session nicht geschrieben.
+"""
+from .berechnungen import berechne_energiebilanz_inkrementell
+from .cache import get_term_cache
+from .eingaben import (
+    PARAMETER_NAMEN, gebaeude_eingabe_aus_parametern, bauteile_aus_parametern,
+    parameter_aus_gebaeude,
+)
+from .klima import klimadaten_fuer_ort
+from .models import Gebaeude
+
+
+SITZUNGS_SCHLUESSEL = 'berechnung_kontext'
+
+# Fehler ungültiger Parameter, auch aus der Berechnung selbst (z. B. personendichte=0)
+BERECHNUNGSFEHLER = (TypeError, ValueError, ArithmeticError)
+
+
+class KeinKontext(Exception):
+    """Es ist kein Berechnungskontext in der Session geöffnet"""
+
+
+def pruefe_parameter(parameter):
+    """Wirft einen ValueError bei Parameternamen, die berechnung_api nicht kennt"""
+    unbekannt = set(parameter) - PARAMETER_NAMEN
+    if unbekannt:
+        raise ValueError(f'Unbekannte Parameter: {", ".join(sorted(unbekannt))}')
+
+
+def parameter_anwenden(parameter, delta):
+    """Neue Parameter aus ``parameter`` und den Änderungen (None entfernt einen Parameter)"""
+    pruefe_parameter(delta)
+    neu = dict(parameter)
+    for name, wert in delta.items():
+        if wert is None:
+            neu.pop(name, None)
+        else:
+            neu[name] = wert
+    return neu
+
+
+def berechne_live(parameter, klimadaten=None):
+    """
+    Vollständiges Ergebnis zu den Parametern, über den Term-Cache berechnet
+
+    Ohne ``klimadaten`` werden die des Orts aus den Parametern verwendet.
+    """
+    if klimadaten is None:
+        klimadaten = klimadaten_fuer_ort(parameter.get('ort'))
+    werte, _ = berechne_energiebilanz_inkrementell(
+        gebaeude_eingabe_aus_parametern(parameter),
+        bauteile_aus_parametern(parameter),
+        None, None, [], [],
+        klimadaten,
+        cache=get_term_cache(),
+    )
+    return werte['energiebilanz']
+
+
+def ergebnis_aenderungen(alt, neu):
+    """Felder aus ``neu``, deren Wert sich gegenüber ``alt`` geändert hat, je Block"""
+    aenderungen = {}
+    for block, felder in neu.items():
+        alter_block = alt.get(block, {})
+        geaendert = {
+            feld: wert for feld, wert in felder.items()
+            if feld not in alter_block or alter_block[feld] != wert
+        }
+        if geaendert:
+            aenderungen[block] = geaendert
+    return aenderungen
+
+
+def kontext_oeffnen(session, parameter=None):
+    """
+    Öffnet (bzw. ersetzt) den Berechnungskontext der Session
+
+    Ist in der Session ein Gebäude gespeichert, bilden dessen Werte die
+    Ausgangsparameter, ``parameter`` überschreibt sie. Gibt den Kontext
+    mit dem vollständigen Ergebnis zurück.
+    """
+    parameter = dict(parameter or {})
+    pruefe_parameter(parameter)
+
+    gebaeude_id = session.get('gebaeude_id')
+    if gebaeude_id:
+        gebaeude = (
+            Gebaeude.objects.select_related('ort').prefetch_related('bauteile')
+            .filter(id=gebaeude_id).first()
+        )
+        if gebaeude is not None:
+            parameter = {**parameter_aus_gebaeude(gebaeude), **parameter}
+
+    ergebnis = berechne_live(parameter)
+    session[SITZUNGS_SCHLUESSEL] = {'version': 1, 'parameter': parameter}
+    return {'version': 1, 'parameter': parameter, 'ergebnis': ergebnis}
+
+
+def kontext_aendern(session, delta):
+    """
+    Übernimmt geänderte Parameter in den Kontext (None entfernt einen Parameter)
+
+    Gibt (Version, geänderte Ergebnisfelder) zurück. Ungültige Werte lösen
+    einen der BERECHNUNGSFEHLER aus, der Kontext bleibt dann unverändert.
+    """
+    kontext = session.get(SITZUNGS_SCHLUESSEL)
+    if kontext is None:
+        raise KeinKontext()
+    parameter = parameter_anwenden(kontext['parameter'], delta)
+    if parameter == kontext['parameter']:
+        return kontext['version'], {}
+    ergebnis = berechne_live(parameter)
+    # Das alte Ergebnis kommt aus dem Term-Cache
+    aenderungen = ergebnis_aenderungen(berechne_live(kontext['parameter']), ergebnis)
+
+    version = kontext['version'] + 1
+    session[SITZUNGS_SCHLUESSEL] = {'version': version, 'parameter': parameter}
+    return version, aenderungen
+
+
+def kontext_laden(session):
+    """Gibt den Kontext der Session mit dem vollständigen Ergebnis zurück"""
+    kontext = session.get(SITZUNGS_SCHLUESSEL)
+    if kontext is None:
+        raise KeinKontext()
+    return {**kontext, 'ergebnis': berechne_live(kontext['parameter'])}
+
+
+def kontext_schliessen(session):
+    session.pop(SITZUNGS_SCHLUESSEL, None)
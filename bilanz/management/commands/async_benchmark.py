@@ -0,0 +1,137 @@
+"""
+Nebenläufigkeits-Benchmark der synchronen und asynchronen Berechnungs-Views
+
+Die Anfragen laufen in-process über die ASGI-Anwendung aus
+energiebilanz/asgi.py, mit ``--gleichzeitig`` parallelen Verbindungen auf
+einer Event-Loop wie bei einem uvicorn-Worker. Synchrone Views laufen
+dabei über sync_to_async nacheinander im selben Thread, die asynchronen
+Views (/api/async/...) nur für die Berechnung im begrenzten Executor.
+
+    python manage.py async_benchmark --anzahl 2000 --gleichzeitig 50
+    python manage.py async_benchmark --gebaeude 1
+
+Für Messungen mit echtem Server und Netzwerk:
+
+    uvicorn energiebilanz.asgi:application --workers 1
+    hey -n 2000 -c 50 'http://127.0.0.1:8000/api/async/berechnung/?laenge_ns=20'
+"""
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from bilanz.models import Gebaeude
+
+
+async def _anfrage(anwendung, pfad, query):
+    """Eine GET-Anfrage direkt über das ASGI-Protokoll, gibt den Status zurück"""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': pfad,
+        'raw_path': pfad.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'localhost')],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    gesendet = False
+
+    async def receive():
+        nonlocal gesendet
+        if not gesendet:
+            gesendet = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # Verbindung bleibt offen, bis die Antwort gesendet ist
+        await asyncio.Event().wait()
+
+    status = None
+
+    async def send(nachricht):
+        nonlocal status
+        if nachricht['type'] == 'http.response.start':
+            status = nachricht['status']
+
+    await anwendung(scope, receive, send)
+    return status
+
+
+async def _last(anwendung, anfragen, gleichzeitig):
+    """Schickt alle Anfragen mit ``gleichzeitig`` parallelen Verbindungen"""
+    warteschlange = list(reversed(anfragen))
+    dauern = []
+    fehler = 0
+
+    async def verbindung():
+        nonlocal fehler
+        while warteschlange:
+            pfad, query = warteschlange.pop()
+            start = time.perf_counter()
+            if await _anfrage(anwendung, pfad, query) != 200:
+                fehler += 1
+            dauern.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(verbindung() for _ in range(gleichzeitig)))
+    gesamt = time.perf_counter() - start
+
+    dauern.sort()
+    return {
+        'anfragen_pro_s': len(dauern) / gesamt,
+        'median_ms': statistics.median(dauern) * 1000,
+        'p95_ms': dauern[int(len(dauern) * 0.95) - 1] * 1000,
+        'fehler': fehler,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Vergleicht synchrone und asynchrone Berechnungs-Views unter paralleler Last (ASGI)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--anzahl', type=int, default=2000, help='Anfragen pro View')
+        parser.add_argument('--gleichzeitig', type=int, default=50, help='Parallele Verbindungen')
+        parser.add_argument('--gebaeude', type=int, help='Gebäude-id für gebaeude_berechnung')
+        parser.add_argument('--json', action='store_true', help='Ergebnis als JSON ausgeben')
+
+    def handle(self, *args, **options):
+        from energiebilanz.asgi import application
+
+        anzahl = options['anzahl']
+        # Unterschiedliche U-Werte, damit der Ergebnis-Cache nicht alles abfängt
+        queries = [
+            urlencode({'laenge_ns': 20, 'breite_ow': 15, 'geschosse': 3, 'u_wert_dach': 0.1 + i * 1e-6})
+            for i in range(anzahl)
+        ]
+        varianten = {
+            'sync': [(reverse('berechnung_api'), q) for q in queries],
+            'async': [(reverse('berechnung_api_async'), q) for q in queries],
+        }
+        if options['gebaeude'] is not None:
+            if not Gebaeude.objects.filter(id=options['gebaeude']).exists():
+                raise CommandError(f'Gebäude {options["gebaeude"]} existiert nicht')
+            for name, view in (('sync_gebaeude', 'gebaeude_berechnung'),
+                               ('async_gebaeude', 'gebaeude_berechnung_async')):
+                varianten[name] = [(reverse(view, args=[options['gebaeude']]), '')] * anzahl
+
+        ergebnisse = {
+            name: asyncio.run(_last(application, anfragen, options['gleichzeitig']))
+            for name, anfragen in varianten.items()
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(ergebnisse, indent=2))
+            return
+        for name, werte in ergebnisse.items():
+            self.stdout.write(
+                f'{name:15s} {werte["anfragen_pro_s"]:8.0f} Anfragen/s   '
+                f'median {werte["median_ms"]:7.2f} ms   p95 {werte["p95_ms"]:7.2f} ms   '
+                f'Fehler {werte["fehler"]}'
+            )
@@ -0,0 +1,119 @@
+"""
+Benchmark-Suite mit Baseline-Vergleich
+
+    python manage.py benchmark --ausgabe benchmark.json
+    python manage.py benchmark --baseline benchmark.json --schwelle 0.1 --schwelle-fuer 'api.*=0.3'
+    python manage.py benchmark --nur 'funktion.*' --nur 'batch.jahr.*'
+
+Mit --baseline wird jede Messung mit der Baseline verglichen; ist ein
+Benchmark um mehr als die Schwelle langsamer, endet der Befehl mit einem
+Fehler (Exit-Code 1), z.B. für CI.
+"""
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bilanz.benchmark import (
+    BATCH_GROESSEN, BENCHMARK_VERSION, STANDARD_MIN_ZEIT, STANDARD_SCHWELLE, STANDARD_WIEDERHOLUNGEN,
+    api_daten, auswaehlen, benchmarks, messen, umgebung, vergleichen,
+)
+from bilanz.eingaben import zuweisung_lesen
+
+
+def _zeit(sekunden):
+    if sekunden < 1e-3:
+        return f'{sekunden * 1e6:.1f} µs'
+    if sekunden < 1:
+        return f'{sekunden * 1e3:.2f} ms'
+    return f'{sekunden:.2f} s'
+
+
+class Command(BaseCommand):
+    help = 'Misst Rechenkern, Batch-Berechnung und API-Endpoints und vergleicht mit einer Baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ausgabe', help='Ergebnisse als JSON speichern (z.B. als neue Baseline)')
+        parser.add_argument('--baseline', help='JSON-Datei einer früheren Messung zum Vergleich')
+        parser.add_argument(
+            '--schwelle', type=float, default=STANDARD_SCHWELLE,
+            help='Erlaubte relative Verlangsamung (Standard: 0.2 = 20 %%)',
+        )
+        parser.add_argument(
+            '--schwelle-fuer', action='append', default=[], metavar='MUSTER=WERT',
+            help='Eigene Schwelle für Benchmarks, die auf das Muster passen, z.B. api.*=0.3',
+        )
+        parser.add_argument('--nur', action='append', default=[], metavar='MUSTER', help='Nur passende Benchmarks')
+        parser.add_argument('--min-zeit', type=float, default=STANDARD_MIN_ZEIT, help='Sekunden je Wiederholung')
+        parser.add_argument('--wiederholungen', type=int, default=STANDARD_WIEDERHOLUNGEN)
+        parser.add_argument(
+            '--max-batch', type=int, default=BATCH_GROESSEN[-1], help='Größte Batch-Größe (Standard: 100000)',
+        )
+        parser.add_argument('--ohne-api', action='store_true', help='Endpoints nicht messen (keine Datenbank nötig)')
+
+    def handle(self, *args, **options):
+        try:
+            schwellen = {muster: float(wert) for muster, wert in map(zuweisung_lesen, options['schwelle_fuer'])}
+        except ValueError as e:
+            raise CommandError(f'--schwelle-fuer: {e}')
+        if options['wiederholungen'] < 1 or options['min_zeit'] <= 0:
+            raise CommandError('--wiederholungen muss >= 1 und --min-zeit > 0 sein')
+
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as datei:
+                    baseline = json.load(datei)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Baseline {options["baseline"]}: {e}')
+            if baseline.get('version') != BENCHMARK_VERSION:
+                raise CommandError(f'Baseline hat Version {baseline.get("version")}, erwartet {BENCHMARK_VERSION}')
+
+        batch_groessen = [n for n in BATCH_GROESSEN if n <= options['max_batch']]
+        start = time.perf_counter()
+        if options['ohne_api']:
+            ergebnisse = self._messen(benchmarks(None, batch_groessen), options)
+        else:
+            with api_daten() as client:
+                ergebnisse = self._messen(benchmarks(client, batch_groessen), options)
+        if not ergebnisse:
+            raise CommandError('Keine Benchmarks ausgewählt')
+
+        if options['ausgabe']:
+            with open(options['ausgabe'], 'w', encoding='utf-8') as datei:
+                json.dump({
+                    'version': BENCHMARK_VERSION,
+                    'umgebung': umgebung(),
+                    'ergebnisse': ergebnisse,
+                }, datei, indent=2)
+                datei.write('\n')
+
+        regressionen = []
+        if baseline is not None:
+            vergleich = vergleichen(ergebnisse, baseline['ergebnisse'], options['schwelle'], schwellen)
+            self.stdout.write('')
+            for eintrag in vergleich:
+                if eintrag['baseline'] is None:
+                    text = 'neu'
+                else:
+                    text = f'{_zeit(eintrag["baseline"])} -> {_zeit(eintrag["aktuell"])} ({eintrag["aenderung"]:+.1%})'
+                zeile = f'{eintrag["name"]:<48} {text}'
+                if eintrag['regression']:
+                    regressionen.append(eintrag['name'])
+                    zeile = self.style.ERROR(zeile + '  REGRESSION')
+                self.stdout.write(zeile)
+
+        self.stderr.write(f'{len(ergebnisse)} Benchmarks in {time.perf_counter() - start:.1f} s gemessen')
+        if regressionen:
+            raise CommandError(f'{len(regressionen)} Regression(en): {", ".join(regressionen)}')
+
+    def _messen(self, alle, options):
+        ergebnisse = {}
+        for name in auswaehlen(alle, options['nur']):
+            messung = messen(alle[name], options['min_zeit'], options['wiederholungen'])
+            ergebnisse[name] = messung
+            self.stdout.write(
+                f'{name:<48} {_zeit(messung["min"]):>10}  (Median {_zeit(messung["median"])}, '
+                f'{messung["aufrufe"]} x {messung["wiederholungen"]})'
+            )
+        return ergebnisse
@@ -0,0 +1,105 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import multiprocessing
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from bilanz.ergebnisse import berechnungen_speichern
+from bilanz.models import Gebaeude
+from bilanz.parallel import berechne_block, worker_initialisieren
+
+
+def _bloecke(iterator, groesse):
+    while True:
+        block = list(islice(iterator, groesse))
+        if not block:
+            return
+        yield block
+
+
+class Command(BaseCommand):
+    help = 'Berechnet die Energiebilanz aller Gebäude parallel und speichert die Ergebnisse'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--worker', type=int, default=os.cpu_count() or 1,
+            help='Anzahl der Worker-Prozesse (0: im eigenen Prozess rechnen)',
+        )
+        parser.add_argument('--chunk', type=int, default=500, help='Gebäude pro Block')
+        parser.add_argument(
+            '--ab', type=int, default=0, metavar='ID',
+            help='Nur Gebäude mit id > ID berechnen (Fortsetzen nach Abbruch)',
+        )
+        parser.add_argument(
+            '--alle', action='store_true',
+            help='Auch Gebäude mit unveränderten Eingaben neu berechnen',
+        )
+
+    def handle(self, *args, **options):
+        if options['worker'] < 0 or options['chunk'] < 1:
+            raise CommandError('--worker muss >= 0 und --chunk >= 1 sein')
+
+        self.verbosity = options['verbosity']
+        gebaeude = Gebaeude.objects.filter(id__gt=options['ab']).order_by('id')
+        self.gesamt = gebaeude.count()
+        self.fertig = 0
+        self.angelegt = 0
+        self.aktualisiert = 0
+        self.letzte_id = options['ab']
+        self.start = time.perf_counter()
+        self.letzte_meldung = 0
+
+        ids = gebaeude.values_list('id', flat=True).iterator(chunk_size=options['chunk'])
+        bloecke = _bloecke(ids, options['chunk'])
+
+        if options['worker'] == 0:
+            for block in bloecke:
+                self._speichern(block, berechne_block(block, options['alle']))
+        else:
+            self._parallel(bloecke, options['worker'], options['alle'])
+
+        dauer = time.perf_counter() - self.start
+        self.stdout.write(self.style.SUCCESS(
+            f'{self.fertig} Gebäude in {dauer:.1f} s ({self.fertig / dauer if dauer else 0:.0f}/s): '
+            f'{self.angelegt} angelegt, {self.aktualisiert} aktualisiert, '
+            f'{self.fertig - self.angelegt - self.aktualisiert} unverändert; letzte id {self.letzte_id}'
+        ))
+
+    def _parallel(self, bloecke, worker, erzwingen):
+        # Worker bauen eigene Verbindungen auf; Blöcke werden in Reihenfolge
+        # gespeichert, damit --ab nach einem Abbruch keine Lücken lässt
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=worker,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=worker_initialisieren,
+        ) as pool:
+            offen = deque()
+            for block in bloecke:
+                offen.append((block, pool.submit(berechne_block, block, erzwingen)))
+                while len(offen) > 2 * worker:
+                    block, future = offen.popleft()
+                    self._speichern(block, future.result())
+            while offen:
+                block, future = offen.popleft()
+                self._speichern(block, future.result())
+
+    def _speichern(self, block, zeilen):
+        angelegt, aktualisiert = berechnungen_speichern(zeilen)
+        self.angelegt += angelegt
+        self.aktualisiert += aktualisiert
+        self.fertig += len(block)
+        self.letzte_id = block[-1]
+
+        jetzt = time.perf_counter()
+        if self.verbosity >= 1 and (jetzt - self.letzte_meldung >= 1 or self.fertig == self.gesamt):
+            self.letzte_meldung = jetzt
+            dauer = jetzt - self.start
+            self.stderr.write(
+                f'{self.fertig}/{self.gesamt} Gebäude, {self.fertig / dauer:.0f}/s, '
+                f'letzte id {self.letzte_id}'
+            )
@@ -0,0 +1,108 @@
+import csv
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bilanz.eingaben import PARAMETER_NAMEN
+from bilanz.models import Ort
+from bilanz.portfolio import portfolio_erzeugen, portfolio_speichern
+
+
+FORMAT_ENDUNGEN = {
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.csv': 'csv',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Erzeugt einen reproduzierbaren synthetischen Gebäudebestand samt Relationen '
+        'und optional eine Parameterdatei für API-Lasttests'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('anzahl', type=int, help='Anzahl der Gebäude')
+        parser.add_argument('--seed', type=int, default=0, help='Seed des Zufallsgenerators')
+        parser.add_argument(
+            '--parameter', help='Parameterdatei im Format von berechnung_api (.jsonl oder .csv)',
+        )
+        parser.add_argument('--ort', action='append', help='Nur diese Orte verwenden (mehrfach möglich)')
+        parser.add_argument('--praefix', default='Synthetisch', help='Präfix der Gebäudenamen')
+        parser.add_argument('--block', type=int, default=5000, help='Gebäude pro Transaktion')
+        parser.add_argument(
+            '--nur-parameter', action='store_true', help='Nur die Parameterdatei schreiben, nichts speichern',
+        )
+
+    def handle(self, *args, **options):
+        if options['anzahl'] < 1:
+            raise CommandError('anzahl muss mindestens 1 sein')
+        if options['block'] < 1:
+            raise CommandError('--block muss mindestens 1 sein')
+        if options['nur_parameter'] and not options['parameter']:
+            raise CommandError('--nur-parameter braucht --parameter')
+
+        format = None
+        if options['parameter']:
+            format = FORMAT_ENDUNGEN.get(os.path.splitext(options['parameter'])[1].lower())
+            if format is None:
+                raise CommandError('Parameterdatei muss auf .jsonl, .ndjson oder .csv enden')
+
+        orte = Ort.objects.order_by('id')
+        if options['ort']:
+            orte = orte.filter(name__in=options['ort'])
+            unbekannt = set(options['ort']) - set(orte.values_list('name', flat=True))
+            if unbekannt:
+                raise CommandError(f'Unbekannte Orte: {", ".join(sorted(unbekannt))}')
+        orte = list(orte)
+        if not orte:
+            raise CommandError('Keine Orte vorhanden, zuerst load_klimadaten ausführen')
+
+        gebaeude = portfolio_erzeugen(options['anzahl'], options['seed'], orte, options['praefix'])
+        start = time.perf_counter()
+        datei = None
+        try:
+            if options['parameter']:
+                try:
+                    datei = open(options['parameter'], 'w', encoding='utf-8', newline='')
+                except OSError as e:
+                    raise CommandError(str(e))
+                gebaeude = _parameter_schreiben(gebaeude, datei, format)
+
+            if options['nur_parameter']:
+                angelegt = sum(1 for _ in gebaeude)
+            else:
+                def fortschritt(angelegt):
+                    if options['verbosity'] >= 1:
+                        dauer = time.perf_counter() - start
+                        self.stderr.write(f'{angelegt} Gebäude angelegt ({angelegt / dauer:.0f}/s)')
+
+                angelegt = portfolio_speichern(gebaeude, options['block'], fortschritt)
+        finally:
+            if datei is not None:
+                datei.close()
+
+        dauer = time.perf_counter() - start
+        meldung = f'{angelegt} Gebäude in {dauer:.1f} s erzeugt'
+        if options['nur_parameter']:
+            meldung = f'{angelegt} Parametersätze in {dauer:.1f} s geschrieben'
+        if options['parameter']:
+            meldung += f', Parameter in {options["parameter"]}'
+        self.stdout.write(self.style.SUCCESS(meldung))
+
+
+def _parameter_schreiben(gebaeude, datei, format):
+    """Schreibt die Parametersätze mit, während die Gebäude weitergereicht werden"""
+    if format == 'csv':
+        writer = csv.DictWriter(datei, fieldnames=sorted(PARAMETER_NAMEN), lineterminator='\n')
+        writer.writeheader()
+        schreiben = writer.writerow
+    else:
+        def schreiben(parameter):
+            datei.write(json.dumps(parameter, ensure_ascii=False) + '\n')
+
+    for zeile, parameter in gebaeude:
+        schreiben(parameter)
+        yield zeile, parameter
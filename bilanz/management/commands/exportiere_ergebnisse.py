@@ -0,0 +1,80 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bilanz.berechnungen import ergebnis_auswahl
+from bilanz.export import EXPORT_FORMATE, EXPORT_QUELLEN, STANDARD_BLOCK, ergebnisse_iterieren, export_zeilen
+
+
+FORMAT_ENDUNGEN = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+}
+
+
+def _liste(text):
+    return [t for t in (text or '').split(',') if t]
+
+
+class Command(BaseCommand):
+    help = 'Exportiert die Berechnungsergebnisse der Gebäude als JSON Lines oder CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ausgabe', help='Ausgabedatei (Standard: stdout)')
+        parser.add_argument('--format', choices=EXPORT_FORMATE, help='Standard: nach Dateiendung, sonst jsonl')
+        parser.add_argument(
+            '--quelle', choices=EXPORT_QUELLEN, default='aktuell',
+            help='gespeichert: nur gespeicherte Berechnungen ausgeben, nichts neu berechnen',
+        )
+        parser.add_argument('--ort', help='Nur Gebäude dieses Orts')
+        parser.add_argument('--gebaeudeart', help='Nur Gebäude dieser Art')
+        parser.add_argument('--ab', type=int, metavar='ID', help='Nur Gebäude mit id > ID')
+        parser.add_argument('--blocks', help='Ergebnisblöcke, kommagetrennt')
+        parser.add_argument('--fields', help='Ergebnisfelder, kommagetrennt')
+        parser.add_argument('--block', type=int, default=STANDARD_BLOCK, help='Gebäude pro Abfrage')
+
+    def handle(self, *args, **options):
+        format = options['format']
+        if format is None and options['ausgabe']:
+            format = FORMAT_ENDUNGEN.get(os.path.splitext(options['ausgabe'])[1].lower())
+        format = format or 'jsonl'
+        if options['block'] < 1:
+            raise CommandError('--block muss mindestens 1 sein')
+
+        auswahl = None
+        if options['blocks'] or options['fields']:
+            try:
+                auswahl = ergebnis_auswahl(_liste(options['blocks']), _liste(options['fields']))
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        start = time.perf_counter()
+        anzahl = 0
+
+        def gezaehlt(ergebnisse):
+            nonlocal anzahl
+            for eintrag in ergebnisse:
+                anzahl += 1
+                yield eintrag
+
+        ergebnisse = ergebnisse_iterieren(
+            options['quelle'], auswahl, options['block'],
+            ort=options['ort'], gebaeudeart=options['gebaeudeart'], ab=options['ab'],
+        )
+        ausgabe = open(options['ausgabe'], 'w', encoding='utf-8', newline='') if options['ausgabe'] else self.stdout
+        try:
+            for teil in export_zeilen(format, gezaehlt(ergebnisse), auswahl):
+                if ausgabe is self.stdout:
+                    ausgabe.write(teil, ending='')
+                else:
+                    ausgabe.write(teil)
+        finally:
+            if ausgabe is not self.stdout:
+                ausgabe.close()
+
+        dauer = time.perf_counter() - start
+        self.stderr.write(self.style.SUCCESS(
+            f'{anzahl} Gebäude in {dauer:.1f} s exportiert ({anzahl / dauer if dauer else 0:.0f}/s)'
+        ))
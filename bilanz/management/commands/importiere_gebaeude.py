@@ -0,0 +1,66 @@
+import codecs
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bilanz.importer import IMPORT_FORMATE, datensaetze_lesen, importieren
+
+
+FORMAT_ENDUNGEN = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+}
+
+
+class Command(BaseCommand):
+    help = 'Importiert Gebäude mit Bauteilen, PV, Lüftung, Beleuchtung und Wärmequellen aus CSV oder JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('datei', help='Eingabedatei (- für stdin)')
+        parser.add_argument('--format', choices=IMPORT_FORMATE, help='Standard: nach Dateiendung')
+        parser.add_argument('--block', type=int, default=1000, help='Gebäude pro Transaktion')
+
+    def handle(self, *args, **options):
+        format = options['format'] or FORMAT_ENDUNGEN.get(os.path.splitext(options['datei'])[1].lower())
+        if format is None:
+            raise CommandError('Format nicht erkennbar, bitte --format angeben')
+        if options['block'] < 1:
+            raise CommandError('--block muss mindestens 1 sein')
+
+        start = time.perf_counter()
+
+        def fortschritt(stand):
+            dauer = time.perf_counter() - start
+            self.stderr.write(
+                f'{stand["angelegt"]} Gebäude importiert ({stand["angelegt"] / dauer:.0f}/s), '
+                f'{stand["fehlerhaft"]} fehlerhaft'
+            )
+
+        if options['datei'] == '-':
+            datei = codecs.getreader('utf-8-sig')(sys.stdin.buffer)
+        else:
+            try:
+                datei = open(options['datei'], encoding='utf-8-sig', newline='')
+            except OSError as e:
+                raise CommandError(str(e))
+
+        try:
+            stand = importieren(
+                datensaetze_lesen(datei, format), options['block'],
+                fortschritt if options['verbosity'] >= 1 else None,
+            )
+        finally:
+            if options['datei'] != '-':
+                datei.close()
+
+        for meldung in stand['fehler']:
+            fehler = '; '.join(f'{feld}: {" ".join(texte)}' for feld, texte in meldung['fehler'].items())
+            self.stderr.write(self.style.WARNING(f'Zeile {meldung["zeile"]}: {fehler}'))
+
+        dauer = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'{stand["angelegt"]} Gebäude in {dauer:.1f} s importiert, {stand["fehlerhaft"]} fehlerhaft'
+        ))
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import statistics
+import time
+
+from asgiref.testing import ApplicationCommunicator
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from bilanz.websocket import WEBSOCKET_PFAD, live_berechnung_websocket
+
+
+# Eingabefolge wie beim Tippen im Bauteil-Schritt
+BASIS_PARAMETER = {
+    'laenge_ns': '20', 'breite_ow': '15', 'geschosse': '3', 'geschosshoehe': '2.8',
+    'fenster_sued': '20', 'fenster_nord': '5', 'u_wert_dach': '0.2', 'u_wert_wand_sued': '0.3',
+}
+
+
+def _tastenanschlaege(anzahl):
+    for i in range(anzahl):
+        yield {'u_wert_wand_sued': f'{0.1 + (i % 40) / 100:.2f}'}
+
+
+def _kennzahlen(dauern):
+    dauern = sorted(d * 1e6 for d in dauern)
+    return {
+        'median_us': statistics.median(dauern),
+        'p95_us': dauern[int(len(dauern) * 0.95) - 1],
+        'max_us': dauern[-1],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Vergleicht die Latenz der Live-Berechnung: fetch pro Tastenanschlag vs. WebSocket'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--anzahl', type=int, default=500, help='Anzahl der Aktualisierungen')
+        parser.add_argument('--json', action='store_true', help='Ergebnis als JSON ausgeben')
+
+    def handle(self, *args, **options):
+        anzahl = options['anzahl']
+        ergebnisse = {
+            'fetch': _kennzahlen(self._fetch(anzahl)),
+            'websocket': _kennzahlen(asyncio.run(self._websocket(anzahl))),
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(ergebnisse, indent=2))
+            return
+        for name, werte in ergebnisse.items():
+            self.stdout.write(
+                f'{name:10s} median {werte["median_us"]:8.0f} µs   '
+                f'p95 {werte["p95_us"]:8.0f} µs   max {werte["max_us"]:8.0f} µs'
+            )
+        faktor = ergebnisse['fetch']['median_us'] / ergebnisse['websocket']['median_us']
+        self.stdout.write(self.style.SUCCESS(f'WebSocket {faktor:.1f}x schneller (Median)'))
+
+    def _fetch(self, anzahl):
+        """Bisheriger Weg: voller Query-String über den kompletten Django-Stack"""
+        client = Client()
+        url = reverse('berechnung_api')
+        parameter = dict(BASIS_PARAMETER)
+        dauern = []
+        for delta in _tastenanschlaege(anzahl):
+            parameter.update(delta)
+            start = time.perf_counter()
+            response = client.get(url, parameter)
+            response.json()
+            dauern.append(time.perf_counter() - start)
+        return dauern
+
+    async def _websocket(self, anzahl):
+        """Eine Verbindung, pro Tastenanschlag nur die Änderung"""
+        verbindung = ApplicationCommunicator(
+            live_berechnung_websocket, {'type': 'websocket', 'path': WEBSOCKET_PFAD},
+        )
+        await verbindung.send_input({'type': 'websocket.connect'})
+        await verbindung.receive_output()
+        await verbindung.send_input({
+            'type': 'websocket.receive', 'text': json.dumps({'id': 0, 'parameter': BASIS_PARAMETER}),
+        })
+        await verbindung.receive_output()
+
+        dauern = []
+        for nummer, delta in enumerate(_tastenanschlaege(anzahl), start=1):
+            start = time.perf_counter()
+            await verbindung.send_input({
+                'type': 'websocket.receive', 'text': json.dumps({'id': nummer, 'parameter': delta}),
+            })
+            json.loads((await verbindung.receive_output())['text'])
+            dauern.append(time.perf_counter() - start)
+
+        await verbindung.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await verbindung.wait()
+        return dauern
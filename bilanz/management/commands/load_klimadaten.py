@@ -1,88 +1,142 @@
-from django.core.management.base import BaseCommand
-from bilanz.models import Ort
+import codecs
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bilanz.eingaben import zuweisung_lesen
+from bilanz.klima_import import KLIMA_FORMATE, orte_lesen, orte_speichern
+
+
+FORMAT_ENDUNGEN = {
+    '.csv': 'csv',
+    '.json': 'json',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+}
+
+# Klimadaten für deutsche Städte, wenn keine Datei angegeben ist
+STANDARD_ORTE = [
+    {
+        'name': 'München',
+        'temperatur_mittel': 9.1,
+        'heizgradtage': 3500,
+        'solarstrahlung_nord': 300,
+        'solarstrahlung_sued': 1100,
+        'solarstrahlung_ost': 700,
+        'solarstrahlung_west': 700,
+        'solarstrahlung_horizontal': 1000,
+    },
+    {
+        'name': 'Berlin',
+        'temperatur_mittel': 9.6,
+        'heizgradtage': 3200,
+        'solarstrahlung_nord': 280,
+        'solarstrahlung_sued': 1050,
+        'solarstrahlung_ost': 680,
+        'solarstrahlung_west': 680,
+        'solarstrahlung_horizontal': 950,
+    },
+    {
+        'name': 'Hamburg',
+        'temperatur_mittel': 9.1,
+        'heizgradtage': 3300,
+        'solarstrahlung_nord': 270,
+        'solarstrahlung_sued': 1000,
+        'solarstrahlung_ost': 650,
+        'solarstrahlung_west': 650,
+        'solarstrahlung_horizontal': 900,
+    },
+    {
+        'name': 'Köln',
+        'temperatur_mittel': 10.3,
+        'heizgradtage': 3000,
+        'solarstrahlung_nord': 290,
+        'solarstrahlung_sued': 1080,
+        'solarstrahlung_ost': 690,
+        'solarstrahlung_west': 690,
+        'solarstrahlung_horizontal': 980,
+    },
+    {
+        'name': 'Frankfurt',
+        'temperatur_mittel': 10.6,
+        'heizgradtage': 2900,
+        'solarstrahlung_nord': 300,
+        'solarstrahlung_sued': 1120,
+        'solarstrahlung_ost': 710,
+        'solarstrahlung_west': 710,
+        'solarstrahlung_horizontal': 1020,
+    },
+    {
+        'name': 'Stuttgart',
+        'temperatur_mittel': 9.3,
+        'heizgradtage': 3400,
+        'solarstrahlung_nord': 310,
+        'solarstrahlung_sued': 1150,
+        'solarstrahlung_ost': 720,
+        'solarstrahlung_west': 720,
+        'solarstrahlung_horizontal': 1050,
+    },
+]
 
 
 class Command(BaseCommand):
-    help = 'Lädt Klimadaten für deutsche Städte'
+    help = 'Lädt Klimadaten für deutsche Städte oder aus einer Stationsdatei (CSV, JSON, JSON Lines)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('datei', nargs='?', help='Stationsdatei (- für stdin); ohne: deutsche Städte')
+        parser.add_argument('--format', choices=KLIMA_FORMATE, help='Standard: nach Dateiendung')
+        parser.add_argument(
+            '--spalte', action='append', default=[], metavar='FELD=SPALTE',
+            help='Spalte der Datei einem Feld von Ort zuordnen, z.B. name=station',
+        )
+        parser.add_argument('--block', type=int, default=1000, help='Orte pro Transaktion')
+        parser.add_argument('--nur-neue', action='store_true', help='Vorhandene Orte nicht aktualisieren')
 
     def handle(self, *args, **options):
-        klimadaten = [
-            {
-                'name': 'München',
-                'temperatur_mittel': 9.1,
-                'heizgradtage': 3500,
-                'solarstrahlung_nord': 300,
-                'solarstrahlung_sued': 1100,
-                'solarstrahlung_ost': 700,
-                'solarstrahlung_west': 700,
-                'solarstrahlung_horizontal': 1000,
-            },
-            {
-                'name': 'Berlin',
-                'temperatur_mittel': 9.6,
-                'heizgradtage': 3200,
-                'solarstrahlung_nord': 280,
-                'solarstrahlung_sued': 1050,
-                'solarstrahlung_ost': 680,
-                'solarstrahlung_west': 680,
-                'solarstrahlung_horizontal': 950,
-            },
-            {
-                'name': 'Hamburg',
-                'temperatur_mittel': 9.1,
-                'heizgradtage': 3300,
-                'solarstrahlung_nord': 270,
-                'solarstrahlung_sued': 1000,
-                'solarstrahlung_ost': 650,
-                'solarstrahlung_west': 650,
-                'solarstrahlung_horizontal': 900,
-            },
-            {
-                'name': 'Köln',
-                'temperatur_mittel': 10.3,
-                'heizgradtage': 3000,
-                'solarstrahlung_nord': 290,
-                'solarstrahlung_sued': 1080,
-                'solarstrahlung_ost': 690,
-                'solarstrahlung_west': 690,
-                'solarstrahlung_horizontal': 980,
-            },
-            {
-                'name': 'Frankfurt',
-                'temperatur_mittel': 10.6,
-                'heizgradtage': 2900,
-                'solarstrahlung_nord': 300,
-                'solarstrahlung_sued': 1120,
-                'solarstrahlung_ost': 710,
-                'solarstrahlung_west': 710,
-                'solarstrahlung_horizontal': 1020,
-            },
-            {
-                'name': 'Stuttgart',
-                'temperatur_mittel': 9.3,
-                'heizgradtage': 3400,
-                'solarstrahlung_nord': 310,
-                'solarstrahlung_sued': 1150,
-                'solarstrahlung_ost': 720,
-                'solarstrahlung_west': 720,
-                'solarstrahlung_horizontal': 1050,
-            },
-        ]
+        if options['block'] < 1:
+            raise CommandError('--block muss mindestens 1 sein')
+        try:
+            spalten = dict(zuweisung_lesen(z) for z in options['spalte'])
+        except ValueError as e:
+            raise CommandError(f'--spalte: {e}')
 
-        for daten in klimadaten:
-            ort, created = Ort.objects.get_or_create(
-                name=daten['name'],
-                defaults=daten
-            )
-            if created:
-                self.stdout.write(
-                    self.style.SUCCESS(f'Ort "{ort.name}" erstellt')
-                )
-            else:
-                self.stdout.write(
-                    self.style.WARNING(f'Ort "{ort.name}" existiert bereits')
-                )
+        start = time.perf_counter()
+        if options['datei'] is None:
+            # Wie bisher: fehlende Städte anlegen, vorhandene nicht überschreiben
+            stand = orte_speichern(enumerate(STANDARD_ORTE, start=1), aktualisieren=False)
+        else:
+            stand = self._aus_datei(options, spalten)
+
+        for meldung in stand['fehler']:
+            fehler = '; '.join(f'{feld}: {" ".join(texte)}' for feld, texte in meldung['fehler'].items())
+            self.stderr.write(self.style.WARNING(f'Zeile {meldung["zeile"]}: {fehler}'))
+
+        dauer = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Klimadaten in {dauer:.1f} s geladen: {stand["angelegt"]} angelegt, '
+            f'{stand["aktualisiert"]} aktualisiert, {stand["unveraendert"]} unverändert, '
+            f'{stand["fehlerhaft"]} fehlerhaft'
+        ))
 
-        self.stdout.write(
-            self.style.SUCCESS('Klimadaten erfolgreich geladen')
-        )
\ No newline at end of file
+    def _aus_datei(self, options, spalten):
+        format = options['format'] or FORMAT_ENDUNGEN.get(os.path.splitext(options['datei'])[1].lower())
+        if format is None:
+            raise CommandError('Format nicht erkennbar, bitte --format angeben')
+
+        if options['datei'] == '-':
+            datei = codecs.getreader('utf-8-sig')(sys.stdin.buffer)
+        else:
+            try:
+                datei = open(options['datei'], encoding='utf-8-sig', newline='')
+            except OSError as e:
+                raise CommandError(str(e))
+
+        try:
+            return orte_speichern(
+                orte_lesen(datei, format, spalten), options['block'], not options['nur_neue'],
+            )
+        finally:
+            if options['datei'] != '-':
+                datei.close()
@@ -0,0 +1,71 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bilanz.eingaben import zuweisung_lesen
+from bilanz.klima_stunden import STUNDEN_FORMATE, KlimaStundenSpeicher, klima_stunden_aktualisieren
+from bilanz.models import Ort
+
+
+FORMAT_ENDUNGEN = {
+    '.dat': 'try',
+    '.epw': 'epw',
+    '.csv': 'csv',
+}
+
+
+class Command(BaseCommand):
+    help = 'Lädt stündliche Klimadaten (TRY, EPW, CSV) in die Stundenklima-Datei'
+
+    def add_arguments(self, parser):
+        parser.add_argument('zuordnungen', nargs='+', metavar='ORT=DATEI', help='Ortsname und Wetterdatei')
+        parser.add_argument('--format', choices=STUNDEN_FORMATE, help='Standard: nach Dateiendung')
+        parser.add_argument('--breite', type=float, help='Geographische Breite (nur TRY)')
+        parser.add_argument('--laenge', type=float, help='Geographische Länge (nur TRY)')
+        parser.add_argument('--zeitzone', type=float, default=1, help='Zeitzone der TRY-Daten (Standard: MEZ)')
+        parser.add_argument('--speicher', help='Stundenklima-Datei (Standard: settings.BILANZ_KLIMA_STUNDEN)')
+
+    def handle(self, *args, **options):
+        pfad = options['speicher'] or getattr(settings, 'BILANZ_KLIMA_STUNDEN', None)
+        if not pfad:
+            raise CommandError('Keine Stundenklima-Datei eingestellt (BILANZ_KLIMA_STUNDEN oder --speicher)')
+
+        try:
+            zuordnungen = [zuweisung_lesen(z) for z in options['zuordnungen']]
+        except ValueError as e:
+            raise CommandError(str(e))
+        orte = dict(Ort.objects.filter(name__in=[name for name, _ in zuordnungen]).values_list('name', 'id'))
+
+        start = time.perf_counter()
+        reihen = {}
+        for name, datei in zuordnungen:
+            if name not in orte:
+                raise CommandError(f'Ort "{name}" existiert nicht')
+            reihen[orte[name]] = self._lesen(datei, options)
+
+        klima_stunden_aktualisieren(pfad, reihen)
+
+        speicher = KlimaStundenSpeicher(pfad)
+        groesse = os.path.getsize(pfad) / 1024 ** 2
+        dauer = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(reihen)} Orte in {dauer:.1f} s geladen; {pfad} enthält {len(speicher)} Orte ({groesse:.1f} MB)'
+        ))
+
+    def _lesen(self, datei, options):
+        format = options['format'] or FORMAT_ENDUNGEN.get(os.path.splitext(datei)[1].lower())
+        if format is None:
+            raise CommandError(f'Format von {datei} nicht erkennbar, bitte --format angeben')
+        argumente = {}
+        if format == 'try':
+            if options['breite'] is None or options['laenge'] is None:
+                raise CommandError('TRY-Dateien brauchen --breite und --laenge')
+            argumente = {'breite': options['breite'], 'laenge': options['laenge'], 'zeitzone': options['zeitzone']}
+
+        try:
+            with open(datei, encoding='latin-1', newline='') as f:
+                return STUNDEN_FORMATE[format](f, **argumente)
+        except (OSError, ValueError, IndexError) as e:
+            raise CommandError(f'{datei}: {e}')
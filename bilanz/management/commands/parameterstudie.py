@@ -0,0 +1,87 @@
+import csv
+import math
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from bilanz.eingaben import STANDARD_KLIMADATEN, datensatz_aus_parametern, zuweisung_lesen
+from bilanz.klima import klima_register
+from bilanz.parameterstudie import berechne_parameterstudie
+
+
+def _parse_variation(wert):
+    """
+    Variationsangabe von der Kommandozeile:
+    ``0.35,0.25,0.15`` (Liste), ``0.35:0.15:5`` (von:bis:schritte)
+    oder ``*1,2`` (Faktoren auf den Basiswert)
+    """
+    if wert.startswith('*'):
+        return {'faktoren': wert[1:].split(',')}
+    if ':' in wert:
+        teile = wert.split(':')
+        if len(teile) != 3:
+            raise CommandError(f'Bereich muss von:bis:schritte sein, erhalten: "{wert}"')
+        return {'von': teile[0], 'bis': teile[1], 'schritte': teile[2]}
+    return wert.split(',')
+
+
+class Command(BaseCommand):
+    help = 'Berechnet eine Parameterstudie über U-Werte, Fenster und Geometrie'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--basis', nargs='*', default=[], metavar='NAME=WERT',
+            help='Parameter des Basisgebäudes (Namen wie /api/berechnung/)',
+        )
+        parser.add_argument(
+            '--variation', action='append', default=[], metavar='NAME=SPEZ',
+            help='Variation, z.B. u_wert_wand_sued=0.35:0.15:5, fenster_sued=*1,2 oder g_wert_sued=0.5,0.6',
+        )
+        parser.add_argument('--ort', help='Name des Orts für die Klimadaten')
+        parser.add_argument('--ausgabe', help='CSV-Datei für das Ergebnisraster (Standard: stdout)')
+
+    def handle(self, *args, **options):
+        try:
+            basis = dict(zuweisung_lesen(z) for z in options['basis'])
+            variationen = {
+                name: _parse_variation(wert)
+                for name, wert in (zuweisung_lesen(z) for z in options['variation'])
+            }
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        klimadaten = STANDARD_KLIMADATEN
+        if options['ort']:
+            klimadaten = klima_register.klimadaten(options['ort'])
+            if klimadaten is None:
+                raise CommandError(f'Ort "{options["ort"]}" existiert nicht')
+
+        start = time.perf_counter()
+        try:
+            studie = berechne_parameterstudie(datensatz_aus_parametern(basis, klimadaten), variationen)
+        except (ValueError, TypeError) as e:
+            raise CommandError(str(e))
+        dauer = time.perf_counter() - start
+
+        parameter = list(studie['parameter'].items())
+        ergebnisse = [
+            (schluessel, np.round(werte, 1))
+            for inhalt in studie['ergebnisse'].values()
+            for schluessel, werte in inhalt.items()
+        ]
+        spalten = [werte.tolist() for _, werte in parameter] + [werte.tolist() for _, werte in ergebnisse]
+
+        ausgabe = open(options['ausgabe'], 'w', newline='') if options['ausgabe'] else self.stdout
+        try:
+            writer = csv.writer(ausgabe, lineterminator='\n')
+            writer.writerow([name for name, _ in parameter] + [name for name, _ in ergebnisse])
+            writer.writerows(zip(*spalten))
+        finally:
+            if ausgabe is not self.stdout:
+                ausgabe.close()
+
+        anzahl = math.prod(studie['form'])
+        self.stderr.write(
+            self.style.SUCCESS(f'{anzahl} Kombinationen in {dauer:.3f} s berechnet')
+        )
@@ -0,0 +1,56 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from bilanz.berechnungen_batch import VERFAHREN
+from bilanz.eingaben import zuweisung_lesen
+from bilanz.snapshot import Snapshot, berechne_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Berechnet einen Snapshot mit geänderten Eingaben neu und vergleicht die Summen'
+
+    def add_arguments(self, parser):
+        parser.add_argument('datei', help='Snapshot aus snapshot_schreiben')
+        parser.add_argument(
+            '--setze', nargs='*', default=[], metavar='SPALTE=WERT',
+            help='Eingabespalte für alle Gebäude setzen, z.B. u_wert_dach=0.15',
+        )
+        parser.add_argument('--verfahren', choices=VERFAHREN, default='jahr')
+
+    def handle(self, *args, **options):
+        aenderungen = {}
+        for zuweisung in options['setze']:
+            try:
+                name, wert = zuweisung_lesen(zuweisung)
+            except ValueError as e:
+                raise CommandError(str(e))
+            try:
+                aenderungen[name] = wert if name == 'gebaeudeart' else float(wert)
+            except ValueError:
+                raise CommandError(f'"{wert}" ist keine Zahl')
+
+        try:
+            with Snapshot(options['datei']) as snapshot:
+                vorher = snapshot.ergebnis()
+                start = time.perf_counter()
+                nachher = berechne_snapshot(snapshot, aenderungen, options['verfahren'])
+                dauer = time.perf_counter() - start
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write('feld,vorher,nachher,aenderung_prozent')
+        for block, inhalt in nachher.items():
+            if block == 'gebaeudedaten':
+                continue
+            for feld, werte in inhalt.items():
+                if feld.endswith('_spezifisch'):
+                    continue
+                alt = float(np.sum(vorher[block][feld]))
+                neu = float(np.sum(werte))
+                prozent = (neu - alt) / alt * 100 if alt else 0.0
+                self.stdout.write(f'{feld},{alt:.1f},{neu:.1f},{prozent:.2f}')
+
+        anzahl = len(nachher['gebaeudedaten']['nf'])
+        self.stderr.write(self.style.SUCCESS(f'{anzahl} Gebäude in {dauer:.3f} s berechnet'))
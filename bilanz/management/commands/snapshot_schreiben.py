@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bilanz.snapshot import STANDARD_ZEILENGRUPPE, snapshot_schreiben
+
+
+class Command(BaseCommand):
+    help = 'Schreibt Eingaben und Ergebnisse aller Gebäude in einen spaltenorientierten Snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('datei', help='Ausgabedatei (ZIP mit .npy-Spalten)')
+        parser.add_argument(
+            '--zeilengruppe', type=int, default=STANDARD_ZEILENGRUPPE, help='Gebäude pro Zeilengruppe',
+        )
+        parser.add_argument('--unkomprimiert', action='store_true', help='Spalten ohne Kompression speichern')
+        parser.add_argument('--ort', help='Nur Gebäude dieses Orts')
+        parser.add_argument('--gebaeudeart', help='Nur Gebäude dieser Art')
+        parser.add_argument('--ab', type=int, metavar='ID', help='Nur Gebäude mit id > ID')
+
+    def handle(self, *args, **options):
+        if options['zeilengruppe'] < 1:
+            raise CommandError('--zeilengruppe muss mindestens 1 sein')
+
+        start = time.perf_counter()
+        try:
+            meta = snapshot_schreiben(
+                options['datei'], options['zeilengruppe'], not options['unkomprimiert'],
+                ort=options['ort'], gebaeudeart=options['gebaeudeart'], ab=options['ab'],
+            )
+        except OSError as e:
+            raise CommandError(str(e))
+
+        dauer = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'{meta["anzahl"]} Gebäude in {len(meta["zeilengruppen"])} Zeilengruppen, '
+            f'{len(meta["spalten"])} Spalten in {dauer:.1f} s geschrieben'
+        ))
@@ -0,0 +1,220 @@
+"""
+Laufzeitmessung je Request
+
+Die MessungMiddleware startet für einen Anteil der Requests
+(``BILANZ_MESSUNG['RATE']``) eine Messung. Sie liegt in einer ContextVar
+und gilt damit auch in asynchronen Views und im Berechnungs-Executor.
+Erfasst werden:
+
+- Datenbankabfragen (Anzahl und Zeit) über einen execute_wrapper, der in
+  jede neue Verbindung eingehängt wird
+- die Zeit je berechne_*-Funktion in berechne_energiebilanz
+- die JSON-Serialisierung (JsonResponse dieses Moduls)
+
+Ausgegeben wird ein ``Server-Timing``-Header und eine Logzeile mit
+JSON-Daten (Logger ``bilanz.messung``). Ohne laufende Messung kostet jeder
+Messpunkt nur einen ContextVar-Zugriff.
+"""
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django import http
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.decorators import sync_and_async_middleware
+
+
+logger = logging.getLogger('bilanz.messung')
+
+STANDARD_EINSTELLUNGEN = {
+    'RATE': 0.05,  # Anteil gemessener Requests (0 deaktiviert, 1 misst alle)
+    'HEADER': True,  # Server-Timing-Header ausgeben
+    'LOG': True,  # Logzeile je gemessenem Request
+}
+
+_messung = ContextVar('bilanz_messung', default=None)
+
+
+class Messung:
+    """Gesammelte Zeiten eines Requests"""
+    __slots__ = ('start', 'abschnitte', 'db_anzahl', 'db_zeit')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.abschnitte = {}  # Name -> [Zeit, Anzahl]
+        self.db_anzahl = 0
+        self.db_zeit = 0.0
+
+    def hinzufuegen(self, name, dauer):
+        eintrag = self.abschnitte.get(name)
+        if eintrag is None:
+            self.abschnitte[name] = [dauer, 1]
+        else:
+            eintrag[0] += dauer
+            eintrag[1] += 1
+
+    def aufruf(self, funktion, *args, name=None):
+        """Ruft ``funktion(*args)`` auf und erfasst die Zeit unter ``name`` bzw. ihrem Namen"""
+        start = time.perf_counter()
+        try:
+            return funktion(*args)
+        finally:
+            self.hinzufuegen(name or funktion.__name__, time.perf_counter() - start)
+
+    def server_timing(self, gesamt):
+        """Wert des Server-Timing-Headers (Zeiten in ms)"""
+        eintraege = [
+            f'db;dur={self.db_zeit * 1000:.3f};desc="{self.db_anzahl} Abfragen"',
+            *(f'{name};dur={zeit * 1000:.3f}' for name, (zeit, _) in self.abschnitte.items()),
+            f'gesamt;dur={gesamt * 1000:.3f}',
+        ]
+        return ', '.join(eintraege)
+
+    def daten(self, gesamt):
+        return {
+            'gesamt_ms': round(gesamt * 1000, 3),
+            'db_anzahl': self.db_anzahl,
+            'db_ms': round(self.db_zeit * 1000, 3),
+            'abschnitte': {
+                name: {'ms': round(zeit * 1000, 3), 'anzahl': anzahl}
+                for name, (zeit, anzahl) in self.abschnitte.items()
+            },
+        }
+
+
+def aktuelle_messung():
+    """Messung des laufenden Requests oder None"""
+    return _messung.get()
+
+
+@contextmanager
+def messen(name):
+    """Erfasst die Zeit des Blocks unter ``name``, falls eine Messung läuft"""
+    messung = _messung.get()
+    if messung is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        messung.hinzufuegen(name, time.perf_counter() - start)
+
+
+class JsonResponse(http.JsonResponse):
+    """JsonResponse, die die Serialisierung als 'serialisierung' erfasst"""
+
+    def __init__(self, *args, **kwargs):
+        messung = _messung.get()
+        if messung is None:
+            super().__init__(*args, **kwargs)
+            return
+        start = time.perf_counter()
+        super().__init__(*args, **kwargs)
+        messung.hinzufuegen('serialisierung', time.perf_counter() - start)
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    messung = _messung.get()
+    if messung is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        messung.db_anzahl += 1
+        messung.db_zeit += time.perf_counter() - start
+
+
+@receiver(connection_created)
+def _db_messung_einhaengen(sender, connection, **kwargs):
+    # Dauerhaft eingehängt, damit auch Verbindungen anderer Threads
+    # (sync_to_async, Executor) erfasst werden
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_wrapper)
+
+
+_einstellungen = None
+
+
+def get_einstellungen():
+    """settings.BILANZ_MESSUNG ergänzt um die Standardwerte"""
+    global _einstellungen
+    if _einstellungen is None:
+        _einstellungen = {**STANDARD_EINSTELLUNGEN, **getattr(settings, 'BILANZ_MESSUNG', {})}
+    return _einstellungen
+
+
+@receiver(setting_changed)
+def _einstellungen_geaendert(sender, setting, **kwargs):
+    global _einstellungen
+    if setting == 'BILANZ_MESSUNG':
+        _einstellungen = None
+
+
+def _starten():
+    """Startet eine Messung gemäß der Stichprobenrate; gibt den ContextVar-Token zurück"""
+    rate = get_einstellungen()['RATE']
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return None
+    return _messung.set(Messung())
+
+
+def _abschliessen(token, request, response):
+    messung = _messung.get()
+    _messung.reset(token)
+    if response is None:
+        return
+    gesamt = time.perf_counter() - messung.start
+    einstellungen = get_einstellungen()
+
+    if einstellungen['HEADER']:
+        vorhanden = response.get('Server-Timing')
+        timing = messung.server_timing(gesamt)
+        response['Server-Timing'] = f'{vorhanden}, {timing}' if vorhanden else timing
+
+    if einstellungen['LOG'] and logger.isEnabledFor(logging.INFO):
+        match = getattr(request, 'resolver_match', None)
+        daten = {
+            'methode': request.method,
+            'pfad': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            **messung.daten(gesamt),
+        }
+        logger.info(json.dumps(daten, ensure_ascii=False), extra={'messung': daten})
+
+
+@sync_and_async_middleware
+def MessungMiddleware(get_response):
+    """Misst einen Anteil der Requests, siehe Moduldokumentation"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = _starten()
+            if token is None:
+                return await get_response(request)
+            response = None
+            try:
+                response = await get_response(request)
+            finally:
+                _abschliessen(token, request, response)
+            return response
+    else:
+        def middleware(request):
+            token = _starten()
+            if token is None:
+                return get_response(request)
+            response = None
+            try:
+                response = get_response(request)
+            finally:
+                _abschliessen(token, request, response)
+            return response
+    return middleware
@@ -0,0 +1,311 @@
+"""
+Prozessweite Metriken im Textformat von Prometheus (``/metrics``)
+
+Zähler und Histogramme schreiben in einen eigenen Speicher je Thread
+(threading.local); ein Lock wird nur beim ersten Zugriff eines Threads
+genommen. Beim Abruf werden die Werte aller Threads summiert. Werte
+beendeter Threads bleiben erhalten.
+
+Erfasst werden Antwortzeiten und Datenbankabfragen je URL-Name
+(MetrikenMiddleware), Berechnungsdauern und Batch-Größen
+(``dauer_erfassen``), Ort-Abfragen im Klimadaten-Register sowie beim
+Abruf die Zähler der Ergebnis-Caches und des Berechnungs-Executors.
+Jeder Worker-Prozess hat eigene Metriken.
+"""
+import bisect
+import functools
+import math
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.decorators import sync_and_async_middleware
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+SEKUNDEN_GRENZEN = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ANZAHL_GRENZEN = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+GROESSEN_GRENZEN = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+class _ThreadWerte:
+    """
+    Ein Dict Labelwerte -> Liste je Thread; summiert über alle Threads
+
+    Die Werte beendeter Threads werden beim nächsten Zugriff unter dem Lock
+    in eine gemeinsame Summe übernommen, damit bei einem Thread je Request
+    nicht ein Dict je Thread erhalten bleibt.
+    """
+
+    def __init__(self):
+        self._lokal = threading.local()
+        self._alle = []  # (Thread, Dict)
+        self._beendet = {}
+        self._lock = threading.Lock()
+
+    def lokal(self):
+        try:
+            return self._lokal.werte
+        except AttributeError:
+            werte = self._lokal.werte = {}
+            with self._lock:
+                self._aufraeumen()
+                self._alle.append((threading.current_thread(), werte))
+            return werte
+
+    def _aufraeumen(self):
+        """Übernimmt die Werte beendeter Threads in die Summe (unter dem Lock)"""
+        laufend = []
+        for thread, werte in self._alle:
+            if thread.is_alive():
+                laufend.append((thread, werte))
+            else:
+                _addieren(self._beendet, werte)
+        self._alle = laufend
+
+    def summe(self):
+        with self._lock:
+            self._aufraeumen()
+            summe = {labels: list(zeile) for labels, zeile in self._beendet.items()}
+            alle = [werte for _, werte in self._alle]
+        for werte in alle:
+            # dict.copy ist unter dem GIL atomar, der Thread kann weiterschreiben
+            _addieren(summe, werte.copy())
+        return summe
+
+
+def _addieren(summe, werte):
+    for labels, zeile in werte.items():
+        gesamt = summe.get(labels)
+        if gesamt is None:
+            summe[labels] = list(zeile)
+        else:
+            for i, wert in enumerate(zeile):
+                gesamt[i] += wert
+
+
+def _labels(namen, werte, extra=''):
+    teile = [f'{n}="{_escape(w)}"' for n, w in zip(namen, werte)]
+    if extra:
+        teile.append(extra)
+    return '{' + ','.join(teile) + '}' if teile else ''
+
+
+def _escape(wert):
+    return str(wert).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _zahl(wert):
+    if wert == math.inf:
+        return '+Inf'
+    return repr(float(wert)) if isinstance(wert, float) else str(wert)
+
+
+class Zaehler:
+    """Monoton steigender Zähler mit optionalen Labels"""
+
+    def __init__(self, name, hilfe, labels=()):
+        self.name = name
+        self.hilfe = hilfe
+        self.labels = tuple(labels)
+        self._werte = _ThreadWerte()
+
+    def erhoehen(self, *labelwerte, wert=1):
+        werte = self._werte.lokal()
+        zeile = werte.get(labelwerte)
+        if zeile is None:
+            werte[labelwerte] = [wert]
+        else:
+            zeile[0] += wert
+
+    def werte(self):
+        """Dict Labelwerte -> Summe über alle Threads"""
+        return {labels: zeile[0] for labels, zeile in self._werte.summe().items()}
+
+    def zeilen(self):
+        yield f'# HELP {self.name} {self.hilfe}'
+        yield f'# TYPE {self.name} counter'
+        for labels, wert in sorted(self.werte().items()):
+            yield f'{self.name}{_labels(self.labels, labels)} {_zahl(wert)}'
+
+
+class Histogramm:
+    """Histogramm mit festen Obergrenzen (le) und optionalen Labels"""
+
+    def __init__(self, name, hilfe, labels=(), grenzen=SEKUNDEN_GRENZEN):
+        self.name = name
+        self.hilfe = hilfe
+        self.labels = tuple(labels)
+        self.grenzen = tuple(grenzen)
+        self._werte = _ThreadWerte()
+
+    def beobachten(self, wert, *labelwerte):
+        werte = self._werte.lokal()
+        zeile = werte.get(labelwerte)
+        if zeile is None:
+            # Anzahl je Bucket (nicht kumuliert), +Inf, Summe
+            zeile = werte[labelwerte] = [0] * (len(self.grenzen) + 1) + [0.0]
+        zeile[bisect.bisect_left(self.grenzen, wert)] += 1
+        zeile[-1] += wert
+
+    def werte(self):
+        """Dict Labelwerte -> (kumulierte Bucket-Zähler inkl. +Inf, Summe)"""
+        ergebnis = {}
+        for labels, zeile in self._werte.summe().items():
+            kumuliert = []
+            anzahl = 0
+            for wert in zeile[:-1]:
+                anzahl += wert
+                kumuliert.append(anzahl)
+            ergebnis[labels] = (kumuliert, zeile[-1])
+        return ergebnis
+
+    def zeilen(self):
+        yield f'# HELP {self.name} {self.hilfe}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, (buckets, summe) in sorted(self.werte().items()):
+            for grenze, anzahl in zip((*self.grenzen, math.inf), buckets):
+                le = 'le="' + _zahl(grenze) + '"'
+                yield f'{self.name}_bucket{_labels(self.labels, labels, le)} {anzahl}'
+            yield f'{self.name}_sum{_labels(self.labels, labels)} {_zahl(summe)}'
+            yield f'{self.name}_count{_labels(self.labels, labels)} {buckets[-1]}'
+
+
+REQUEST_DAUER = Histogramm(
+    'bilanz_request_dauer_sekunden', 'Antwortzeit je URL-Name', labels=('view', 'methode'),
+)
+DB_ABFRAGEN = Histogramm(
+    'bilanz_request_db_abfragen', 'Datenbankabfragen je Request und URL-Name', labels=('view',),
+    grenzen=ANZAHL_GRENZEN,
+)
+BERECHNUNG_DAUER = Histogramm(
+    'bilanz_berechnung_dauer_sekunden', 'Dauer der Energiebilanz-Berechnung je Art', labels=('art',),
+)
+BATCH_GROESSE = Histogramm(
+    'bilanz_batch_groesse', 'Gebäude je Batch-Berechnung', grenzen=GROESSEN_GRENZEN,
+)
+ORT_ABFRAGEN = Zaehler(
+    'bilanz_ort_abfragen_total', 'Abfragen im Klimadaten-Register', labels=('ergebnis',),
+)
+
+METRIKEN = [REQUEST_DAUER, DB_ABFRAGEN, BERECHNUNG_DAUER, BATCH_GROESSE, ORT_ABFRAGEN]
+
+
+def dauer_erfassen(art):
+    """Dekorator: Laufzeit der Funktion in BERECHNUNG_DAUER unter ``art``"""
+    def dekorator(funktion):
+        @functools.wraps(funktion)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return funktion(*args, **kwargs)
+            finally:
+                BERECHNUNG_DAUER.beobachten(time.perf_counter() - start, art)
+        return wrapper
+    return dekorator
+
+
+# Datenbankabfragen des laufenden Requests (Liste mit einem Zähler)
+_abfragen = ContextVar('bilanz_metriken_abfragen', default=None)
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    zaehler = _abfragen.get()
+    if zaehler is not None:
+        zaehler[0] += 1
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def _db_zaehler_einhaengen(sender, connection, **kwargs):
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_wrapper)
+
+
+def _erfassen(request, start, zaehler):
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match else 'unbekannt'
+    REQUEST_DAUER.beobachten(time.perf_counter() - start, view, request.method)
+    DB_ABFRAGEN.beobachten(zaehler[0], view)
+
+
+@sync_and_async_middleware
+def MetrikenMiddleware(get_response):
+    """Antwortzeit und Datenbankabfragen je Request nach URL-Name"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            start = time.perf_counter()
+            zaehler = [0]
+            token = _abfragen.set(zaehler)
+            try:
+                response = await get_response(request)
+            finally:
+                _abfragen.reset(token)
+            _erfassen(request, start, zaehler)
+            return response
+    else:
+        def middleware(request):
+            start = time.perf_counter()
+            zaehler = [0]
+            token = _abfragen.set(zaehler)
+            try:
+                response = get_response(request)
+            finally:
+                _abfragen.reset(token)
+            _erfassen(request, start, zaehler)
+            return response
+    return middleware
+
+
+def _zustand_zeilen():
+    """Momentanwerte aus Caches, Executor und Klimadaten-Register"""
+    from .ausfuehrung import vorhandener_berechnungs_executor
+    from .cache import aktive_caches
+    from .klima import klima_register
+
+    caches = aktive_caches()
+    zaehler = {
+        'treffer': 'Treffer im Prozess-Cache',
+        'treffer_geteilt': 'Treffer im geteilten Django-Cache',
+        'fehlschlaege': 'Fehlschläge',
+        'abgelaufen': 'Abgelaufene Einträge',
+        'verdraengt': 'Verdrängte Einträge',
+    }
+    for feld, hilfe in zaehler.items():
+        yield f'# HELP bilanz_cache_{feld}_total {hilfe}'
+        yield f'# TYPE bilanz_cache_{feld}_total counter'
+        for name, statistik in caches.items():
+            yield f'bilanz_cache_{feld}_total{{cache="{name}"}} {statistik[feld]}'
+    yield '# HELP bilanz_cache_eintraege Einträge im Prozess-Cache'
+    yield '# TYPE bilanz_cache_eintraege gauge'
+    for name, statistik in caches.items():
+        yield f'bilanz_cache_eintraege{{cache="{name}"}} {statistik["eintraege"]}'
+
+    # Der Abruf soll den Thread-Pool nicht erst anlegen
+    executor = vorhandener_berechnungs_executor()
+    yield '# HELP bilanz_executor_laufend Laufende und wartende Berechnungen im Executor'
+    yield '# TYPE bilanz_executor_laufend gauge'
+    yield f'bilanz_executor_laufend {executor.laufend if executor else 0}'
+    yield '# HELP bilanz_executor_abgewiesen_total Wegen Überlast abgewiesene Berechnungen'
+    yield '# TYPE bilanz_executor_abgewiesen_total counter'
+    yield f'bilanz_executor_abgewiesen_total {executor.abgewiesen if executor else 0}'
+
+    yield '# HELP bilanz_klima_ladevorgaenge_total Ladevorgänge des Klimadaten-Registers'
+    yield '# TYPE bilanz_klima_ladevorgaenge_total counter'
+    yield f'bilanz_klima_ladevorgaenge_total {klima_register.ladevorgaenge}'
+
+
+def metriken_text():
+    """Alle Metriken im Textformat"""
+    zeilen = [zeile for metrik in METRIKEN for zeile in metrik.zeilen()]
+    zeilen.extend(_zustand_zeilen())
+    return '\n'.join(zeilen) + '\n'
+
+
+def metriken_aktiv():
+    return getattr(settings, 'BILANZ_METRIKEN', {}).get('AKTIV', True)
@@ -0,0 +1,199 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:55
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Gebaeude',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=200)),
+                ('beschreibung', models.TextField(blank=True)),
+                ('gebaeudeart', models.CharField(choices=[('buero', 'Bürogebäude'), ('schule', 'Schule (ohne Dusche)'), ('heim', 'Heim')], default='buero', max_length=20)),
+                ('laenge_ns', models.FloatField(validators=[django.core.validators.MinValueValidator(0.1)], verbose_name='Länge Nord/Süd (m)')),
+                ('breite_ow', models.FloatField(validators=[django.core.validators.MinValueValidator(0.1)], verbose_name='Breite Ost/West (m)')),
+                ('geschosse', models.IntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('geschosshoehe', models.FloatField(default=2.8, validators=[django.core.validators.MinValueValidator(2.0)], verbose_name='Geschosshöhe (m)')),
+                ('fensterflaeche_nord', models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('fensterflaeche_sued', models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('fensterflaeche_ost', models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('fensterflaeche_west', models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('g_wert_nord', models.FloatField(default=0.6, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(1)])),
+                ('g_wert_sued', models.FloatField(default=0.6, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(1)])),
+                ('g_wert_ost', models.FloatField(default=0.6, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(1)])),
+                ('g_wert_west', models.FloatField(default=0.6, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(1)])),
+                ('personendichte', models.FloatField(default=15, verbose_name='Personendichte (m²/Person)')),
+                ('erstellt_am', models.DateTimeField(auto_now_add=True)),
+                ('aktualisiert_am', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Gebäude',
+                'verbose_name_plural': 'Gebäude',
+            },
+        ),
+        migrations.CreateModel(
+            name='Ort',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('temperatur_mittel', models.FloatField(help_text='Mittlere Jahrestemperatur in °C')),
+                ('heizgradtage', models.FloatField(help_text='Heizgradtage Kh in Kd')),
+                ('solarstrahlung_nord', models.FloatField(help_text='kWh/m²a')),
+                ('solarstrahlung_sued', models.FloatField(help_text='kWh/m²a')),
+                ('solarstrahlung_ost', models.FloatField(help_text='kWh/m²a')),
+                ('solarstrahlung_west', models.FloatField(help_text='kWh/m²a')),
+                ('solarstrahlung_horizontal', models.FloatField(help_text='kWh/m²a')),
+            ],
+            options={
+                'verbose_name': 'Ort',
+                'verbose_name_plural': 'Orte',
+            },
+        ),
+        migrations.CreateModel(
+            name='Berechnung',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ne_heizung', models.FloatField(default=0, verbose_name='Nutzenergie Heizung (kWh/a)')),
+                ('ne_kuehlung', models.FloatField(default=0, verbose_name='Nutzenergie Kühlung (kWh/a)')),
+                ('ne_trinkwarmwasser', models.FloatField(default=0, verbose_name='Nutzenergie TWW (kWh/a)')),
+                ('ne_gesamt', models.FloatField(default=0, verbose_name='Nutzenergie gesamt (kWh/a)')),
+                ('ee_heizung', models.FloatField(default=0, verbose_name='Endenergie Heizung (kWh/a)')),
+                ('ee_kuehlung', models.FloatField(default=0, verbose_name='Endenergie Kühlung (kWh/a)')),
+                ('ee_lueftung', models.FloatField(default=0, verbose_name='Endenergie Lüftung (kWh/a)')),
+                ('ee_beleuchtung', models.FloatField(default=0, verbose_name='Endenergie Beleuchtung (kWh/a)')),
+                ('ee_prozesse', models.FloatField(default=0, verbose_name='Endenergie Prozesse (kWh/a)')),
+                ('ee_gesamt', models.FloatField(default=0, verbose_name='Endenergie gesamt (kWh/a)')),
+                ('pe_gesamt', models.FloatField(default=0, verbose_name='Primärenergie gesamt (kWh/a)')),
+                ('pv_ertrag', models.FloatField(default=0, verbose_name='PV-Ertrag (kWh/a)')),
+                ('strom_ueberschuss', models.FloatField(default=0, verbose_name='Stromüberschuss (kWh/a)')),
+                ('gwp_var1', models.FloatField(default=0, verbose_name='GWP Variante 1 (kg CO2-eq/a)')),
+                ('gwp_var2', models.FloatField(default=0, verbose_name='GWP Variante 2 (kg CO2-eq/a)')),
+                ('ergebnis', models.JSONField(blank=True, default=dict)),
+                ('eingabe_hash', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('berechnet_am', models.DateTimeField(auto_now=True)),
+                ('gebaeude', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='berechnung', to='bilanz.gebaeude')),
+            ],
+            options={
+                'verbose_name': 'Berechnung',
+                'verbose_name_plural': 'Berechnungen',
+            },
+        ),
+        migrations.CreateModel(
+            name='Lueftung',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('typ', models.CharField(choices=[('natuerlich', 'Natürliche Lüftung'), ('mechanisch', 'Mechanische Lüftung'), ('mechanisch_wrg', 'Mechanische Lüftung mit WRG')], default='natuerlich', max_length=20)),
+                ('luftwechselrate', models.FloatField(default=0.5, validators=[django.core.validators.MinValueValidator(0)])),
+                ('wirkungsgrad_wrg', models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(1)])),
+                ('raum_soll_temperatur', models.FloatField(default=20, validators=[django.core.validators.MinValueValidator(15), django.core.validators.MaxValueValidator(25)])),
+                ('laufzeit_h_d', models.FloatField(default=8, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(24)])),
+                ('laufzeit_d_a', models.FloatField(default=250, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(365)])),
+                ('gebaeude', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='lueftung', to='bilanz.gebaeude')),
+            ],
+            options={
+                'verbose_name': 'Lüftung',
+                'verbose_name_plural': 'Lüftungsanlagen',
+            },
+        ),
+        migrations.AddField(
+            model_name='gebaeude',
+            name='ort',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bilanz.ort'),
+        ),
+        migrations.CreateModel(
+            name='PVAnlage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pv_vor_fenster_nord', models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('pv_vor_fenster_sued', models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('pv_vor_fenster_ost', models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('pv_vor_fenster_west', models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('pv_vor_opak_nord', models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('pv_vor_opak_sued', models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('pv_vor_opak_ost', models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('pv_vor_opak_west', models.FloatField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+                ('wirkungsgrad', models.FloatField(default=0.2, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(1)])),
+                ('gebaeude', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pv_anlage', to='bilanz.gebaeude')),
+            ],
+            options={
+                'verbose_name': 'PV-Anlage',
+                'verbose_name_plural': 'PV-Anlagen',
+            },
+        ),
+        migrations.CreateModel(
+            name='Sonnenschutz',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kritischer_raum', models.CharField(blank=True, max_length=100)),
+                ('fassadenorientierung', models.CharField(choices=[('nord', 'Nord'), ('sued', 'Süd'), ('ost', 'Ost'), ('west', 'West')], default='sued', max_length=10)),
+                ('sonnenschutzart', models.CharField(choices=[('außen_fest', 'Außen fest'), ('außen_beweglich', 'Außen beweglich'), ('innen', 'Innen'), ('zwischen_scheiben', 'Zwischen Scheiben')], default='außen_beweglich', max_length=30)),
+                ('verglasungsart', models.CharField(choices=[('zweifach', 'Zweifach'), ('dreifach', 'Dreifach'), ('zweifach_sonnenschutz', 'Zweifach Sonnenschutzglas')], default='zweifach', max_length=30)),
+                ('passive_kuehlung', models.BooleanField(default=False)),
+                ('fensterneigung', models.FloatField(default=90, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(90)])),
+                ('gebaeude', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sonnenschutz', to='bilanz.gebaeude')),
+            ],
+            options={
+                'verbose_name': 'Sonnenschutz',
+                'verbose_name_plural': 'Sonnenschutzanlagen',
+            },
+        ),
+        migrations.CreateModel(
+            name='Waermequelle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('typ', models.CharField(choices=[('geraet', 'Gerät'), ('sonstige', 'Sonstige Quelle')], max_length=20)),
+                ('name', models.CharField(max_length=100)),
+                ('anzahl', models.IntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)])),
+                ('leistung', models.FloatField(validators=[django.core.validators.MinValueValidator(0)], verbose_name='Leistung (W)')),
+                ('betrieb_h_d', models.FloatField(default=8, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(24)])),
+                ('betrieb_d_a', models.FloatField(default=250, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(365)])),
+                ('gebaeude', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waermequellen', to='bilanz.gebaeude')),
+            ],
+            options={
+                'verbose_name': 'Wärmequelle',
+                'verbose_name_plural': 'Wärmequellen',
+            },
+        ),
+        migrations.CreateModel(
+            name='Beleuchtung',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nutzungsbereich', models.CharField(choices=[('buero', 'Büro'), ('wohnen', 'Wohnen'), ('sanitaer', 'Sanitär'), ('verkehr', 'Verkehr')], max_length=20)),
+                ('beleuchtungsart', models.CharField(choices=[('led', 'LED'), ('leuchtstoff', 'Leuchtstofflampe'), ('halogen', 'Halogen')], default='led', max_length=20)),
+                ('regelungsart', models.CharField(choices=[('manuell', 'Manuell'), ('praesenz', 'Präsenzmelder'), ('tageslicht', 'Tageslichtregelung'), ('praesenz_tageslicht', 'Präsenz + Tageslicht')], default='manuell', max_length=30)),
+                ('e_soll', models.FloatField(default=500, verbose_name='E_Soll (lx)')),
+                ('laufzeit_h_d', models.FloatField(default=8, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(24)])),
+                ('laufzeit_d_a', models.FloatField(default=250, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(365)])),
+                ('gebaeude', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='beleuchtungen', to='bilanz.gebaeude')),
+            ],
+            options={
+                'verbose_name': 'Beleuchtung',
+                'verbose_name_plural': 'Beleuchtungsanlagen',
+                'unique_together': {('gebaeude', 'nutzungsbereich')},
+            },
+        ),
+        migrations.CreateModel(
+            name='Bauteil',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('typ', models.CharField(choices=[('wand_nord', 'Wand Nord'), ('wand_sued', 'Wand Süd'), ('wand_ost', 'Wand Ost'), ('wand_west', 'Wand West'), ('dach', 'Dach'), ('bodenplatte', 'Bodenplatte')], max_length=20)),
+                ('u_wert', models.FloatField(validators=[django.core.validators.MinValueValidator(0.01)], verbose_name='U-Wert (W/m²K)')),
+                ('gebaeude', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bauteile', to='bilanz.gebaeude')),
+            ],
+            options={
+                'verbose_name': 'Bauteil',
+                'verbose_name_plural': 'Bauteile',
+                'unique_together': {('gebaeude', 'typ')},
+            },
+        ),
+    ]
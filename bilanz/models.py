@@ -296,6 +296,10 @@ class Berechnung(models.Model):
     gwp_var1 = models.FloatField(default=0, verbose_name="GWP Variante 1 (kg CO2-eq/a)")
     gwp_var2 = models.FloatField(default=0, verbose_name="GWP Variante 2 (kg CO2-eq/a)")
     
+    # Vollständiges Ergebnis von berechne_energiebilanz und Fingerabdruck der Eingaben
+    ergebnis = models.JSONField(default=dict, blank=True)
+    eingabe_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    
     # Timestamps
     berechnet_am = models.DateTimeField(auto_now=True)
     
@@ -0,0 +1,20 @@
+"""
+Funktionen für Worker-Prozesse (ProcessPoolExecutor mit spawn)
+
+Das Modul importiert beim Laden nichts aus Django, damit es in frisch
+gestarteten Prozessen vor django.setup() importiert werden kann.
+"""
+
+
+def worker_initialisieren():
+    import django
+    django.setup()
+
+
+def berechne_block(gebaeude_ids, erzwingen=False):
+    """Lädt und berechnet einen Block von Gebäuden, siehe berechnungen_aktualisieren"""
+    from .ergebnisse import berechnungen_aktualisieren
+    from .lader import lade_berechnungseingaben
+
+    eingaben = lade_berechnungseingaben(gebaeude_ids)
+    return berechnungen_aktualisieren(eingaben.values(), erzwingen)
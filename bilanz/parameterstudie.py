@@ -0,0 +1,104 @@
+"""
+Parameterstudien (Sensitivitätsanalysen) über U-Werte, Fenster und Geometrie
+
+Ausgehend von einem Basisgebäude werden für einzelne Parameter Wertelisten
+oder Bereiche vorgegeben. Alle Kombinationen (kartesisches Produkt) werden
+in einem Durchlauf mit ``berechne_energiebilanz_batch`` berechnet.
+"""
+import math
+
+import numpy as np
+
+from .berechnungen import ORIENTIERUNGEN
+from .berechnungen_batch import (
+    BAUTEIL_TYPEN, SPALTEN_STANDARD, berechne_energiebilanz_batch, spalten_aus_datensaetzen,
+)
+from .eingaben import API_PARAMETER, datensatz_pruefen, wert_pruefen
+
+
+# Variierbare Parameter (Namen wie in berechnung_api) -> Spalte
+VARIATIONS_PARAMETER = {
+    'laenge_ns': 'laenge_ns',
+    'breite_ow': 'breite_ow',
+    'geschosse': 'geschosse',
+    'geschosshoehe': 'geschosshoehe',
+    **{f'fenster_{o}': API_PARAMETER[f'fenster_{o}'][0] for o in ORIENTIERUNGEN},
+    **{f'g_wert_{o}': API_PARAMETER[f'g_wert_{o}'][0] for o in ORIENTIERUNGEN},
+    **{f'u_wert_{typ}': f'u_wert_{typ}' for typ in BAUTEIL_TYPEN},
+}
+
+MAX_KOMBINATIONEN = 1000000
+
+
+def variationswerte(spezifikation, basiswert):
+    """
+    Wandelt eine Variationsangabe in ein Werte-Array um
+
+    Erlaubt sind eine Werteliste ``[0.35, 0.25, 0.15]``, ein Bereich
+    ``{'von': 0.35, 'bis': 0.15, 'schritte': 5}`` oder Faktoren auf den
+    Basiswert ``{'faktoren': [1, 2]}``.
+    """
+    if isinstance(spezifikation, (list, tuple)):
+        werte = [float(w) for w in spezifikation]
+    elif isinstance(spezifikation, dict) and 'faktoren' in spezifikation:
+        if basiswert is None or math.isnan(basiswert):
+            raise ValueError('Faktoren benötigen einen Basiswert')
+        werte = [basiswert * float(f) for f in spezifikation['faktoren']]
+    elif isinstance(spezifikation, dict) and 'von' in spezifikation and 'bis' in spezifikation:
+        schritte = int(spezifikation.get('schritte', 2))
+        if schritte < 1:
+            raise ValueError('Schritte muss mindestens 1 sein')
+        werte = np.linspace(float(spezifikation['von']), float(spezifikation['bis']), schritte)
+    else:
+        raise ValueError('Variation muss eine Liste, {von, bis, schritte} oder {faktoren} sein')
+
+    if len(werte) == 0:
+        raise ValueError('Variation enthält keine Werte')
+    return np.asarray(werte, dtype=float)
+
+
+def berechne_parameterstudie(basis_datensatz, variationen):
+    """
+    Berechnet die Energiebilanz für alle Kombinationen der Variationen
+
+    ``basis_datensatz`` ist ein Datensatz wie aus ``datensatz_aus_parametern``,
+    ``variationen`` ordnet Parameternamen (siehe ``VARIATIONS_PARAMETER``)
+    eine Variationsangabe zu. Das Ergebnis enthält die Achsen, die
+    Parameterwerte je Kombination (in C-Reihenfolge des Rasters) und die
+    ungerundeten Ergebnis-Arrays. Basis und Variationswerte werden wie in
+    der Batch-Berechnung geprüft (ValueError).
+    """
+    datensatz_pruefen(basis_datensatz)
+    achsen = {}
+    for name, spezifikation in variationen.items():
+        if name not in VARIATIONS_PARAMETER:
+            raise ValueError(f'Parameter "{name}" kann nicht variiert werden')
+        spalte = VARIATIONS_PARAMETER[name]
+        basiswert = basis_datensatz.get(spalte, SPALTEN_STANDARD.get(spalte))
+        achsen[name] = variationswerte(spezifikation, basiswert)
+        for wert in achsen[name].tolist():
+            wert_pruefen(name, wert)
+
+    form = tuple(len(werte) for werte in achsen.values())
+    anzahl = math.prod(form)
+    if anzahl > MAX_KOMBINATIONEN:
+        raise ValueError(f'Maximal {MAX_KOMBINATIONEN} Kombinationen erlaubt ({anzahl} angefordert)')
+
+    # Basisgebäude auf alle Kombinationen aufweiten, ohne Daten zu kopieren
+    spalten = {
+        spalte: np.broadcast_to(werte, (anzahl,))
+        for spalte, werte in spalten_aus_datensaetzen([basis_datensatz]).items()
+    }
+
+    parameter = {}
+    raster = np.meshgrid(*achsen.values(), indexing='ij') if achsen else []
+    for name, werte in zip(achsen, raster):
+        parameter[name] = werte.ravel()
+        spalten[VARIATIONS_PARAMETER[name]] = parameter[name]
+
+    return {
+        'form': form,
+        'achsen': achsen,
+        'parameter': parameter,
+        'ergebnisse': berechne_energiebilanz_batch(spalten),
+    }
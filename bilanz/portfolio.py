@@ -0,0 +1,302 @@
+"""
+Synthetischer Gebäudebestand für Last- und Skalierungstests
+
+Gezogen wird mit numpy in festen Teilen von ZIEHUNG_TEIL Gebäuden, jeder
+Teil mit eigenem Zufallsgenerator aus (seed, Teilnummer). Derselbe Seed
+liefert bei denselben Orten daher unabhängig von der Blockgröße beim
+Speichern immer denselben Bestand.
+
+Verteilungen (vereinfacht, angelehnt an Nichtwohngebäude in Deutschland):
+
+- Gebäudeart: Büro 50 %, Schule 25 %, Heim 25 %
+- Grundriss log-normal, Geschosse und Geschosshöhe je Gebäudeart
+- Fensterflächenanteil je Fassade als Beta-Verteilung, Süden etwas höher
+- U-Werte nach Baualtersklasse mit ±10 % Streuung
+- PV-Anlage, Lüftung und Sonnenschutz bei einem Teil der Gebäude,
+  1 bis 4 Beleuchtungsbereiche und eine mit der Fläche wachsende Zahl
+  von Wärmequellen
+
+Jedes Gebäude wird als Datensatz im Format von importer.zeile_pruefen
+(zusätzlich mit 'sonnenschutz') und als Parametersatz von berechnung_api
+erzeugt. Gespeichert werden die Gebäude per bulk_create, die Relationen
+ohne Modellinstanzen per executemany. Der Parametersatz enthält Geometrie,
+Fenster, g-Werte, U-Werte und Ort; PV, Lüftung, Beleuchtung und
+Wärmequellen wertet berechnung_api nicht aus.
+"""
+import numpy as np
+from django.db import connection, transaction
+
+from .berechnungen import ORIENTIERUNGEN
+from .berechnungen_batch import BAUTEIL_TYPEN
+from .models import (
+    Gebaeude, Bauteil, PVAnlage, Lueftung, Sonnenschutz, Beleuchtung, Waermequelle, Ort,
+)
+
+
+ZIEHUNG_TEIL = 10000
+
+GEBAEUDEARTEN = ('buero', 'schule', 'heim')
+GEBAEUDEART_ANTEILE = (0.5, 0.25, 0.25)
+
+# Je Gebäudeart: maximale Geschosse, Geschosshöhe (von, bis), Personendichte (von, bis)
+ART_KENNWERTE = {
+    'buero': {'geschosse': 12, 'geschosshoehe': (3.0, 3.6), 'personendichte': (10, 20)},
+    'schule': {'geschosse': 4, 'geschosshoehe': (3.2, 3.8), 'personendichte': (3, 6)},
+    'heim': {'geschosse': 6, 'geschosshoehe': (2.6, 3.0), 'personendichte': (15, 30)},
+}
+# Mittlerer Fensterflächenanteil je Gebäudeart und Faktor je Orientierung
+FENSTERANTEIL = {'buero': 0.4, 'schule': 0.3, 'heim': 0.25}
+FENSTER_ORIENTIERUNG = {'nord': 0.8, 'sued': 1.25, 'ost': 1.0, 'west': 1.0}
+G_WERTE = (0.35, 0.5, 0.6)  # Sonnenschutz-, Dreifach-, Zweifachverglasung
+G_WERT_ANTEILE = (0.15, 0.45, 0.4)
+
+# Baualtersklassen: Anteil und U-Werte (W/m²K) für Wand, Dach, Bodenplatte
+BAUALTERSKLASSEN = (
+    (0.25, {'wand': 1.2, 'dach': 0.9, 'bodenplatte': 1.0}),
+    (0.35, {'wand': 0.6, 'dach': 0.4, 'bodenplatte': 0.6}),
+    (0.3, {'wand': 0.28, 'dach': 0.2, 'bodenplatte': 0.35}),
+    (0.1, {'wand': 0.15, 'dach': 0.12, 'bodenplatte': 0.15}),
+)
+
+PV_ANTEIL = 0.3
+LUEFTUNG_ANTEIL = 0.7
+SONNENSCHUTZ_ANTEIL = 0.4
+LUEFTUNGSTYPEN = tuple(typ for typ, _ in Lueftung.LUEFTUNGSTYPEN)
+NUTZUNGSBEREICHE = tuple(bereich for bereich, _ in Beleuchtung.NUTZUNGSBEREICHE)
+BELEUCHTUNGSARTEN = tuple(art for art, _ in Beleuchtung.BELEUCHTUNGSARTEN)
+REGELUNGSARTEN = tuple(art for art, _ in Beleuchtung.REGELUNGSARTEN)
+SONNENSCHUTZARTEN = tuple(art for art, _ in Sonnenschutz.SONNENSCHUTZARTEN)
+VERGLASUNGSARTEN = tuple(art for art, _ in Sonnenschutz.VERGLASUNGSARTEN)
+WAERMEQUELLEN = (('PC', 80), ('Monitor', 30), ('Drucker', 300), ('Kühlschrank', 100), ('Server', 500))
+NF_JE_WAERMEQUELLE = 400  # m² Nutzfläche je Wärmequellen-Eintrag im Mittel
+MAX_WAERMEQUELLEN = 20
+
+
+def _teil_ziehen(rng, anzahl, ort_anzahl):
+    """Alle Zufallsgrößen eines Teils als Arrays"""
+    art = rng.choice(len(GEBAEUDEARTEN), anzahl, p=GEBAEUDEART_ANTEILE)
+    kennwerte = [ART_KENNWERTE[a] for a in GEBAEUDEARTEN]
+    max_geschosse = np.array([k['geschosse'] for k in kennwerte])[art]
+    hoehe_von, hoehe_bis = np.array([k['geschosshoehe'] for k in kennwerte]).T
+    dichte_von, dichte_bis = np.array([k['personendichte'] for k in kennwerte]).T
+
+    z = {
+        'art': art,
+        'ort': rng.integers(0, ort_anzahl, anzahl),
+        'laenge_ns': np.clip(rng.lognormal(np.log(25), 0.5, anzahl), 6, 150).round(1),
+        'breite_ow': np.clip(rng.lognormal(np.log(14), 0.4, anzahl), 6, 60).round(1),
+        # Geometrisch verteilt: niedrige Gebäude häufiger
+        'geschosse': np.minimum(rng.geometric(0.35, anzahl), max_geschosse),
+        'geschosshoehe': rng.uniform(hoehe_von[art], hoehe_bis[art]).round(2),
+        'personendichte': rng.uniform(dichte_von[art], dichte_bis[art]).round(1),
+        'g_wert': np.array(G_WERTE)[rng.choice(len(G_WERTE), anzahl, p=G_WERT_ANTEILE)],
+        'baualter': rng.choice(len(BAUALTERSKLASSEN), anzahl, p=[a for a, _ in BAUALTERSKLASSEN]),
+        'u_streuung': rng.uniform(0.9, 1.1, (anzahl, len(BAUTEIL_TYPEN))),
+        'pv': rng.random(anzahl) < PV_ANTEIL,
+        'pv_anteil': rng.uniform(0.05, 0.3, anzahl),
+        'pv_wirkungsgrad': rng.uniform(0.16, 0.22, anzahl).round(3),
+        'lueftung': rng.random(anzahl) < LUEFTUNG_ANTEIL,
+        'lueftungstyp': rng.integers(0, len(LUEFTUNGSTYPEN), anzahl),
+        'wrg': rng.uniform(0.6, 0.85, anzahl).round(2),
+        'sonnenschutz': rng.random(anzahl) < SONNENSCHUTZ_ANTEIL,
+        'sonnenschutzart': rng.integers(0, len(SONNENSCHUTZARTEN), anzahl),
+        'verglasungsart': rng.integers(0, len(VERGLASUNGSARTEN), anzahl),
+        'beleuchtungen': rng.integers(1, len(NUTZUNGSBEREICHE) + 1, anzahl),
+        'bereiche': rng.permuted(np.tile(np.arange(len(NUTZUNGSBEREICHE)), (anzahl, 1)), axis=1),
+        'beleuchtungsart': rng.integers(0, len(BELEUCHTUNGSARTEN), anzahl),
+        'regelungsart': rng.integers(0, len(REGELUNGSARTEN), anzahl),
+    }
+    # Fensterflächenanteil je Fassade: Beta mit Mittelwert FENSTERANTEIL * Faktor
+    mittel = np.array([FENSTERANTEIL[a] for a in GEBAEUDEARTEN])[art]
+    for o in ORIENTIERUNGEN:
+        m = np.clip(mittel * FENSTER_ORIENTIERUNG[o], 0.05, 0.9)
+        z[f'fensteranteil_{o}'] = rng.beta(m * 8, (1 - m) * 8)
+
+    nf = z['laenge_ns'] * z['breite_ow'] * z['geschosse'] * 0.85
+    z['waermequellen'] = np.minimum(rng.poisson(nf / NF_JE_WAERMEQUELLE + 1), MAX_WAERMEQUELLEN)
+    return z
+
+
+def _gebaeude(z, i, nummer, ort, praefix):
+    """Datensatz für _block_speichern und Parametersatz für berechnung_api"""
+    art = GEBAEUDEARTEN[z['art'][i]]
+    laenge, breite = float(z['laenge_ns'][i]), float(z['breite_ow'][i])
+    geschosse = int(z['geschosse'][i])
+    hoehe = geschosse * float(z['geschosshoehe'][i])
+    fassaden = {'nord': laenge * hoehe, 'sued': laenge * hoehe, 'ost': breite * hoehe, 'west': breite * hoehe}
+    fenster = {o: round(float(z[f'fensteranteil_{o}'][i]) * fassaden[o], 1) for o in ORIENTIERUNGEN}
+    g_wert = float(z['g_wert'][i])
+
+    gebaeude = {
+        'name': f'{praefix} {nummer:07d}',
+        'ort_id': ort.id,
+        'gebaeudeart': art,
+        'laenge_ns': laenge,
+        'breite_ow': breite,
+        'geschosse': geschosse,
+        'geschosshoehe': float(z['geschosshoehe'][i]),
+        'personendichte': float(z['personendichte'][i]),
+        **{f'fensterflaeche_{o}': fenster[o] for o in ORIENTIERUNGEN},
+        **{f'g_wert_{o}': g_wert for o in ORIENTIERUNGEN},
+    }
+
+    u_basis = BAUALTERSKLASSEN[z['baualter'][i]][1]
+    bauteile = {
+        typ: round(u_basis['wand' if typ.startswith('wand') else typ] * z['u_streuung'][i][j], 3)
+        for j, typ in enumerate(BAUTEIL_TYPEN)
+    }
+
+    pv_anlage = None
+    if z['pv'][i]:
+        opak_sued = max(0.0, fassaden['sued'] - fenster['sued'])
+        pv_anlage = {
+            'pv_vor_opak_sued': round(opak_sued * float(z['pv_anteil'][i]), 1),
+            'wirkungsgrad': float(z['pv_wirkungsgrad'][i]),
+        }
+    lueftung = None
+    if z['lueftung'][i]:
+        typ = LUEFTUNGSTYPEN[z['lueftungstyp'][i]]
+        lueftung = {'typ': typ, 'wirkungsgrad_wrg': float(z['wrg'][i]) if typ == 'mechanisch_wrg' else 0}
+    sonnenschutz = None
+    if z['sonnenschutz'][i]:
+        sonnenschutz = {
+            'sonnenschutzart': SONNENSCHUTZARTEN[z['sonnenschutzart'][i]],
+            'verglasungsart': VERGLASUNGSARTEN[z['verglasungsart'][i]],
+        }
+    laufzeit = 12 if art == 'heim' else 9
+    beleuchtungen = [
+        {
+            'nutzungsbereich': NUTZUNGSBEREICHE[bereich],
+            'beleuchtungsart': BELEUCHTUNGSARTEN[z['beleuchtungsart'][i]],
+            'regelungsart': REGELUNGSARTEN[z['regelungsart'][i]],
+            'laufzeit_h_d': laufzeit,
+            'laufzeit_d_a': 365 if art == 'heim' else 250,
+        }
+        for bereich in z['bereiche'][i][:z['beleuchtungen'][i]]
+    ]
+    waermequellen = []
+    for k in range(int(z['waermequellen'][i])):
+        name, leistung = WAERMEQUELLEN[(nummer + k) % len(WAERMEQUELLEN)]
+        waermequellen.append({
+            'typ': 'geraet', 'name': name, 'anzahl': 1 + (nummer * 7 + k) % 20, 'leistung': leistung,
+        })
+
+    zeile = {
+        'gebaeude': gebaeude,
+        'bauteile': [{'typ': typ, 'u_wert': u} for typ, u in bauteile.items()],
+        'pv_anlage': pv_anlage,
+        'lueftung': lueftung,
+        'sonnenschutz': sonnenschutz,
+        'beleuchtungen': beleuchtungen,
+        'waermequellen': waermequellen,
+    }
+    parameter = {
+        'laenge_ns': laenge,
+        'breite_ow': breite,
+        'geschosse': geschosse,
+        'geschosshoehe': gebaeude['geschosshoehe'],
+        'personendichte': gebaeude['personendichte'],
+        'geb_klasse': art,
+        'ort': ort.name,
+        **{f'fenster_{o}': fenster[o] for o in ORIENTIERUNGEN},
+        **{f'g_wert_{o}': g_wert for o in ORIENTIERUNGEN},
+        **{f'u_wert_{typ}': u for typ, u in bauteile.items()},
+    }
+    return zeile, parameter
+
+
+def portfolio_erzeugen(anzahl, seed=0, orte=None, praefix='Synthetisch'):
+    """
+    Erzeugt (Datensatz, Parametersatz) für ``anzahl`` Gebäude
+
+    ``orte`` ist eine Liste von Ort-Objekten (Standard: alle, nach id).
+    """
+    if orte is None:
+        orte = list(Ort.objects.order_by('id'))
+    if not orte:
+        raise ValueError('Keine Orte vorhanden')
+    for teil, start in enumerate(range(0, anzahl, ZIEHUNG_TEIL)):
+        groesse = min(ZIEHUNG_TEIL, anzahl - start)
+        # Listen statt Arrays: schnellerer Zugriff auf einzelne Werte
+        z = {name: werte.tolist() for name, werte in _teil_ziehen(
+            np.random.default_rng([seed, teil]), groesse, len(orte),
+        ).items()}
+        for i in range(groesse):
+            yield _gebaeude(z, i, start + i + 1, orte[z['ort'][i]], praefix)
+
+
+# Relationen: Schlüssel im Datensatz -> Modell
+RELATIONEN = {
+    'bauteile': Bauteil,
+    'pv_anlage': PVAnlage,
+    'lueftung': Lueftung,
+    'sonnenschutz': Sonnenschutz,
+    'beleuchtungen': Beleuchtung,
+    'waermequellen': Waermequelle,
+}
+
+
+def _einfuegen(modell, gebaeude_ids, eintraege):
+    """
+    INSERT per executemany ohne Modellinstanzen; nicht angegebene Felder
+    erhalten ihren Standardwert (die Werte sind bereits Python-Grundtypen)
+    """
+    felder = [f for f in modell._meta.concrete_fields if not f.primary_key and f.attname != 'gebaeude_id']
+    standard = [(f.attname, f.get_default()) for f in felder]
+    quote = connection.ops.quote_name
+    spalten = ', '.join(quote(f.column) for f in [modell._meta.get_field('gebaeude'), *felder])
+    sql = (
+        f'INSERT INTO {quote(modell._meta.db_table)} ({spalten}) '
+        f'VALUES ({", ".join(["%s"] * (len(felder) + 1))})'
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            (gebaeude_id, *(werte.get(name, wert) for name, wert in standard))
+            for gebaeude_id, werte in zip(gebaeude_ids, eintraege)
+        ])
+
+
+def _block_speichern(block):
+    """Speichert einen Block Datensätze in einer Transaktion"""
+    with transaction.atomic():
+        gebaeude = Gebaeude.objects.bulk_create([Gebaeude(**z['gebaeude']) for z in block])
+        if gebaeude and gebaeude[0].pk is None:
+            raise RuntimeError('Die Datenbank liefert bei bulk_create keine ids zurück')
+
+        for schluessel, modell in RELATIONEN.items():
+            ids = []
+            eintraege = []
+            for objekt, zeile in zip(gebaeude, block):
+                wert = zeile[schluessel]
+                if isinstance(wert, dict):
+                    ids.append(objekt.pk)
+                    eintraege.append(wert)
+                elif wert:
+                    ids.extend([objekt.pk] * len(wert))
+                    eintraege.extend(wert)
+            if eintraege:
+                _einfuegen(modell, ids, eintraege)
+    return len(gebaeude)
+
+
+def portfolio_speichern(gebaeude, block_groesse=5000, fortschritt=None):
+    """
+    Speichert (Datensatz, Parametersatz) aus portfolio_erzeugen blockweise
+
+    ``fortschritt`` wird nach jedem Block mit der Zahl der bisher
+    angelegten Gebäude aufgerufen. Gibt die Zahl der Gebäude zurück.
+    """
+    block = []
+    angelegt = 0
+    for zeile, _ in gebaeude:
+        block.append(zeile)
+        if len(block) >= block_groesse:
+            angelegt += _block_speichern(block)
+            block = []
+            if fortschritt is not None:
+                fortschritt(angelegt)
+    if block:
+        angelegt += _block_speichern(block)
+        if fortschritt is not None:
+            fortschritt(angelegt)
+    return angelegt
@@ -0,0 +1,52 @@
+"""
+Protokoll (Trace) der Einzelberechnung
+
+Innerhalb von ``protokollieren()`` legt berechne_energiebilanz für jeden
+Aufruf einen Baum mit allen Bilanztermen, ungerundeten Zwischenwerten und
+Laufzeiten an::
+
+    with protokollieren() as protokoll:
+        ergebnis = berechne_energiebilanz(...)
+    protokoll.baum
+
+Jeder Knoten ist ein Dict mit 'name' (berechne_*-Funktion), 'wert',
+'dauer_ms' (einschließlich der Kinder) und 'kinder' (vorgelagerte Terme).
+Außerhalb von ``protokollieren()`` kostet das Protokoll einen
+ContextVar-Zugriff je Berechnung.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+_protokoll = ContextVar('bilanz_protokoll', default=None)
+
+
+class Protokoll:
+    """Bäume aller Berechnungen innerhalb von protokollieren()"""
+
+    def __init__(self):
+        self.baeume = []
+
+    def hinzufuegen(self, baum):
+        self.baeume.append(baum)
+
+    @property
+    def baum(self):
+        """Baum der letzten Berechnung oder None"""
+        return self.baeume[-1] if self.baeume else None
+
+
+def aktuelles_protokoll():
+    """Laufendes Protokoll oder None"""
+    return _protokoll.get()
+
+
+@contextmanager
+def protokollieren():
+    """Protokolliert alle Berechnungen im Block (auch in kopierten Kontexten)"""
+    protokoll = Protokoll()
+    token = _protokoll.set(protokoll)
+    try:
+        yield protokoll
+    finally:
+        _protokoll.reset(token)
@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Ort
+from .klima import klima_register
+
+
+@receiver(post_save, sender=Ort)
+@receiver(post_delete, sender=Ort)
+def klima_register_invalidieren(sender, **kwargs):
+    """Klimadaten nach Änderungen an einem Ort neu laden, sobald sie committet sind"""
+    transaction.on_commit(klima_register.invalidieren, using=kwargs.get('using'))
@@ -0,0 +1,217 @@
+"""
+Spaltenorientierte Snapshots der Berechnungseingaben und Ergebnisse
+
+Ein Snapshot ist ein ZIP-Archiv mit einer ``.npy``-Datei je Spalte und
+Zeilengruppe (``00000/laenge_ns.npy``, ...) und einer ``meta.json``. Die
+Eingabespalten sind genau die Spalten der Batch-Berechnung (siehe
+``SPALTEN_STANDARD``), dazu ``id``, ``name`` und ``ort``; die Ergebnisse
+stehen ungerundet als ``<block>.<feld>``.
+
+Geschrieben wird zeilengruppenweise, gelesen werden einzelne Zeilengruppen
+und Spalten, ohne das ganze Archiv zu laden. Mit ``berechne_snapshot``
+lassen sich die Eingaben ohne ORM-Objekte neu berechnen, z.B. für
+Was-wäre-wenn-Szenarien.
+"""
+import json
+import zipfile
+
+import numpy as np
+from django.utils import timezone
+
+from .berechnungen_batch import (
+    PFLICHT_SPALTEN, SPALTEN_STANDARD, berechne_energiebilanz_batch, spalten_aus_datensaetzen,
+)
+from .export import gebaeude_filtern
+from .lader import BerechnungsEingabe, gebaeude_mit_eingaben
+
+
+SNAPSHOT_VERSION = 1
+STANDARD_ZEILENGRUPPE = 10000
+
+EINGABE_SPALTEN = (*PFLICHT_SPALTEN, *SPALTEN_STANDARD)
+
+
+def _zeile(gebaeude):
+    """Kennung und Batch-Datensatz eines Gebäudes"""
+    return gebaeude.id, gebaeude.name, gebaeude.ort.name, BerechnungsEingabe(gebaeude).datensatz()
+
+
+def _spalten_der_zeilengruppe(zeilen):
+    """Kennungs-, Eingabe- und Ergebnisspalten für eine Liste von _zeile"""
+    ids, namen, orte, datensaetze = zip(*zeilen) if zeilen else ((), (), (), ())
+    eingaben = spalten_aus_datensaetzen(datensaetze)
+    eingaben['gebaeudeart'] = eingaben['gebaeudeart'].astype(str)
+
+    spalten = {
+        'id': np.array(ids, dtype=np.int64),
+        'name': np.array(namen, dtype=str),
+        'ort': np.array(orte, dtype=str),
+        **eingaben,
+    }
+    for block, inhalt in berechne_energiebilanz_batch(eingaben).items():
+        for feld, werte in inhalt.items():
+            spalten[f'{block}.{feld}'] = werte
+    return spalten
+
+
+def _schreibe_spalte(archiv, name, werte):
+    with archiv.open(f'{name}.npy', 'w', force_zip64=True) as datei:
+        np.lib.format.write_array(datei, np.ascontiguousarray(werte), allow_pickle=False)
+
+
+def snapshot_schreiben(datei, zeilengruppe=STANDARD_ZEILENGRUPPE, komprimieren=True, **kriterien):
+    """
+    Schreibt einen Snapshot aller Gebäude nach gebaeude_filtern(**kriterien)
+
+    Die Gebäude werden in Zeilengruppen von ``zeilengruppe`` geladen,
+    berechnet und geschrieben. Gibt die Metadaten zurück.
+    """
+    gebaeude = gebaeude_filtern(gebaeude_mit_eingaben().select_related('ort'), **kriterien)
+    meta = {
+        'version': SNAPSHOT_VERSION,
+        'erstellt_am': timezone.now().isoformat(),
+        'anzahl': 0,
+        'zeilengruppen': [],
+        'spalten': {},
+    }
+
+    kompression = zipfile.ZIP_DEFLATED if komprimieren else zipfile.ZIP_STORED
+    with zipfile.ZipFile(datei, 'w', compression=kompression, allowZip64=True) as archiv:
+        gruppe = []
+
+        def gruppe_schreiben():
+            spalten = _spalten_der_zeilengruppe(gruppe)
+            nummer = len(meta['zeilengruppen'])
+            for name, werte in spalten.items():
+                _schreibe_spalte(archiv, f'{nummer:05d}/{name}', werte)
+                meta['spalten'].setdefault(name, werte.dtype.kind)
+            meta['zeilengruppen'].append(len(gruppe))
+            meta['anzahl'] += len(gruppe)
+
+        for g in gebaeude.iterator(chunk_size=min(zeilengruppe, 2000)):
+            gruppe.append(_zeile(g))
+            if len(gruppe) >= zeilengruppe:
+                gruppe_schreiben()
+                gruppe = []
+        if gruppe:
+            gruppe_schreiben()
+        if not meta['zeilengruppen']:
+            # Schema auch für leere Snapshots
+            meta['spalten'] = {name: werte.dtype.kind for name, werte in _spalten_der_zeilengruppe([]).items()}
+
+        archiv.writestr('meta.json', json.dumps(meta, indent=2))
+    return meta
+
+
+class Snapshot:
+    """
+    Lesezugriff auf einen Snapshot
+
+    Spalten werden erst beim Zugriff aus dem Archiv gelesen.
+    """
+
+    def __init__(self, datei):
+        self._archiv = zipfile.ZipFile(datei)
+        try:
+            self.meta = json.loads(self._archiv.read('meta.json'))
+        except KeyError:
+            self._archiv.close()
+            raise ValueError('Kein Snapshot: meta.json fehlt')
+        if self.meta.get('version') != SNAPSHOT_VERSION:
+            self._archiv.close()
+            raise ValueError(f'Nicht unterstützte Snapshot-Version {self.meta.get("version")}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._archiv.close()
+
+    @property
+    def anzahl(self):
+        return self.meta['anzahl']
+
+    @property
+    def spaltennamen(self):
+        return list(self.meta['spalten'])
+
+    @property
+    def zeilengruppen(self):
+        return len(self.meta['zeilengruppen'])
+
+    def _pruefe_spalten(self, namen):
+        if namen is None:
+            return self.spaltennamen
+        unbekannt = set(namen) - self.meta['spalten'].keys()
+        if unbekannt:
+            raise KeyError(f'Unbekannte Spalten: {", ".join(sorted(unbekannt))}')
+        return list(namen)
+
+    def zeilengruppe(self, nummer, spalten=None):
+        """Dict Spalte -> Array für eine Zeilengruppe"""
+        ergebnis = {}
+        for name in self._pruefe_spalten(spalten):
+            with self._archiv.open(f'{nummer:05d}/{name}.npy') as datei:
+                ergebnis[name] = np.lib.format.read_array(datei, allow_pickle=False)
+        return ergebnis
+
+    def spalten(self, namen=None):
+        """Dict Spalte -> Array über alle Zeilengruppen"""
+        namen = self._pruefe_spalten(namen)
+        teile = [self.zeilengruppe(nummer, namen) for nummer in range(self.zeilengruppen)]
+        if not teile:
+            return {name: np.empty(0, dtype=self.meta['spalten'][name]) for name in namen}
+        return {name: np.concatenate([teil[name] for teil in teile]) for name in namen}
+
+    def eingaben(self):
+        """Eingabespalten für berechne_energiebilanz_batch"""
+        return self.spalten(EINGABE_SPALTEN)
+
+    def ergebnis(self):
+        """Gespeicherte Ergebnisse im Format von berechne_energiebilanz_batch"""
+        ergebnis = {}
+        for name, werte in self.spalten([n for n in self.spaltennamen if '.' in n]).items():
+            block, feld = name.split('.', 1)
+            ergebnis.setdefault(block, {})[feld] = werte
+        return ergebnis
+
+
+def berechne_snapshot(snapshot, aenderungen=None, verfahren='jahr'):
+    """
+    Berechnet die Eingaben eines Snapshots neu
+
+    ``aenderungen`` ordnet Eingabespalten einen Wert für alle Gebäude oder
+    ein Array mit einem Wert je Gebäude zu. Gerechnet wird je Zeilengruppe,
+    das Ergebnis hat das Format von berechne_energiebilanz_batch.
+    """
+    aenderungen = aenderungen or {}
+    unbekannt = set(aenderungen) - set(EINGABE_SPALTEN)
+    if unbekannt:
+        raise ValueError(f'Unbekannte Eingabespalten: {", ".join(sorted(unbekannt))}')
+
+    teile = []
+    start = 0
+    for nummer, groesse in enumerate(snapshot.meta['zeilengruppen']):
+        spalten = snapshot.zeilengruppe(nummer, EINGABE_SPALTEN)
+        for name, wert in aenderungen.items():
+            if np.ndim(wert) == 0:
+                # Textspalten nicht auf die bisherige Länge kürzen
+                dtype = None if spalten[name].dtype.kind == 'U' else spalten[name].dtype
+                spalten[name] = np.full(groesse, wert, dtype=dtype)
+            else:
+                werte = np.asarray(wert)
+                if len(werte) != snapshot.anzahl:
+                    raise ValueError(f'"{name}" braucht {snapshot.anzahl} Werte, erhalten {len(werte)}')
+                spalten[name] = werte[start:start + groesse]
+        teile.append(berechne_energiebilanz_batch(spalten, verfahren))
+        start += groesse
+
+    if not teile:
+        teile.append(berechne_energiebilanz_batch(snapshot.eingaben(), verfahren))
+    return {
+        block: {feld: np.concatenate([teil[block][feld] for teil in teile]) for feld in inhalt}
+        for block, inhalt in teile[0].items()
+    }
@@ -1,7 +1,56 @@
-from django.test import TestCase, Client
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from unittest.mock import patch
+
+import numpy as np
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth.models import Permission, User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
-from .models import Gebaeude, Ort, Bauteil
-from .berechnungen import berechne_heizwaermebedarf, berechne_energiebilanz
+from .models import Gebaeude, Ort, Bauteil, PVAnlage, Lueftung, Beleuchtung, Waermequelle, Berechnung
+from .berechnungen import (
+    berechne_heizwaermebedarf, berechne_energiebilanz, ORIENTIERUNGEN, GebaeudeEingabe,
+    berechne_transmissionsverlust, berechne_solargewinne, berechne_interne_gewinne,
+    BILANZ_TERME, berechne_energiebilanz_inkrementell,
+    ERGEBNIS_BLOECKE, ergebnis_auswahl, benoetigte_terme, berechne_energiebilanz_auswahl,
+)
+from .berechnungen_batch import (
+    berechne_energiebilanz_batch, datensatz_aus_objekten,
+    spalten_aus_datensaetzen, ergebnis_zeilen, geometrie_batch,
+    berechne_heizwaermebedarf_monatlich_batch, TEMPERATUR_REFERENZ, STRAHLUNG_ANTEILE,
+)
+from .eingaben import (
+    STANDARD_KLIMADATEN, datensatz_aus_parametern, gebaeude_eingabe_aus_parametern, klimadaten_aus_ort,
+    bauteile_aus_parametern, PARAMETER_NAMEN,
+)
+from .parameterstudie import berechne_parameterstudie
+from .cache import ErgebnisCache, get_ergebnis_cache
+from .klima import KlimaRegister, klima_register
+from .lader import lade_berechnungseingabe, lade_berechnungseingaben, alade_berechnungseingabe
+from .ausfuehrung import BegrenzterExecutor, Ueberlastet, vorhandener_berechnungs_executor
+from .ergebnisse import aktuelle_berechnung, eingabe_fingerabdruck
+from .snapshot import EINGABE_SPALTEN, Snapshot, berechne_snapshot, snapshot_schreiben
+from .websocket import WEBSOCKET_PFAD, mit_websocket
+from .importer import datensaetze_lesen, importieren
+from .klima_import import orte_lesen, orte_speichern
+from .benchmark import benchmarks, messen, vergleichen
+from .portfolio import portfolio_erzeugen
+from .protokoll import aktuelles_protokoll, protokollieren
+from .metriken import BERECHNUNG_DAUER, ORT_ABFRAGEN, REQUEST_DAUER, Histogramm, Zaehler
+from .klima_stunden import (
+    KANAELE, STUNDEN, KlimaStundenSpeicher, get_klima_stunden, klima_stunden_aktualisieren,
+    klima_stunden_schreiben, lese_epw, lese_try, strahlung_auf_flaechen, stundenwerte_fuer_ort,
+)
+from .forms import (
+    GebaeudeAllgForm, PVForm, LueftungForm, BeleuchtungForm, WaermequelleForm,
+)
 
 
 class OrtModelTest(TestCase):
@@ -16,6 +65,7 @@ class OrtModelTest(TestCase):
             solarstrahlung_west=700,
             solarstrahlung_horizontal=1000,
         )
+        klima_register.invalidieren()
 
     def test_ort_str(self):
         self.assertEqual(str(self.ort), 'Test Stadt')
@@ -33,6 +83,7 @@ class GebaeudeModelTest(TestCase):
             solarstrahlung_west=700,
             solarstrahlung_horizontal=1000,
         )
+        klima_register.invalidieren()
         self.gebaeude = Gebaeude.objects.create(
             name='Test Gebäude',
             ort=self.ort,
@@ -66,6 +117,7 @@ class BerechnungenTest(TestCase):
             solarstrahlung_west=700,
             solarstrahlung_horizontal=1000,
         )
+        klima_register.invalidieren()
         self.gebaeude = Gebaeude.objects.create(
             name='Test Gebäude',
             ort=self.ort,
@@ -137,6 +189,7 @@ class ViewsTest(TestCase):
             solarstrahlung_west=700,
             solarstrahlung_horizontal=1000,
         )
+        klima_register.invalidieren()
 
     def test_startseite_view(self):
         response = self.client.get(reverse('startseite'))
@@ -180,4 +233,1890 @@ class APITest(TestCase):
 
     def test_berechnung_api_post_not_allowed(self):
         response = self.client.post('/api/berechnung/')
-        self.assertEqual(response.status_code, 405)
\ No newline at end of file
+        self.assertEqual(response.status_code, 405)
+
+class BatchBerechnungTest(TestCase):
+    def setUp(self):
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3500,
+            solarstrahlung_nord=300,
+            solarstrahlung_sued=1100,
+            solarstrahlung_ost=700,
+            solarstrahlung_west=700,
+            solarstrahlung_horizontal=1000,
+        )
+        klima_register.invalidieren()
+        self.klimadaten = {
+            'heizgradtage': 3500,
+            'solarstrahlung_nord': 300,
+            'solarstrahlung_sued': 1100,
+            'solarstrahlung_ost': 700,
+            'solarstrahlung_west': 700,
+        }
+        self.buero = Gebaeude.objects.create(
+            name='Büro', ort=self.ort, gebaeudeart='buero',
+            laenge_ns=20, breite_ow=15, geschosse=3, geschosshoehe=2.8,
+            fensterflaeche_sued=40, fensterflaeche_nord=10,
+        )
+        self.schule = Gebaeude.objects.create(
+            name='Schule', ort=self.ort, gebaeudeart='schule',
+            laenge_ns=45, breite_ow=12, geschosse=2, geschosshoehe=3.5,
+            fensterflaeche_ost=60, fensterflaeche_west=60, g_wert_ost=0.5,
+        )
+        self.pv = PVAnlage.objects.create(
+            gebaeude=self.schule, pv_vor_opak_sued=30, pv_vor_fenster_ost=5,
+        )
+        self.lueftung = Lueftung.objects.create(gebaeude=self.schule)
+        self.beleuchtungen = [
+            Beleuchtung.objects.create(gebaeude=self.schule, nutzungsbereich='buero'),
+            Beleuchtung.objects.create(gebaeude=self.schule, nutzungsbereich='verkehr', laufzeit_h_d=4),
+        ]
+        self.waermequellen = [
+            Waermequelle.objects.create(gebaeude=self.buero, typ='geraet', name='PC', anzahl=20, leistung=150),
+        ]
+
+    def test_batch_entspricht_einzelberechnung(self):
+        faelle = [
+            (self.buero, {'wand_nord': 0.3, 'dach': 0.2, 'bodenplatte': 0.4},
+             None, None, [], self.waermequellen),
+            (self.schule, {'wand_nord': 0.3, 'wand_sued': 0.3, 'wand_ost': 0.25, 'wand_west': 0.25},
+             self.pv, self.lueftung, self.beleuchtungen, []),
+        ]
+
+        datensaetze = [
+            datensatz_aus_objekten(g, bt, pv, lt, bel, wq, self.klimadaten)
+            for g, bt, pv, lt, bel, wq in faelle
+        ]
+        batch = list(ergebnis_zeilen(berechne_energiebilanz_batch(spalten_aus_datensaetzen(datensaetze))))
+
+        for (g, bt, pv, lt, bel, wq), zeile in zip(faelle, batch):
+            einzeln = berechne_energiebilanz(g, bt, pv, lt, bel, wq, self.klimadaten)
+            for block, werte in einzeln.items():
+                for schluessel, wert in werte.items():
+                    self.assertAlmostEqual(zeile[block][schluessel], wert, delta=0.1)
+
+    def test_batch_liefert_arrays(self):
+        spalten = {
+            'laenge_ns': np.array([20.0, 30.0]),
+            'breite_ow': np.array([15.0, 10.0]),
+            'geschosse': np.array([3, 2]),
+        }
+        ergebnis = berechne_energiebilanz_batch(spalten)
+
+        self.assertEqual(ergebnis['nutzenergie']['ne_gesamt'].shape, (2,))
+        self.assertAlmostEqual(ergebnis['gebaeudedaten']['nf'][0], 765)
+        self.assertTrue(np.all(ergebnis['endenergie']['ee_gesamt'] > 0))
+
+
+class BatchAPITest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3000,
+            solarstrahlung_nord=250,
+            solarstrahlung_sued=1000,
+            solarstrahlung_ost=650,
+            solarstrahlung_west=650,
+            solarstrahlung_horizontal=900,
+        )
+        klima_register.invalidieren()
+        self.url = reverse('berechnung_batch_api')
+
+    def test_batch_entspricht_einzel_api(self):
+        parametersaetze = [
+            {'laenge_ns': '20', 'breite_ow': '15', 'geschosse': '3', 'u_wert_dach': '0.2'},
+            {'laenge_ns': 30, 'breite_ow': 12, 'geschosse': 2, 'fenster_sued': 25,
+             'geb_klasse': 'heim', 'ort': 'Test Stadt'},
+        ]
+        response = self.client.post(
+            self.url, json.dumps(parametersaetze), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['anzahl'], 2)
+        self.assertEqual(data['fehler'], 0)
+
+        for params, ergebnis in zip(parametersaetze, data['ergebnisse']):
+            einzeln = self.client.get(reverse('berechnung_api'), params).json()
+            for block, werte in einzeln.items():
+                for schluessel, wert in werte.items():
+                    self.assertAlmostEqual(ergebnis[block][schluessel], wert, delta=0.1)
+
+    def test_ndjson_mit_fehler_je_eintrag(self):
+        body = '\n'.join([
+            json.dumps({'laenge_ns': 20, 'breite_ow': 15, 'geschosse': 3}),
+            '{kein json',
+            json.dumps({'laenge_ns': 'abc'}),
+            json.dumps({'laenge_ns': 10, 'breite_ow': 10, 'geschosse': 1}),
+        ])
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        ergebnisse = response.json()['ergebnisse']
+
+        self.assertEqual(len(ergebnisse), 4)
+        self.assertIn('nutzenergie', ergebnisse[0])
+        self.assertIn('error', ergebnisse[1])
+        self.assertIn('error', ergebnisse[2])
+        self.assertEqual(ergebnisse[3]['gebaeudedaten']['grundflaeche'], 100)
+
+    def test_nicht_endliche_ergebnisse(self):
+        parametersaetze = [{'personendichte': 0}, {'laenge_ns': 1e308, 'breite_ow': 1e308}, {'personendichte': 10}]
+        for verfahren in ('jahr', 'monat'):
+            response = self.client.post(
+                f'{self.url}?verfahren={verfahren}', json.dumps(parametersaetze), content_type='application/json',
+            )
+            self.assertNotIn(b'Infinity', response.content)
+            self.assertNotIn(b'NaN', response.content)
+            data = response.json()
+            self.assertEqual(data['fehler'], 2)
+            self.assertIn('error', data['ergebnisse'][0])
+            self.assertIn('error', data['ergebnisse'][1])
+            self.assertIn('nutzenergie', data['ergebnisse'][2])
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=1000)
+    def test_grosser_body(self):
+        satz = {'laenge_ns': 20, 'breite_ow': 15, 'geschosse': 3, 'u_wert_dach': 0.2}
+        for body in (json.dumps([satz] * 100), '\n'.join([json.dumps(satz)] * 100)):
+            response = self.client.post(self.url, body, content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['anzahl'], 100)
+
+        formatiert = json.dumps(satz, indent=2)
+        self.assertEqual(self.client.post(self.url, formatiert, content_type='application/json').json()['anzahl'], 1)
+
+        with patch('bilanz.api_views.MAX_BATCH_GROESSE', 5):
+            body = '\n'.join([json.dumps(satz)] * 10)
+            self.assertEqual(self.client.post(self.url, body, content_type='application/json').status_code, 413)
+
+    @override_settings(BILANZ_BATCH_MAX_BYTES=1000)
+    def test_body_groesser_als_grenze(self):
+        satz = {'laenge_ns': 20, 'breite_ow': 15, 'geschosse': 3, 'u_wert_dach': 0.2}
+        for body in (
+            json.dumps([satz] * 100),
+            '\n'.join([json.dumps(satz)] * 100),
+            json.dumps(satz, indent=2) + ' ' * 2000,
+            json.dumps(dict(satz, name='x' * 100000)),
+        ):
+            response = self.client.post(self.url, body, content_type='application/json')
+            self.assertEqual(response.status_code, 413)
+
+        body = '\n'.join([json.dumps(satz)] * 5)
+        self.assertEqual(self.client.post(self.url, body, content_type='application/json').json()['anzahl'], 5)
+
+    def test_batch_get_not_allowed(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 405)
+
+
+class ParameterstudieTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.basis = {'laenge_ns': 20, 'breite_ow': 15, 'geschosse': 3,
+                      'fenster_sued': 20, 'u_wert_wand_sued': 0.35}
+
+    def test_raster_entspricht_einzelberechnungen(self):
+        studie = berechne_parameterstudie(
+            datensatz_aus_parametern(self.basis, STANDARD_KLIMADATEN),
+            {
+                'u_wert_wand_sued': {'von': 0.35, 'bis': 0.15, 'schritte': 3},
+                'fenster_sued': {'faktoren': [1, 2]},
+            },
+        )
+        self.assertEqual(studie['form'], (3, 2))
+        self.assertEqual(studie['parameter']['fenster_sued'].tolist(), [20, 40] * 3)
+
+        ne_heizung = studie['ergebnisse']['nutzenergie']['ne_heizung']
+        for i in range(6):
+            params = dict(self.basis,
+                          u_wert_wand_sued=studie['parameter']['u_wert_wand_sued'][i],
+                          fenster_sued=studie['parameter']['fenster_sued'][i])
+            einzeln = self.client.get(reverse('berechnung_api'), params).json()
+            self.assertAlmostEqual(ne_heizung[i], einzeln['nutzenergie']['ne_heizung'], delta=0.1)
+
+    def test_unbekannter_parameter(self):
+        with self.assertRaises(ValueError):
+            berechne_parameterstudie(
+                datensatz_aus_parametern(self.basis, STANDARD_KLIMADATEN), {'ort': [1, 2]}
+            )
+
+    def test_api(self):
+        response = self.client.post(reverse('parameterstudie_api'), json.dumps({
+            'basis': self.basis,
+            'variationen': {'g_wert_sued': [0.3, 0.5, 0.7], 'geschosse': [2, 4]},
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['anzahl'], 6)
+        self.assertEqual(len(data['ergebnisse']['endenergie']['ee_gesamt']), 6)
+
+        response = self.client.post(reverse('parameterstudie_api'), json.dumps({
+            'basis': self.basis, 'variationen': {'g_wert_sued': 'abc'},
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_api_ungueltige_werte(self):
+        for basis, variationen in [
+            (dict(self.basis, personendichte=0), {}),
+            (self.basis, {'breite_ow': [15, 0]}),
+            (self.basis, {'geschosse': {'von': 2, 'bis': -2, 'schritte': 3}}),
+            (dict(self.basis, laenge_ns=1e200), {'breite_ow': [1e200]}),
+        ]:
+            response = self.client.post(reverse('parameterstudie_api'), json.dumps({
+                'basis': basis, 'variationen': variationen,
+            }), content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertNotIn(b'Infinity', response.content)
+            self.assertNotIn(b'NaN', response.content)
+
+    def test_management_command(self):
+        ausgabe = StringIO()
+        call_command(
+            'parameterstudie', '--basis', 'laenge_ns=20', 'breite_ow=15',
+            '--variation', 'u_wert_dach=0.3:0.1:3', '--variation', 'fenster_ost=0,10',
+            stdout=ausgabe, stderr=StringIO(),
+        )
+        zeilen = ausgabe.getvalue().strip().splitlines()
+        self.assertEqual(len(zeilen), 7)
+        self.assertTrue(zeilen[0].startswith('u_wert_dach,fenster_ost,ne_heizung'))
+
+
+class MonatsbilanzTest(TestCase):
+    def setUp(self):
+        self.spalten = {
+            'laenge_ns': np.array([20.0, 40.0, 12.0]),
+            'breite_ow': np.array([15.0, 25.0, 10.0]),
+            'geschosse': np.array([3, 5, 1]),
+            'fensterflaeche_sued': np.array([30.0, 120.0, 5.0]),
+            'u_wert_wand_sued': np.array([0.3, 0.2, 1.2]),
+            'u_wert_dach': np.array([0.2, 0.15, np.nan]),
+            'temperatur_mittel': np.array([9.1, 9.1, 9.1]),
+            **{f'solarstrahlung_{o}': np.full(3, wert) for o, wert in
+               [('nord', 300.0), ('sued', 1100.0), ('ost', 700.0), ('west', 700.0)]},
+        }
+
+    def test_monatswerte(self):
+        geometrie = geometrie_batch(self.spalten)
+        ergebnis = berechne_heizwaermebedarf_monatlich_batch(self.spalten, geometrie)
+
+        self.assertEqual(ergebnis['monate'].shape, (3, 12))
+        self.assertTrue(np.all(ergebnis['monate'] >= 0))
+        self.assertTrue(np.all((ergebnis['ausnutzungsgrad'] >= 0) & (ergebnis['ausnutzungsgrad'] <= 1)))
+        np.testing.assert_allclose(ergebnis['jahr'], ergebnis['monate'].sum(axis=1))
+        # Im Winter wird mehr geheizt als im Sommer
+        self.assertTrue(np.all(ergebnis['monate'][:, 0] > ergebnis['monate'][:, 6]))
+
+    def test_explizite_monatswerte_entsprechen_profil(self):
+        geometrie = geometrie_batch(self.spalten)
+        aus_profil = berechne_heizwaermebedarf_monatlich_batch(self.spalten, geometrie)
+
+        explizit = dict(self.spalten)
+        explizit['temperatur_monat'] = np.tile(TEMPERATUR_REFERENZ + 9.1 - TEMPERATUR_REFERENZ.mean(), (3, 1))
+        for o in ORIENTIERUNGEN:
+            explizit[f'solarstrahlung_monat_{o}'] = np.outer(self.spalten[f'solarstrahlung_{o}'], STRAHLUNG_ANTEILE[o])
+        aus_spalten = berechne_heizwaermebedarf_monatlich_batch(explizit, geometrie)
+
+        np.testing.assert_allclose(aus_spalten['monate'], aus_profil['monate'], rtol=1e-9, atol=1e-6)
+
+    def test_waermerer_ort_braucht_weniger(self):
+        warm = dict(self.spalten, temperatur_mittel=np.full(3, 12.0))
+        kalt = berechne_energiebilanz_batch(self.spalten, verfahren='monat')
+        warm = berechne_energiebilanz_batch(warm, verfahren='monat')
+        self.assertTrue(np.all(warm['nutzenergie']['ne_heizung'] < kalt['nutzenergie']['ne_heizung']))
+
+    def test_unbekanntes_verfahren(self):
+        with self.assertRaises(ValueError):
+            berechne_energiebilanz_batch(self.spalten, verfahren='stunde')
+
+    def test_batch_api_monatsverfahren(self):
+        response = self.client.post(
+            reverse('berechnung_batch_api') + '?verfahren=monat',
+            json.dumps([{'laenge_ns': 20, 'breite_ow': 15, 'geschosse': 3}]),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('nutzenergie', response.json()['ergebnisse'][0])
+
+
+class GebaeudeEingabeTest(TestCase):
+    def setUp(self):
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3500,
+            solarstrahlung_nord=300,
+            solarstrahlung_sued=1100,
+            solarstrahlung_ost=700,
+            solarstrahlung_west=700,
+            solarstrahlung_horizontal=1000,
+        )
+        klima_register.invalidieren()
+        self.gebaeude = Gebaeude.objects.create(
+            name='Test Gebäude', ort=self.ort, gebaeudeart='heim',
+            laenge_ns=22, breite_ow=14, geschosse=4, geschosshoehe=3.1,
+            fensterflaeche_sued=35, fensterflaeche_west=12, g_wert_sued=0.45,
+        )
+
+    def test_geometrie_wie_modell(self):
+        eingabe = GebaeudeEingabe.aus_gebaeude(self.gebaeude)
+        for feld in ['hoehe', 'grundflaeche', 'bgf', 'nf', 'volumen']:
+            self.assertEqual(getattr(eingabe, feld), getattr(self.gebaeude, feld))
+        self.assertEqual(eingabe.fensterflaechen, (0, 35, 0, 12))
+        self.assertEqual(eingabe.g_werte, (0.6, 0.45, 0.6, 0.6))
+
+    def test_ergebnis_wie_modell(self):
+        bauteile_dict = {'wand_sued': 0.3, 'wand_west': 0.25, 'dach': 0.2}
+        klimadaten = klimadaten_aus_ort(self.ort)
+        self.assertEqual(
+            berechne_energiebilanz(self.gebaeude, bauteile_dict, None, None, [], [], klimadaten),
+            berechne_energiebilanz(
+                GebaeudeEingabe.aus_gebaeude(self.gebaeude), bauteile_dict, None, None, [], [], klimadaten
+            ),
+        )
+
+    def test_aus_parametern(self):
+        eingabe = gebaeude_eingabe_aus_parametern({
+            'laenge_ns': '22', 'breite_ow': '14', 'geschosse': '4', 'geschosshoehe': '3.1',
+            'geb_klasse': 'heim', 'fenster_sued': '35', 'g_wert_sued': '0.45',
+        })
+        self.assertEqual(eingabe.grundflaeche, self.gebaeude.grundflaeche)
+        self.assertEqual(eingabe.volumen, self.gebaeude.volumen)
+        self.assertEqual(eingabe.gebaeudeart, 'heim')
+        self.assertFalse(hasattr(eingabe, '__dict__'))
+
+
+class ErgebnisCacheTest(TestCase):
+    def test_lru_verdraengung(self):
+        cache = ErgebnisCache(groesse=2, ttl=60)
+        cache.set('a', {'x': 1})
+        cache.set('b', {'x': 2})
+        cache.get('a')
+        cache.set('c', {'x': 3})
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), {'x': 1})
+        self.assertEqual(cache.statistik()['verdraengt'], 1)
+
+    def test_ttl(self):
+        cache = ErgebnisCache(groesse=10, ttl=0)
+        cache.set('a', {'x': 1})
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.statistik()['abgelaufen'], 1)
+
+    def test_geteilter_django_cache(self):
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            worker_1 = ErgebnisCache(groesse=10, ttl=60, django_cache='default')
+            worker_2 = ErgebnisCache(groesse=10, ttl=60, django_cache='default')
+            worker_1.set(('schluessel',), {'x': 1})
+
+            self.assertEqual(worker_2.get(('schluessel',)), {'x': 1})
+            self.assertEqual(worker_2.statistik()['treffer_geteilt'], 1)
+
+    @override_settings(BILANZ_ERGEBNIS_CACHE={'GROESSE': 16, 'TTL': 60})
+    def test_api_trifft_normalisierte_parameter(self):
+        self.client.get(reverse('berechnung_api'), {'laenge_ns': '20', 'breite_ow': '15', 'geschosse': '3'})
+        response = self.client.get(
+            reverse('berechnung_api'), {'laenge_ns': '20.0', 'breite_ow': '15.00', 'geschosse': '3'}
+        )
+        self.assertEqual(response.status_code, 200)
+
+        statistik = get_ergebnis_cache().statistik()
+        self.assertEqual(statistik['treffer'], 1)
+        self.assertEqual(statistik['fehlschlaege'], 1)
+
+    @override_settings(BILANZ_ERGEBNIS_CACHE={'GROESSE': 0})
+    def test_cache_deaktiviert(self):
+        self.assertIsNone(get_ergebnis_cache())
+        response = self.client.get(reverse('berechnung_api'), {'laenge_ns': '20'})
+        self.assertEqual(response.status_code, 200)
+
+
+class KlimaRegisterTest(TestCase):
+    def setUp(self):
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3500,
+            solarstrahlung_nord=300,
+            solarstrahlung_sued=1100,
+            solarstrahlung_ost=700,
+            solarstrahlung_west=700,
+            solarstrahlung_horizontal=1000,
+        )
+        klima_register.invalidieren()
+
+    def test_ohne_datenbankzugriff(self):
+        klima_register.namen()
+        with self.assertNumQueries(0):
+            klimadaten = klima_register.klimadaten('Test Stadt')
+            self.assertEqual(klima_register.klimadaten_fuer_id(self.ort.id), klimadaten)
+            self.assertIn('Test Stadt', klima_register.namen())
+        self.assertEqual(klimadaten['heizgradtage'], 3500)
+        self.assertEqual(dict(klimadaten), klimadaten_aus_ort(self.ort))
+
+    def test_invalidierung_bei_aenderung(self):
+        self.assertEqual(klima_register.klimadaten('Test Stadt')['heizgradtage'], 3500)
+
+        # Invalidiert wird erst nach dem Commit
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.ort.heizgradtage = 3100
+            self.ort.save()
+            self.assertEqual(klima_register.klimadaten('Test Stadt')['heizgradtage'], 3500)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(klima_register.klimadaten('Test Stadt')['heizgradtage'], 3100)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ort.delete()
+        self.assertIsNone(klima_register.klimadaten('Test Stadt'))
+
+    def test_laden_vor_invalidierung_gilt_als_veraltet(self):
+        register = KlimaRegister()
+        abfrage = register._abfrage
+        with patch.object(register, '_abfrage', side_effect=lambda: (register.invalidieren(), abfrage())[1]):
+            self.assertEqual(register.klimadaten('Test Stadt')['heizgradtage'], 3500)
+        self.assertIsNone(register._stand)
+        with self.assertNumQueries(1):
+            register.klimadaten('Test Stadt')
+        with self.assertNumQueries(0):
+            register.klimadaten('Test Stadt')
+
+    def test_api_nutzt_register(self):
+        params = {'laenge_ns': '20', 'breite_ow': '15', 'geschosse': '3', 'ort': 'Test Stadt'}
+        self.client.get(reverse('berechnung_api'), params)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('berechnung_api'), dict(params, laenge_ns='21'))
+        self.assertEqual(response.status_code, 200)
+
+
+class GebaeudeLaderTest(TestCase):
+    def setUp(self):
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3500,
+            solarstrahlung_nord=300,
+            solarstrahlung_sued=1100,
+            solarstrahlung_ost=700,
+            solarstrahlung_west=700,
+            solarstrahlung_horizontal=1000,
+        )
+        klima_register.invalidieren()
+        self.gebaeude_ids = []
+        for i in range(6):
+            gebaeude = Gebaeude.objects.create(
+                name=f'Gebäude {i}', ort=self.ort, laenge_ns=20 + i, breite_ow=15, geschosse=3,
+            )
+            Bauteil.objects.create(gebaeude=gebaeude, typ='dach', u_wert=0.2)
+            Bauteil.objects.create(gebaeude=gebaeude, typ='wand_sued', u_wert=0.3)
+            Beleuchtung.objects.create(gebaeude=gebaeude, nutzungsbereich='buero')
+            Waermequelle.objects.create(gebaeude=gebaeude, typ='geraet', name='PC', leistung=100)
+            if i % 2:
+                PVAnlage.objects.create(gebaeude=gebaeude, pv_vor_opak_sued=10)
+                Lueftung.objects.create(gebaeude=gebaeude)
+            self.gebaeude_ids.append(gebaeude.id)
+        klima_register.namen()
+
+    def test_konstante_anzahl_abfragen(self):
+        with self.assertNumQueries(4):
+            einzeln = lade_berechnungseingaben(self.gebaeude_ids[:1])
+        with self.assertNumQueries(4):
+            alle = lade_berechnungseingaben(self.gebaeude_ids)
+
+        self.assertEqual(len(einzeln), 1)
+        self.assertEqual(list(alle), self.gebaeude_ids)
+
+    def test_eingaben_vollstaendig(self):
+        ohne_pv = lade_berechnungseingabe(self.gebaeude_ids[0])
+        mit_pv = lade_berechnungseingabe(self.gebaeude_ids[1])
+
+        self.assertIsNone(ohne_pv.pv_data)
+        self.assertIsNone(ohne_pv.lueftung_data)
+        self.assertIsNotNone(mit_pv.pv_data)
+        self.assertEqual(mit_pv.bauteile_dict, {'dach': 0.2, 'wand_sued': 0.3})
+        self.assertEqual(len(mit_pv.beleuchtungen_data), 1)
+        self.assertEqual(mit_pv.klimadaten['heizgradtage'], 3500)
+
+        with self.assertNumQueries(0):
+            ergebnis = mit_pv.berechnen()
+        self.assertGreater(ergebnis['pv']['pv_ertrag'], 0)
+
+    def test_gebaeude_berechnung_api(self):
+        response = self.client.get(reverse('gebaeude_berechnung', args=[self.gebaeude_ids[1]]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), lade_berechnungseingabe(self.gebaeude_ids[1]).berechnen())
+
+        response = self.client.get(reverse('gebaeude_berechnung', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+
+
+class GespeicherteBerechnungTest(TestCase):
+    def setUp(self):
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3500,
+            solarstrahlung_nord=300,
+            solarstrahlung_sued=1100,
+            solarstrahlung_ost=700,
+            solarstrahlung_west=700,
+            solarstrahlung_horizontal=1000,
+        )
+        klima_register.invalidieren()
+        self.gebaeude = Gebaeude.objects.create(
+            name='Test', ort=self.ort, laenge_ns=20, breite_ow=15, geschosse=3,
+        )
+        self.wand = Bauteil.objects.create(gebaeude=self.gebaeude, typ='wand_sued', u_wert=0.3)
+        Beleuchtung.objects.create(gebaeude=self.gebaeude, nutzungsbereich='buero')
+
+    def test_ergebnis_wird_gespeichert(self):
+        eingaben = lade_berechnungseingabe(self.gebaeude.id)
+        berechnung, neu = aktuelle_berechnung(eingaben)
+
+        self.assertTrue(neu)
+        ergebnis = eingaben.berechnen()
+        self.assertEqual(berechnung.ergebnis, ergebnis)
+        self.assertEqual(berechnung.eingabe_hash, eingabe_fingerabdruck(eingaben))
+
+        gespeichert = Berechnung.objects.get(gebaeude=self.gebaeude)
+        self.assertEqual(gespeichert.ne_trinkwarmwasser, ergebnis['nutzenergie']['ne_tww'])
+        self.assertEqual(gespeichert.ee_gesamt, ergebnis['endenergie']['ee_gesamt'])
+        self.assertEqual(gespeichert.ergebnis, ergebnis)
+
+    def test_keine_neuberechnung_bei_gleichen_eingaben(self):
+        aktuelle_berechnung(lade_berechnungseingabe(self.gebaeude.id))
+
+        eingaben = lade_berechnungseingabe(self.gebaeude.id)
+        with self.assertNumQueries(0):
+            _, neu = aktuelle_berechnung(eingaben)
+        self.assertFalse(neu)
+
+    def test_gleichzeitige_erste_berechnung(self):
+        # Beide Requests laden die Eingaben, bevor einer gespeichert hat
+        erste = lade_berechnungseingabe(self.gebaeude.id)
+        zweite = lade_berechnungseingabe(self.gebaeude.id)
+        aktuelle_berechnung(erste)
+        berechnung, neu = aktuelle_berechnung(zweite)
+        self.assertTrue(neu)
+        self.assertEqual(Berechnung.objects.filter(gebaeude=self.gebaeude).count(), 1)
+        self.assertEqual(Berechnung.objects.get(gebaeude=self.gebaeude).pk, berechnung.pk)
+
+    def test_neuberechnung_bei_geaenderten_eingaben(self):
+        aktuelle_berechnung(lade_berechnungseingabe(self.gebaeude.id))
+        vorher = Berechnung.objects.get(gebaeude=self.gebaeude).eingabe_hash
+
+        self.wand.u_wert = 0.2
+        self.wand.save()
+        berechnung, neu = aktuelle_berechnung(lade_berechnungseingabe(self.gebaeude.id))
+        self.assertTrue(neu)
+        self.assertNotEqual(berechnung.eingabe_hash, vorher)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ort.heizgradtage = 4000
+            self.ort.save()
+        _, neu = aktuelle_berechnung(lade_berechnungseingabe(self.gebaeude.id))
+        self.assertTrue(neu)
+
+        PVAnlage.objects.create(gebaeude=self.gebaeude, pv_vor_opak_sued=10)
+        berechnung, neu = aktuelle_berechnung(lade_berechnungseingabe(self.gebaeude.id))
+        self.assertTrue(neu)
+        self.assertGreater(berechnung.pv_ertrag, 0)
+        self.assertEqual(Berechnung.objects.count(), 1)
+
+    def test_api_nutzt_gespeichertes_ergebnis(self):
+        url = reverse('gebaeude_berechnung', args=[self.gebaeude.id])
+        erste = self.client.get(url).json()
+        berechnet_am = Berechnung.objects.get(gebaeude=self.gebaeude).berechnet_am
+
+        zweite = self.client.get(url).json()
+        self.assertEqual(erste, zweite)
+        self.assertEqual(Berechnung.objects.get(gebaeude=self.gebaeude).berechnet_am, berechnet_am)
+
+
+class InkrementelleBerechnungTest(TestCase):
+    def setUp(self):
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3500,
+            solarstrahlung_nord=300,
+            solarstrahlung_sued=1100,
+            solarstrahlung_ost=700,
+            solarstrahlung_west=700,
+            solarstrahlung_horizontal=1000,
+        )
+        klima_register.invalidieren()
+        self.klimadaten = klima_register.klimadaten('Test Stadt')
+        self.bauteile = {'wand_sued': 0.3, 'dach': 0.2}
+
+    def _gebaeude(self, g_sued=0.6):
+        return GebaeudeEingabe(20, 15, 3, fensterflaechen=(5, 20, 5, 5), g_werte=(0.6, g_sued, 0.6, 0.6))
+
+    def test_gleiches_ergebnis_wie_gesamtberechnung(self):
+        werte, neu = berechne_energiebilanz_inkrementell(
+            self._gebaeude(), self.bauteile, None, None, [], [], self.klimadaten,
+        )
+        self.assertEqual(neu, list(BILANZ_TERME))
+        self.assertEqual(
+            werte['energiebilanz'],
+            berechne_energiebilanz(self._gebaeude(), self.bauteile, None, None, [], [], self.klimadaten),
+        )
+
+    def test_nur_betroffene_terme_neu(self):
+        cache = ErgebnisCache()
+
+        def berechnen(gebaeude, bauteile):
+            return berechne_energiebilanz_inkrementell(
+                gebaeude, bauteile, None, None, [], [], self.klimadaten, cache=cache,
+            )
+
+        erste, _ = berechnen(self._gebaeude(), self.bauteile)
+        _, neu = berechnen(self._gebaeude(), self.bauteile)
+        self.assertEqual(neu, [])
+
+        werte, neu = berechnen(self._gebaeude(), dict(self.bauteile, wand_sued=0.2))
+        self.assertEqual(neu, ['transmissionsverlust', 'heizwaermebedarf', 'energiebilanz'])
+        self.assertLess(werte['heizwaermebedarf'], erste['heizwaermebedarf'])
+
+        _, neu = berechnen(self._gebaeude(g_sued=0.5), self.bauteile)
+        self.assertEqual(neu, ['solargewinne', 'energiebilanz'])
+
+    @override_settings(BILANZ_TERM_CACHE={'GROESSE': 100})
+    def test_terme_api(self):
+        params = {'laenge_ns': '20', 'breite_ow': '15', 'geschosse': '3', 'u_wert_dach': '0.2'}
+        erste = self.client.get(reverse('berechnung_terme_api'), params).json()
+        self.assertEqual(erste['neu_berechnet'], list(BILANZ_TERME))
+        self.assertEqual(erste['ergebnis'], self.client.get(reverse('berechnung_api'), params).json())
+        self.assertIn('transmissionsverlust', erste['terme'])
+
+        zweite = self.client.get(reverse('berechnung_terme_api'), dict(params, u_wert_dach='0.15')).json()
+        self.assertEqual(zweite['neu_berechnet'], ['transmissionsverlust', 'heizwaermebedarf', 'energiebilanz'])
+
+
+class ErgebnisAuswahlTest(TestCase):
+    def setUp(self):
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3500,
+            solarstrahlung_nord=300,
+            solarstrahlung_sued=1100,
+            solarstrahlung_ost=700,
+            solarstrahlung_west=700,
+            solarstrahlung_horizontal=1000,
+        )
+        klima_register.invalidieren()
+        self.gebaeude = Gebaeude.objects.create(
+            name='Test', ort=self.ort, laenge_ns=20, breite_ow=15, geschosse=3,
+            fensterflaeche_sued=20,
+        )
+        Bauteil.objects.create(gebaeude=self.gebaeude, typ='wand_sued', u_wert=0.3)
+        Beleuchtung.objects.create(gebaeude=self.gebaeude, nutzungsbereich='buero')
+        Waermequelle.objects.create(gebaeude=self.gebaeude, typ='geraet', name='PC', leistung=100)
+        PVAnlage.objects.create(gebaeude=self.gebaeude, pv_vor_opak_sued=200)
+        Lueftung.objects.create(gebaeude=self.gebaeude)
+
+    def test_auswahl(self):
+        self.assertEqual(ergebnis_auswahl(), ERGEBNIS_BLOECKE)
+        self.assertEqual(
+            ergebnis_auswahl(['pv'], ['bgf']),
+            {'pv': ('pv_ertrag', 'strom_ueberschuss'), 'gebaeudedaten': ('bgf',)},
+        )
+        self.assertEqual(benoetigte_terme(ergebnis_auswahl(['gebaeudedaten'])), [])
+        self.assertEqual(
+            benoetigte_terme(ergebnis_auswahl(felder=['ne_heizung'])),
+            ['transmissionsverlust', 'lueftungswaermeverlust', 'heizwaermebedarf',
+             'solargewinne', 'interne_gewinne'],
+        )
+        with self.assertRaises(ValueError):
+            ergebnis_auswahl(['unbekannt'])
+        with self.assertRaises(ValueError):
+            ergebnis_auswahl(felder=['unbekannt'])
+
+    def test_jedes_feld_wie_gesamtberechnung(self):
+        eingaben = lade_berechnungseingabe(self.gebaeude.id)
+        ergebnis = eingaben.berechnen()
+        for block, felder in ERGEBNIS_BLOECKE.items():
+            for feld in felder:
+                teil = berechne_energiebilanz_auswahl(
+                    ergebnis_auswahl(felder=[feld]), *eingaben.argumente(),
+                )
+                self.assertEqual(teil, {block: {feld: ergebnis[block][feld]}})
+
+    def test_geometrie_ohne_datenbank_und_klimadaten(self):
+        params = {'laenge_ns': '20', 'breite_ow': '15', 'geschosse': '3', 'blocks': 'gebaeudedaten'}
+        klima_register.invalidieren()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('berechnung_api'), params)
+        self.assertEqual(response.status_code, 200)
+        voll = self.client.get(reverse('berechnung_api'), dict(params, blocks='')).json()
+        self.assertEqual(response.json(), {'gebaeudedaten': voll['gebaeudedaten']})
+
+        response = self.client.get(reverse('berechnung_api'), dict(params, blocks='', fields='ne_heizung,pv_ertrag'))
+        self.assertEqual(response.json(), {
+            'nutzenergie': {'ne_heizung': voll['nutzenergie']['ne_heizung']},
+            'pv': {'pv_ertrag': voll['pv']['pv_ertrag']},
+        })
+
+        response = self.client.get(reverse('berechnung_api'), dict(params, blocks='xyz'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_gebaeude_berechnung_auswahl(self):
+        url = reverse('gebaeude_berechnung', args=[self.gebaeude.id])
+        voll = self.client.get(url).json()
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'blocks': 'gebaeudedaten'})
+        self.assertEqual(response.json(), {'gebaeudedaten': voll['gebaeudedaten']})
+
+        response = self.client.get(url, {'blocks': 'pv,gwp'})
+        self.assertEqual(response.json(), {'pv': voll['pv'], 'gwp': voll['gwp']})
+
+        self.assertEqual(self.client.get(url, {'fields': 'xyz'}).status_code, 400)
+        response = self.client.get(reverse('gebaeude_berechnung', args=[999999]), {'blocks': 'gebaeudedaten'})
+        self.assertEqual(response.status_code, 404)
+
+
+class LiveKontextTest(TestCase):
+    def setUp(self):
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3500,
+            solarstrahlung_nord=300,
+            solarstrahlung_sued=1100,
+            solarstrahlung_ost=700,
+            solarstrahlung_west=700,
+            solarstrahlung_horizontal=1000,
+        )
+        klima_register.invalidieren()
+        self.url = reverse('berechnung_kontext_api')
+
+    def _patch(self, daten):
+        return self.client.patch(self.url, json.dumps(daten), content_type='application/json')
+
+    def test_delta_liefert_nur_geaenderte_felder(self):
+        parameter = {'laenge_ns': '20', 'breite_ow': '15', 'geschosse': '3', 'u_wert_dach': '0.2'}
+        response = self.client.post(self.url, json.dumps(parameter), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['version'], 1)
+        self.assertEqual(
+            response.json()['ergebnis'], self.client.get(reverse('berechnung_api'), parameter).json()
+        )
+
+        response = self._patch({'u_wert_dach': '0.1'})
+        daten = response.json()
+        self.assertEqual(daten['version'], 2)
+        self.assertNotIn('gebaeudedaten', daten['aenderungen'])
+        self.assertNotIn('pv', daten['aenderungen'])
+        erwartet = self.client.get(reverse('berechnung_api'), dict(parameter, u_wert_dach='0.1')).json()
+        self.assertEqual(daten['aenderungen']['nutzenergie']['ne_heizung'], erwartet['nutzenergie']['ne_heizung'])
+
+        unveraendert = self._patch({'u_wert_dach': '0.1'}).json()
+        self.assertEqual(unveraendert, {'version': 2, 'aenderungen': {}})
+        self.assertEqual(self.client.get(self.url).json()['ergebnis'], erwartet)
+
+    def test_kontext_aus_gebaeude_der_session(self):
+        gebaeude = Gebaeude.objects.create(name='Test', ort=self.ort, laenge_ns=30, breite_ow=10, geschosse=2)
+        Bauteil.objects.create(gebaeude=gebaeude, typ='dach', u_wert=0.2)
+        session = self.client.session
+        session['gebaeude_id'] = gebaeude.id
+        session.save()
+
+        ergebnis = self.client.post(self.url, content_type='application/json').json()['ergebnis']
+        self.assertEqual(ergebnis, berechne_energiebilanz(
+            GebaeudeEingabe.aus_gebaeude(gebaeude), {'dach': 0.2}, None, None, [], [],
+            klima_register.klimadaten('Test Stadt'),
+        ))
+
+    def test_fehler(self):
+        self.assertEqual(self._patch({'laenge_ns': '21'}).status_code, 409)
+        self.assertEqual(self.client.get(self.url).status_code, 409)
+
+        self.client.post(self.url, content_type='application/json')
+        self.assertEqual(self._patch({'unbekannt': 1}).status_code, 400)
+        self.assertEqual(self._patch({'laenge_ns': 'abc'}).status_code, 400)
+        self.assertEqual(self._patch({'personendichte': 0}).status_code, 400)
+        self.assertEqual(self.client.get(self.url).json()['version'], 1)
+        self.assertEqual(set(self.client.session['berechnung_kontext']), {'version', 'parameter'})
+        response = self.client.post(self.url, json.dumps({'personendichte': 0}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(self.client.delete(self.url).status_code, 204)
+        self.assertEqual(self._patch({'laenge_ns': '21'}).status_code, 409)
+
+
+class LiveWebsocketTest(TestCase):
+    def setUp(self):
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3500,
+            solarstrahlung_nord=300,
+            solarstrahlung_sued=1100,
+            solarstrahlung_ost=700,
+            solarstrahlung_west=700,
+            solarstrahlung_horizontal=1000,
+        )
+        klima_register.invalidieren()
+        self.parameter = {'laenge_ns': '20', 'breite_ow': '15', 'geschosse': '3', 'ort': 'Test Stadt'}
+
+    async def _verbinden(self, pfad=WEBSOCKET_PFAD):
+        async def django_anwendung(scope, receive, send):
+            raise AssertionError('WebSocket darf nicht an Django gehen')
+
+        verbindung = ApplicationCommunicator(
+            mit_websocket(django_anwendung), {'type': 'websocket', 'path': pfad},
+        )
+        await verbindung.send_input({'type': 'websocket.connect'})
+        return verbindung, await verbindung.receive_output()
+
+    async def _senden(self, verbindung, daten):
+        await verbindung.send_input({'type': 'websocket.receive', 'text': json.dumps(daten)})
+
+    async def _empfangen(self, verbindung):
+        return json.loads((await verbindung.receive_output())['text'])
+
+    async def test_ergebnis_und_aenderungen(self):
+        verbindung, antwort = await self._verbinden()
+        self.assertEqual(antwort['type'], 'websocket.accept')
+
+        await self._senden(verbindung, {'id': 1, 'parameter': self.parameter})
+        erste = await self._empfangen(verbindung)
+        self.assertEqual(erste['id'], 1)
+        self.assertEqual(erste['ergebnis'], (await self.async_client.get(
+            reverse('berechnung_api'), self.parameter)).json())
+
+        await self._senden(verbindung, {'id': 2, 'parameter': {'u_wert_dach': '0.2'}})
+        zweite = await self._empfangen(verbindung)
+        self.assertEqual(zweite['version'], 2)
+        self.assertIn('ne_heizung', zweite['aenderungen']['nutzenergie'])
+        self.assertNotIn('gebaeudedaten', zweite['aenderungen'])
+
+        await self._senden(verbindung, {'id': 3, 'parameter': {'unbekannt': 1}})
+        self.assertEqual((await self._empfangen(verbindung))['id'], 3)
+
+        # Fehler in der Berechnung: Fehlermeldung, die Verbindung bleibt offen
+        await self._senden(verbindung, {'id': 4, 'parameter': {'personendichte': 0}})
+        self.assertIn('error', await self._empfangen(verbindung))
+        await self._senden(verbindung, {'id': 5, 'parameter': {'personendichte': 20}})
+        self.assertEqual((await self._empfangen(verbindung))['version'], 3)
+
+        await verbindung.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await verbindung.wait()
+
+    async def test_aktualisierungen_werden_zusammengefasst(self):
+        verbindung, _ = await self._verbinden()
+        await self._senden(verbindung, {'id': 0, 'parameter': self.parameter})
+        for nummer in range(1, 21):
+            await self._senden(verbindung, {'id': nummer, 'parameter': {'laenge_ns': str(20 + nummer)}})
+
+        antworten = [await self._empfangen(verbindung)]
+        while antworten[-1]['id'] != 20:
+            antworten.append(await self._empfangen(verbindung))
+        self.assertLess(len(antworten), 21)
+
+        endstand = (await self.async_client.get(
+            reverse('berechnung_api'), dict(self.parameter, laenge_ns='40'))).json()
+        self.assertEqual(antworten[-1]['version'], len(antworten))
+        gebaeudedaten = dict(antworten[0]['ergebnis']['gebaeudedaten'])
+        for antwort in antworten[1:]:
+            gebaeudedaten.update(antwort['aenderungen'].get('gebaeudedaten', {}))
+        self.assertEqual(gebaeudedaten, endstand['gebaeudedaten'])
+
+        await verbindung.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await verbindung.wait()
+
+    async def test_unerwarteter_fehler_schliesst_verbindung(self):
+        verbindung, _ = await self._verbinden()
+        # RecursionError statt ValueError beim Parsen
+        await verbindung.send_input({'type': 'websocket.receive', 'text': '[' * 100000 + ']' * 100000})
+        self.assertEqual(await verbindung.receive_output(), {'type': 'websocket.close', 'code': 1011})
+        await verbindung.wait()
+
+    async def test_unbekannter_pfad(self):
+        _, antwort = await self._verbinden('/ws/unbekannt/')
+        self.assertEqual(antwort, {'type': 'websocket.close', 'code': 4404})
+
+
+class AsyncAPITest(TestCase):
+    def setUp(self):
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3500,
+            solarstrahlung_nord=300,
+            solarstrahlung_sued=1100,
+            solarstrahlung_ost=700,
+            solarstrahlung_west=700,
+            solarstrahlung_horizontal=1000,
+        )
+        self.gebaeude = Gebaeude.objects.create(
+            name='Test', ort=self.ort, laenge_ns=20, breite_ow=15, geschosse=3,
+        )
+        Bauteil.objects.create(gebaeude=self.gebaeude, typ='dach', u_wert=0.2)
+        PVAnlage.objects.create(gebaeude=self.gebaeude, pv_vor_opak_sued=10)
+        klima_register.invalidieren()
+
+    async def test_berechnung_api_async(self):
+        params = {'laenge_ns': '20', 'breite_ow': '15', 'geschosse': '3', 'u_wert_dach': '0.2', 'ort': 'Test Stadt'}
+        response = await self.async_client.get(reverse('berechnung_api_async'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), (await self.async_client.get(reverse('berechnung_api'), params)).json())
+
+        response = await self.async_client.get(reverse('berechnung_api_async'), dict(params, blocks='pv'))
+        self.assertEqual(response.json(), {'pv': {'pv_ertrag': 0, 'strom_ueberschuss': 0}})
+
+        response = await self.async_client.get(reverse('berechnung_api_async'), dict(params, laenge_ns='abc'))
+        self.assertEqual(response.status_code, 400)
+
+    async def test_gebaeude_berechnung_async(self):
+        url = reverse('gebaeude_berechnung_async', args=[self.gebaeude.id])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        eingaben = await alade_berechnungseingabe(self.gebaeude.id)
+        self.assertEqual(response.json(), eingaben.berechnen())
+        self.assertGreater(response.json()['pv']['pv_ertrag'], 0)
+
+        berechnung = await Berechnung.objects.aget(gebaeude=self.gebaeude)
+        self.assertEqual(berechnung.ergebnis, response.json())
+
+        response = await self.async_client.get(url, {'blocks': 'gebaeudedaten'})
+        self.assertEqual(list(response.json()), ['gebaeudedaten'])
+
+        response = await self.async_client.get(reverse('gebaeude_berechnung_async', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_begrenzter_executor(self):
+        executor = BegrenzterExecutor(worker=1, warteschlange=1)
+        freigabe = threading.Event()
+        try:
+            laufend = [asyncio.ensure_future(executor.ausfuehren(freigabe.wait)) for _ in range(2)]
+            await asyncio.sleep(0)
+            with self.assertRaises(Ueberlastet):
+                await executor.ausfuehren(sum, [1, 2])
+            self.assertEqual(executor.abgewiesen, 1)
+        finally:
+            freigabe.set()
+        await asyncio.gather(*laufend)
+        self.assertEqual(await executor.ausfuehren(sum, [1, 2]), 3)
+        executor.beenden()
+
+
+class BerechneAlleCommandTest(TestCase):
+    def setUp(self):
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3500,
+            solarstrahlung_nord=300,
+            solarstrahlung_sued=1100,
+            solarstrahlung_ost=700,
+            solarstrahlung_west=700,
+            solarstrahlung_horizontal=1000,
+        )
+        klima_register.invalidieren()
+        self.gebaeude_ids = []
+        for i in range(7):
+            gebaeude = Gebaeude.objects.create(
+                name=f'Gebäude {i}', ort=self.ort, laenge_ns=20 + i, breite_ow=15, geschosse=3,
+            )
+            Bauteil.objects.create(gebaeude=gebaeude, typ='dach', u_wert=0.2)
+            self.gebaeude_ids.append(gebaeude.id)
+
+    def _ausfuehren(self, *args):
+        ausgabe = StringIO()
+        call_command('berechne_alle', '--worker', '0', '--chunk', '3', *args, stdout=ausgabe, stderr=StringIO())
+        return ausgabe.getvalue()
+
+    def test_berechnet_und_speichert_alle(self):
+        ausgabe = self._ausfuehren()
+        self.assertIn('7 angelegt', ausgabe)
+        self.assertEqual(Berechnung.objects.count(), 7)
+        for gebaeude_id in self.gebaeude_ids:
+            berechnung = Berechnung.objects.get(gebaeude_id=gebaeude_id)
+            ergebnis = lade_berechnungseingabe(gebaeude_id).berechnen()
+            self.assertEqual(berechnung.ergebnis, ergebnis)
+            self.assertEqual(berechnung.ne_heizung, ergebnis['nutzenergie']['ne_heizung'])
+
+        self.assertIn('0 aktualisiert, 7 unverändert', self._ausfuehren())
+
+    def test_nur_geaenderte_und_erzwingen(self):
+        self._ausfuehren()
+        Bauteil.objects.filter(gebaeude_id=self.gebaeude_ids[2]).update(u_wert=0.1)
+        self.assertIn('0 angelegt, 1 aktualisiert', self._ausfuehren())
+        berechnung = Berechnung.objects.get(gebaeude_id=self.gebaeude_ids[2])
+        self.assertEqual(berechnung.ergebnis, lade_berechnungseingabe(self.gebaeude_ids[2]).berechnen())
+
+        self.assertIn('7 aktualisiert', self._ausfuehren('--alle'))
+
+    def test_fortsetzen_ab_id(self):
+        ausgabe = self._ausfuehren('--ab', str(self.gebaeude_ids[3]))
+        self.assertIn('3 angelegt', ausgabe)
+        self.assertIn(f'letzte id {self.gebaeude_ids[-1]}', ausgabe)
+        self.assertEqual(
+            sorted(Berechnung.objects.values_list('gebaeude_id', flat=True)), self.gebaeude_ids[4:]
+        )
+
+
+def _pflichtfelder(formular, **werte):
+    """Standardwerte aller Pflichtfelder eines ModelForms, ergänzt um ``werte``"""
+    modell = formular._meta.model
+    return {
+        **{name: modell._meta.get_field(name).get_default()
+           for name, feld in formular.base_fields.items() if feld.required and name != 'ort'},
+        **werte,
+    }
+
+
+class GebaeudeImportTest(TestCase):
+    def setUp(self):
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3500,
+            solarstrahlung_nord=300,
+            solarstrahlung_sued=1100,
+            solarstrahlung_ost=700,
+            solarstrahlung_west=700,
+            solarstrahlung_horizontal=1000,
+        )
+        klima_register.invalidieren()
+        self.gebaeude = _pflichtfelder(GebaeudeAllgForm, ort='Test Stadt')
+        self.jsonl = [
+            json.dumps({
+                **self.gebaeude, 'name': 'Rathaus', 'laenge_ns': 30, 'breite_ow': 12, 'geschosse': 4,
+                'bauteile': {'dach': 0.2, 'wand_sued': 0.3},
+                'pv_anlage': _pflichtfelder(PVForm, pv_vor_opak_sued=40),
+                'lueftung': _pflichtfelder(LueftungForm, typ='mechanisch'),
+                'beleuchtungen': [
+                    _pflichtfelder(BeleuchtungForm, nutzungsbereich='buero'),
+                    _pflichtfelder(BeleuchtungForm, nutzungsbereich='verkehr'),
+                ],
+                'waermequellen': [
+                    _pflichtfelder(WaermequelleForm, typ='geraet', name='PC', anzahl=20, leistung=80),
+                ],
+            }),
+            json.dumps({**self.gebaeude, 'name': 'Schule', 'gebaeudeart': 'schule',
+                        'laenge_ns': 50, 'breite_ow': 20, 'geschosse': 2}),
+        ]
+        self.user = User.objects.create_user('import')
+        self.user.user_permissions.add(Permission.objects.get(codename='add_gebaeude'))
+
+    def test_jsonl_mit_relationen(self):
+        stand = importieren(datensaetze_lesen(iter(self.jsonl), 'jsonl'), block_groesse=1)
+        self.assertEqual(stand, {'angelegt': 2, 'fehlerhaft': 0, 'fehler': []})
+
+        rathaus = Gebaeude.objects.get(name='Rathaus')
+        self.assertEqual(rathaus.ort, self.ort)
+        self.assertEqual(rathaus.geschosshoehe, 2.8)
+        self.assertEqual({b.typ: b.u_wert for b in rathaus.bauteile.all()}, {'dach': 0.2, 'wand_sued': 0.3})
+        self.assertEqual(rathaus.pv_anlage.pv_vor_opak_sued, 40)
+        self.assertEqual(rathaus.pv_anlage.wirkungsgrad, 0.2)
+        self.assertEqual(rathaus.lueftung.typ, 'mechanisch')
+        self.assertEqual(rathaus.beleuchtungen.count(), 2)
+        self.assertEqual(rathaus.waermequellen.get().anzahl, 20)
+        self.assertFalse(PVAnlage.objects.filter(gebaeude__name='Schule').exists())
+
+    def _csv(self, kopf, *zeilen):
+        """CSV-Text; fehlende Pflichtfelder des Gebäudes mit Standardwert"""
+        pflicht = {k: str(v) for k, v in self.gebaeude.items() if k not in kopf}
+        zeilen = [[*kopf, *pflicht], *([*zeile, *pflicht.values()] for zeile in zeilen)]
+        return ''.join(','.join(zeile) + '\n' for zeile in zeilen)
+
+    def test_csv(self):
+        pv = {f'pv_{k}' if k == 'wirkungsgrad' else k: v for k, v in _pflichtfelder(PVForm).items()}
+        lueftung = {f'lueftung_{k}': v for k, v in _pflichtfelder(LueftungForm).items()}
+        beleuchtung = json.dumps([_pflichtfelder(BeleuchtungForm, nutzungsbereich='buero')]).replace('"', '""')
+        pv['pv_wirkungsgrad'] = 0.18
+        lueftung['lueftung_typ'] = 'mechanisch_wrg'
+        csv_text = self._csv(
+            ['name', 'ort', 'laenge_ns', 'breite_ow', 'geschosse', 'u_wert_dach', *pv, *lueftung, 'beleuchtungen'],
+            ['A', 'Test Stadt', '20', '15', '3', '0.2', *map(str, pv.values()), *map(str, lueftung.values()),
+             f'"{beleuchtung}"'],
+            ['B', 'Test Stadt', '25', '10', '2', '', *[''] * len(pv), *[''] * len(lueftung), ''],
+        )
+        stand = importieren(datensaetze_lesen(iter(csv_text.splitlines(keepends=True)), 'csv'))
+        self.assertEqual(stand['angelegt'], 2, stand['fehler'])
+
+        a = Gebaeude.objects.get(name='A')
+        self.assertEqual(a.bauteile.get().u_wert, 0.2)
+        self.assertEqual(a.pv_anlage.wirkungsgrad, 0.18)
+        self.assertEqual(a.lueftung.typ, 'mechanisch_wrg')
+        self.assertEqual(a.beleuchtungen.get().nutzungsbereich, 'buero')
+        b = Gebaeude.objects.get(name='B')
+        self.assertFalse(b.bauteile.exists())
+        self.assertFalse(Lueftung.objects.filter(gebaeude=b).exists())
+
+    def test_validierung_wie_formulare(self):
+        gebaeude = {**self.gebaeude, 'laenge_ns': 10, 'breite_ow': 10, 'geschosse': 1}
+        zeilen = [
+            json.dumps({**gebaeude, 'laenge_ns': 0}),
+            json.dumps({**gebaeude, 'ort': 'Unbekannt'}),
+            json.dumps({k: v for k, v in gebaeude.items() if k != 'geschosse'}),
+            json.dumps({**gebaeude, 'g_wert_sued': 1.5, 'gebaeudeart': 'kiosk'}),
+            json.dumps({**gebaeude,
+                        'bauteile': [{'typ': 'dach', 'u_wert': 0.2}, {'typ': 'dach', 'u_wert': 0.3}]}),
+            json.dumps({**gebaeude, 'lueftung': _pflichtfelder(LueftungForm, raum_soll_temperatur=30),
+                        'farbe': 'rot'}),
+            '{kein json',
+            self.jsonl[1],
+            # Pflichtfelder mit Standardwert verlangt das Formular ebenfalls
+            json.dumps({k: v for k, v in gebaeude.items() if k != 'geschosshoehe'}),
+            json.dumps({**gebaeude, 'personendichte': 'inf'}),
+        ]
+        stand = importieren(datensaetze_lesen(iter(zeilen), 'jsonl'))
+        self.assertEqual(stand['angelegt'], 1)
+        self.assertEqual(stand['fehlerhaft'], 9)
+        fehler = {m['zeile']: m['fehler'] for m in stand['fehler']}
+        self.assertIn('laenge_ns', fehler[1])
+        self.assertIn('ort', fehler[2])
+        self.assertEqual(fehler[3], {'geschosse': ['Pflichtfeld']})
+        self.assertEqual(set(fehler[4]), {'g_wert_sued', 'gebaeudeart'})
+        self.assertIn('bauteile', fehler[5])
+        self.assertEqual(set(fehler[6]), {'lueftung.raum_soll_temperatur', 'unbekannt'})
+        self.assertIn('zeile', fehler[7])
+        self.assertEqual(fehler[9], {'geschosshoehe': ['Pflichtfeld']})
+        self.assertIn('personendichte', fehler[10])
+        form = GebaeudeAllgForm(data={k: v for k, v in gebaeude.items() if k != 'geschosshoehe'} | {'ort': self.ort.id})
+        self.assertEqual(set(form.errors), {'geschosshoehe'})
+
+        form = GebaeudeAllgForm(data={'ort': self.ort.id, 'laenge_ns': 0, 'breite_ow': 10, 'geschosse': 1,
+                                      'gebaeudeart': 'buero', 'geschosshoehe': 2.8, 'personendichte': 15})
+        self.assertIn('laenge_ns', form.errors)
+
+    def test_import_api_und_command(self):
+        url = reverse('gebaeude_import_api')
+        body = '\n'.join(self.jsonl)
+        self.assertEqual(self.client.post(url, body, content_type='application/x-ndjson').status_code, 401)
+        self.client.force_login(User.objects.create_user('ohne_recht'))
+        self.assertEqual(self.client.post(url, body, content_type='application/x-ndjson').status_code, 403)
+        csrf_client = Client(enforce_csrf_checks=True)
+        csrf_client.force_login(self.user)
+        self.assertEqual(csrf_client.post(url, body, content_type='application/x-ndjson').status_code, 403)
+        self.assertFalse(Gebaeude.objects.exists())
+
+        self.client.force_login(self.user)
+        response = self.client.post(url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.json()['angelegt'], 2)
+
+        response = self.client.post(
+            url, self._csv(['ort', 'laenge_ns', 'breite_ow', 'geschosse'], ['Test Stadt', '10', '10', '1']),
+            content_type='text/csv',
+        )
+        self.assertEqual(response.json()['angelegt'], 1)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as datei:
+            datei.write('\n'.join(self.jsonl))
+        try:
+            ausgabe = StringIO()
+            call_command('importiere_gebaeude', datei.name, stdout=ausgabe, stderr=StringIO())
+        finally:
+            os.unlink(datei.name)
+        self.assertIn('2 Gebäude', ausgabe.getvalue())
+        self.assertEqual(Gebaeude.objects.count(), 5)
+
+
+class ErgebnisExportTest(TestCase):
+    def setUp(self):
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3500,
+            solarstrahlung_nord=300,
+            solarstrahlung_sued=1100,
+            solarstrahlung_ost=700,
+            solarstrahlung_west=700,
+            solarstrahlung_horizontal=1000,
+        )
+        klima_register.invalidieren()
+        self.gebaeude = [
+            Gebaeude.objects.create(
+                name=f'Gebäude {i}', ort=self.ort, laenge_ns=20 + i, breite_ow=10, geschosse=2,
+                gebaeudeart='schule' if i == 2 else 'buero',
+            )
+            for i in range(3)
+        ]
+        Bauteil.objects.create(gebaeude=self.gebaeude[0], typ='dach', u_wert=0.2)
+        aktuelle_berechnung(lade_berechnungseingabe(self.gebaeude[0].id))
+
+    def _export(self, **params):
+        response = self.client.get(reverse('ergebnis_export_api'), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_jsonl(self):
+        zeilen = [json.loads(z) for z in self._export().splitlines()]
+        self.assertEqual([z['id'] for z in zeilen], [g.id for g in self.gebaeude])
+        self.assertEqual(zeilen[0]['name'], 'Gebäude 0')
+        self.assertEqual(zeilen[0]['ort'], 'Test Stadt')
+        for zeile, gebaeude in zip(zeilen, self.gebaeude):
+            erwartet = lade_berechnungseingabe(gebaeude.id).berechnen()
+            self.assertEqual(zeile['endenergie'], erwartet['endenergie'])
+
+        # Export berechnet nur, speichert nicht
+        self.assertEqual(Berechnung.objects.count(), 1)
+
+        gespeichert = [json.loads(z) for z in self._export(quelle='gespeichert').splitlines()]
+        self.assertEqual([z['id'] for z in gespeichert], [self.gebaeude[0].id])
+
+    def test_csv_mit_auswahl_und_filter(self):
+        text = self._export(format='csv', fields='ee_gesamt,bgf', gebaeudeart='buero')
+        zeilen = text.splitlines()
+        self.assertEqual(zeilen[0], 'id,name,ort,gebaeudeart,ee_gesamt,bgf,error')
+        self.assertEqual(len(zeilen), 3)
+        erwartet = lade_berechnungseingabe(self.gebaeude[1].id).berechnen()
+        self.assertEqual(
+            zeilen[2].split(','),
+            [str(self.gebaeude[1].id), 'Gebäude 1', 'Test Stadt', 'buero',
+             str(erwartet['endenergie']['ee_gesamt']), str(erwartet['gebaeudedaten']['bgf']), ''],
+        )
+
+        text = self._export(ab=self.gebaeude[0].id, ids=f'{self.gebaeude[0].id},{self.gebaeude[2].id}')
+        self.assertEqual([json.loads(z)['id'] for z in text.splitlines()], [self.gebaeude[2].id])
+
+    def test_ungueltige_parameter(self):
+        url = reverse('ergebnis_export_api')
+        for params in ({'format': 'xml'}, {'quelle': 'cache'}, {'blocks': 'kosten'}, {'ids': 'a,b'}, {'ab': 'x'}):
+            self.assertEqual(self.client.get(url, params).status_code, 400)
+        self.assertEqual(self.client.post(url).status_code, 405)
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as datei:
+            pass
+        try:
+            call_command('exportiere_ergebnisse', ausgabe=datei.name, block=2, stderr=StringIO())
+            with open(datei.name, encoding='utf-8') as f:
+                zeilen = f.read().splitlines()
+        finally:
+            os.unlink(datei.name)
+        self.assertTrue(zeilen[0].startswith('id,name,ort,gebaeudeart,ne_heizung,'))
+        self.assertEqual(len(zeilen), 4)
+
+        ausgabe = StringIO()
+        call_command('exportiere_ergebnisse', quelle='gespeichert', blocks='pv', stdout=ausgabe, stderr=StringIO())
+        zeile = json.loads(ausgabe.getvalue())
+        self.assertEqual(set(zeile), {'id', 'name', 'ort', 'gebaeudeart', 'pv'})
+
+
+class SnapshotTest(TestCase):
+    def setUp(self):
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3500,
+            solarstrahlung_nord=300,
+            solarstrahlung_sued=1100,
+            solarstrahlung_ost=700,
+            solarstrahlung_west=700,
+            solarstrahlung_horizontal=1000,
+        )
+        klima_register.invalidieren()
+        self.gebaeude = []
+        for i in range(3):
+            gebaeude = Gebaeude.objects.create(
+                name=f'Gebäude {i}', ort=self.ort, laenge_ns=20 + i, breite_ow=10, geschosse=2 + i,
+                fensterflaeche_sued=10 * i, gebaeudeart='heim' if i == 1 else 'buero',
+            )
+            Bauteil.objects.create(gebaeude=gebaeude, typ='dach', u_wert=0.3)
+            self.gebaeude.append(gebaeude)
+        Lueftung.objects.create(gebaeude=self.gebaeude[0], typ='mechanisch')
+        PVAnlage.objects.create(gebaeude=self.gebaeude[2], pv_vor_opak_sued=30)
+        Beleuchtung.objects.create(gebaeude=self.gebaeude[2], nutzungsbereich='buero')
+
+        datei = tempfile.NamedTemporaryFile(suffix='.zip', delete=False)
+        datei.close()
+        self.datei = datei.name
+        self.addCleanup(os.unlink, self.datei)
+
+    def _einzeln(self, feld_block, feld):
+        return [lade_berechnungseingabe(g.id).berechnen()[feld_block][feld] for g in self.gebaeude]
+
+    def test_schreiben_und_lesen(self):
+        meta = snapshot_schreiben(self.datei, zeilengruppe=2)
+        self.assertEqual(meta['anzahl'], 3)
+        self.assertEqual(meta['zeilengruppen'], [2, 1])
+
+        with Snapshot(self.datei) as snapshot:
+            self.assertEqual(snapshot.zeilengruppen, 2)
+            self.assertEqual(snapshot.zeilengruppe(1, ['id'])['id'].tolist(), [self.gebaeude[2].id])
+
+            spalten = snapshot.spalten(['id', 'name', 'gebaeudeart', 'lueftung'])
+            self.assertEqual(spalten['id'].tolist(), [g.id for g in self.gebaeude])
+            self.assertEqual(spalten['name'].tolist(), ['Gebäude 0', 'Gebäude 1', 'Gebäude 2'])
+            self.assertEqual(spalten['gebaeudeart'].tolist(), ['buero', 'heim', 'buero'])
+            self.assertEqual(spalten['lueftung'].tolist(), [True, False, False])
+
+            ergebnis = snapshot.ergebnis()
+            for block, feld in (('endenergie', 'ee_gesamt'), ('pv', 'pv_ertrag'), ('gebaeudedaten', 'bgf')):
+                self.assertEqual(np.round(ergebnis[block][feld], 1).tolist(), self._einzeln(block, feld))
+
+            with self.assertRaises(KeyError):
+                snapshot.spalten(['kosten'])
+
+    def test_was_waere_wenn(self):
+        snapshot_schreiben(self.datei, zeilengruppe=2)
+        with Snapshot(self.datei) as snapshot:
+            self.assertEqual(set(snapshot.eingaben()), set(EINGABE_SPALTEN))
+            unveraendert = berechne_snapshot(snapshot)
+            np.testing.assert_array_equal(
+                unveraendert['endenergie']['ee_gesamt'], snapshot.ergebnis()['endenergie']['ee_gesamt'],
+            )
+
+            neu = berechne_snapshot(snapshot, {'u_wert_dach': 0.15, 'geschosse': [3, 3, 3], 'gebaeudeart': 'schule'})
+            with self.assertRaises(ValueError):
+                berechne_snapshot(snapshot, {'geschosse': [3]})
+            with self.assertRaises(ValueError):
+                berechne_snapshot(snapshot, {'kosten': 1})
+
+        Bauteil.objects.update(u_wert=0.15)
+        Gebaeude.objects.update(geschosse=3, gebaeudeart='schule')
+        self.assertEqual(np.round(neu['nutzenergie']['ne_gesamt'], 1).tolist(), self._einzeln('nutzenergie', 'ne_gesamt'))
+
+    def test_filter_und_leerer_snapshot(self):
+        meta = snapshot_schreiben(self.datei, gebaeudeart='heim')
+        self.assertEqual(meta['anzahl'], 1)
+
+        snapshot_schreiben(self.datei, ort='Unbekannt')
+        with Snapshot(self.datei) as snapshot:
+            self.assertEqual(snapshot.anzahl, 0)
+            self.assertEqual(len(snapshot.spalten(['laenge_ns'])['laenge_ns']), 0)
+            self.assertEqual(len(berechne_snapshot(snapshot)['endenergie']['ee_gesamt']), 0)
+
+    def test_commands(self):
+        ausgabe = StringIO()
+        call_command('snapshot_schreiben', self.datei, zeilengruppe=2, stdout=ausgabe)
+        self.assertIn('3 Gebäude in 2 Zeilengruppen', ausgabe.getvalue())
+
+        ausgabe = StringIO()
+        call_command('snapshot_berechnen', self.datei, setze=['u_wert_dach=0.15'], stdout=ausgabe, stderr=StringIO())
+        zeilen = dict(z.split(',', 1) for z in ausgabe.getvalue().splitlines())
+        vorher, nachher, prozent = zeilen['ne_heizung'].split(',')
+        self.assertLess(float(nachher), float(vorher))
+        self.assertEqual(zeilen['ne_tww'].split(',')[2], '0.00')
+
+
+class KlimaImportTest(TestCase):
+    STATIONEN = (
+        'station,lat,temperatur_mittel,heizgradtage,solarstrahlung_nord,solarstrahlung_sued,'
+        'solarstrahlung_ost,solarstrahlung_west,solarstrahlung_horizontal\n'
+        'Station A,48.1,9.1,3500,300,1100,700,700,1000\n'
+        'Station B,52.5,9.6,3200,280,1050,680,680,950\n'
+        'Station C,53.6,9.1,3300,270,1000,650,650,900\n'
+    )
+
+    def _laden(self, text, format='csv', **kwargs):
+        zeilen = iter(text.splitlines(keepends=True))
+        # Das Register wird erst nach dem Commit invalidiert
+        with self.captureOnCommitCallbacks(execute=True):
+            return orte_speichern(orte_lesen(zeilen, format, {'name': 'station'}), **kwargs)
+
+    def test_upsert_mit_zaehlern(self):
+        stand = self._laden(self.STATIONEN, block_groesse=2)
+        self.assertEqual(
+            {k: stand[k] for k in ('angelegt', 'aktualisiert', 'unveraendert', 'fehlerhaft')},
+            {'angelegt': 3, 'aktualisiert': 0, 'unveraendert': 0, 'fehlerhaft': 0},
+        )
+        self.assertEqual(klima_register.klimadaten('Station B')['heizgradtage'], 3200)
+
+        geaendert = self.STATIONEN.replace('Station B,52.5,9.6,3200', 'Station B,52.5,9.6,3100')
+        geaendert += 'Station D,50.0,10.0,3000,300,1100,700,700,1000\n'
+        stand = self._laden(geaendert)
+        self.assertEqual((stand['angelegt'], stand['aktualisiert'], stand['unveraendert']), (1, 1, 2))
+        self.assertEqual(Ort.objects.get(name='Station B').heizgradtage, 3100)
+        # bulk_create sendet keine Signale, das Register wird explizit invalidiert
+        self.assertEqual(klima_register.klimadaten('Station B')['heizgradtage'], 3100)
+
+        stand = self._laden(geaendert.replace('3100', '3000'), aktualisieren=False)
+        self.assertEqual(stand['unveraendert'], 4)
+        self.assertEqual(Ort.objects.get(name='Station B').heizgradtage, 3100)
+
+    def test_fehlerhafte_zeilen(self):
+        text = self.STATIONEN + (
+            'Station A,48.1,9.1,3500,300,1100,700,700,1000\n'
+            'Station E,50.0,warm,3000,300,1100,700,700,1000\n'
+            ',50.0,10.0,3000,300,1100,700,700,1000\n'
+        )
+        stand = self._laden(text)
+        self.assertEqual((stand['angelegt'], stand['fehlerhaft']), (3, 3))
+        fehler = {m['zeile']: m['fehler'] for m in stand['fehler']}
+        self.assertEqual(set(fehler), {5, 6, 7})
+        self.assertIn('name', fehler[5])
+        self.assertIn('temperatur_mittel', fehler[6])
+        self.assertEqual(fehler[7], {'name': ['Pflichtfeld']})
+
+    def test_command(self):
+        ort = Ort.objects.create(
+            name='Berlin', temperatur_mittel=1, heizgradtage=1, solarstrahlung_nord=1, solarstrahlung_sued=1,
+            solarstrahlung_ost=1, solarstrahlung_west=1, solarstrahlung_horizontal=1,
+        )
+        ausgabe = StringIO()
+        call_command('load_klimadaten', stdout=ausgabe)
+        self.assertIn('5 angelegt, 0 aktualisiert, 1 unverändert', ausgabe.getvalue())
+        ort.refresh_from_db()
+        self.assertEqual(ort.heizgradtage, 1)
+
+        stationen = [
+            {'name': 'Berlin', 'temperatur_mittel': 9.6, 'heizgradtage': 3200, 'solarstrahlung_nord': 280,
+             'solarstrahlung_sued': 1050, 'solarstrahlung_ost': 680, 'solarstrahlung_west': 680,
+             'solarstrahlung_horizontal': 950, 'hoehe_m': 34},
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as datei:
+            json.dump(stationen, datei)
+        try:
+            ausgabe = StringIO()
+            call_command('load_klimadaten', datei.name, stdout=ausgabe, stderr=StringIO())
+        finally:
+            os.unlink(datei.name)
+        self.assertIn('0 angelegt, 1 aktualisiert, 0 unverändert', ausgabe.getvalue())
+        ort.refresh_from_db()
+        self.assertEqual(ort.heizgradtage, 3200)
+
+
+def _wetterjahr():
+    """Synthetisches Wetterjahr: (Monat, Tag, Stunde, Temperatur, Direkt normal, Diffus)"""
+    zeilen = []
+    for monat, tage in enumerate([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], start=1):
+        for tag in range(1, tage + 1):
+            for stunde in range(1, 25):
+                tagsueber = 7 <= stunde <= 18
+                zeilen.append((monat, tag, stunde, monat - 2.5, 400 if tagsueber else 0, 80 if tagsueber else 0))
+    return zeilen
+
+
+class KlimaStundenTest(TestCase):
+    def setUp(self):
+        self.verzeichnis = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.verzeichnis)
+        self.pfad = os.path.join(self.verzeichnis, 'klima_stunden.bin')
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3500,
+            solarstrahlung_nord=300,
+            solarstrahlung_sued=1100,
+            solarstrahlung_ost=700,
+            solarstrahlung_west=700,
+            solarstrahlung_horizontal=1000,
+        )
+        klima_register.invalidieren()
+
+    def _epw(self):
+        kopf = ['LOCATION,Test,,DEU,TMY,000000,50.0,10.0,1.0,100'] + ['X'] * 7
+        daten = [
+            f'2020,{m},{d},{h},60,A,{t},0,0,0,0,0,0,0,{dn},{df}'
+            for m, d, h, t, dn, df in _wetterjahr()
+        ]
+        return StringIO('\n'.join(kopf + daten) + '\n')
+
+    def _try(self):
+        zeilen = ['Koordinatensystem : Lambert', 'RW HW MM DD HH t p WR WG N x RF B D A E IL', '***']
+        for monat, tag, stunde, t, dn, df in _wetterjahr():
+            zeilen.append(f'0 0 {monat} {tag} {stunde} {t} 1000 0 0 0 0 0 {dn * 0.5} {df} 0 0 0')
+        return StringIO('\n'.join(zeilen) + '\n')
+
+    def test_sonnenstand(self):
+        # Tagundnachtgleiche, wahre Mittagszeit am Meridian der Zeitzone: Höhe 40° bei 50° Breite
+        # (Tag 81: Deklination 0, Zeitgleichung -7.53 min; Stunde = Intervallende)
+        s = strahlung_auf_flaechen([81], [12.5 + 7.53 / 60], [0], 50, 15, 1, direkt_normal=[1000])
+        self.assertAlmostEqual(s['strahlung_horizontal'][0], 1000 * np.sin(np.radians(40)), delta=2)
+        self.assertAlmostEqual(s['strahlung_sued'][0] - s['strahlung_horizontal'][0] * 0.1,
+                               1000 * np.cos(np.radians(40)), delta=2)
+        self.assertAlmostEqual(s['strahlung_ost'][0], s['strahlung_west'][0], delta=2)
+
+    def test_einlesen(self):
+        epw = lese_epw(self._epw())
+        self.assertEqual(epw.shape, (len(KANAELE), STUNDEN))
+        self.assertEqual(epw.dtype, np.float32)
+        summen = dict(zip(KANAELE, epw.sum(axis=1)))
+        self.assertGreater(summen['strahlung_sued'], summen['strahlung_ost'])
+        self.assertGreater(summen['strahlung_ost'], summen['strahlung_nord'])
+        self.assertAlmostEqual(summen['strahlung_ost'], summen['strahlung_west'], delta=summen['strahlung_ost'] * 0.1)
+
+        tr = lese_try(self._try(), 50.0, 10.0)
+        np.testing.assert_array_equal(tr[0], epw[0])
+        np.testing.assert_allclose(tr[1], [dn * 0.5 + df for *_, dn, df in _wetterjahr()])
+
+        with self.assertRaises(ValueError):
+            lese_try(StringIO('kein TRY\n'), 50, 10)
+        with self.assertRaises(ValueError):
+            lese_epw(StringIO('LOCATION,Test,,DEU,TMY,0,50,10,1,100\n'))
+
+    def test_speicher(self):
+        epw = lese_epw(self._epw())
+        klima_stunden_schreiben(self.pfad, {self.ort.id: epw})
+        klima_stunden_aktualisieren(self.pfad, {99: epw + 1})
+
+        speicher = KlimaStundenSpeicher(self.pfad)
+        self.assertEqual(speicher.ids, [self.ort.id, 99])
+        self.assertIsInstance(speicher.daten, np.memmap)
+        np.testing.assert_array_equal(speicher.stundenwerte(self.ort.id).werte, epw)
+        np.testing.assert_array_equal(speicher.stundenwerte(99)['temperatur'], epw[0] + 1)
+        self.assertIsNone(speicher.stundenwerte(1234))
+
+        monate = speicher.stundenwerte(self.ort.id).monatswerte()
+        self.assertAlmostEqual(monate['temperatur'][0], -1.5, places=4)
+        self.assertAlmostEqual(monate['temperatur'][11], 9.5, places=4)
+        self.assertAlmostEqual(monate['strahlung_sued'].sum(), epw[KANAELE.index('strahlung_sued')].sum() / 1000, places=0)
+
+        with override_settings(BILANZ_KLIMA_STUNDEN=self.pfad):
+            erster = get_klima_stunden()
+            self.assertIs(get_klima_stunden(), erster)
+            klima_stunden_aktualisieren(self.pfad, {}, entfernen=[99])
+            self.assertEqual(get_klima_stunden().ids, [self.ort.id])
+            self.assertIsNone(stundenwerte_fuer_ort(99))
+        with override_settings(BILANZ_KLIMA_STUNDEN=os.path.join(self.verzeichnis, 'fehlt.bin')):
+            self.assertIsNone(stundenwerte_fuer_ort(self.ort.id))
+
+    def test_command(self):
+        datei = os.path.join(self.verzeichnis, 'test.epw')
+        with open(datei, 'w') as f:
+            f.write(self._epw().getvalue())
+        ausgabe = StringIO()
+        with override_settings(BILANZ_KLIMA_STUNDEN=self.pfad):
+            call_command('load_klimadaten_stunden', f'Test Stadt={datei}', stdout=ausgabe)
+            self.assertIsNotNone(stundenwerte_fuer_ort(self.ort.id))
+        self.assertIn('1 Orte', ausgabe.getvalue())
+
+
+class BenchmarkTest(TestCase):
+    def test_messen_und_vergleichen(self):
+        alle = benchmarks(batch_groessen=[10])
+        self.assertIn('funktion.berechne_pv_ertrag', alle)
+        self.assertIn('energiebilanz.gross', alle)
+        self.assertIn('batch.monat.10', alle)
+
+        messung = messen(alle['batch.jahr.10'], min_zeit=0.001, wiederholungen=2)
+        self.assertLessEqual(messung['min'], messung['median'])
+        self.assertEqual(messung['wiederholungen'], 2)
+
+        ergebnisse = {'a': {'min': 1.3}, 'b': {'min': 1.3}, 'api.x': {'min': 1.3}, 'neu': {'min': 1.0}}
+        baseline = {'a': {'min': 1.0}, 'b': {'min': 1.2}, 'api.x': {'min': 1.0}}
+        vergleich = {v['name']: v for v in vergleichen(ergebnisse, baseline, 0.2, {'api.*': 0.5})}
+        self.assertTrue(vergleich['a']['regression'])
+        self.assertAlmostEqual(vergleich['a']['aenderung'], 0.3)
+        self.assertFalse(vergleich['b']['regression'])
+        self.assertFalse(vergleich['api.x']['regression'])
+        self.assertIsNone(vergleich['neu']['baseline'])
+
+    def test_command_mit_baseline(self):
+        verzeichnis = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, verzeichnis)
+        pfad = os.path.join(verzeichnis, 'benchmark.json')
+        optionen = {'min_zeit': 0.001, 'wiederholungen': 1, 'stdout': StringIO(), 'stderr': StringIO()}
+
+        call_command('benchmark', nur=['energiebilanz.klein', 'api.gebaeude_berechnung'], ausgabe=pfad, **optionen)
+        with open(pfad) as datei:
+            gespeichert = json.load(datei)
+        self.assertEqual(set(gespeichert['ergebnisse']), {'energiebilanz.klein', 'api.gebaeude_berechnung'})
+        self.assertIn('numpy', gespeichert['umgebung'])
+        # Testdaten der API-Benchmarks werden zurückgerollt
+        self.assertFalse(Gebaeude.objects.exists())
+        self.assertFalse(Ort.objects.exists())
+
+        gespeichert['ergebnisse']['energiebilanz.klein']['min'] /= 100
+        with open(pfad, 'w') as datei:
+            json.dump(gespeichert, datei)
+        with self.assertRaisesMessage(CommandError, 'energiebilanz.klein'):
+            call_command('benchmark', nur=['energiebilanz.klein'], ohne_api=True, baseline=pfad, **optionen)
+        call_command(
+            'benchmark', nur=['energiebilanz.klein'], ohne_api=True, baseline=pfad,
+            schwelle_fuer=['energiebilanz.*=1000'], **optionen,
+        )
+
+
+class MessungTest(TestCase):
+    def setUp(self):
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3500,
+            solarstrahlung_nord=300,
+            solarstrahlung_sued=1100,
+            solarstrahlung_ost=700,
+            solarstrahlung_west=700,
+            solarstrahlung_horizontal=1000,
+        )
+        self.gebaeude = Gebaeude.objects.create(
+            name='Test', ort=self.ort, laenge_ns=20, breite_ow=15, geschosse=3,
+        )
+        klima_register.invalidieren()
+
+    @override_settings(BILANZ_MESSUNG={'RATE': 1})
+    def test_server_timing_und_logzeile(self):
+        url = reverse('gebaeude_berechnung', args=[self.gebaeude.id])
+        with self.assertLogs('bilanz.messung', 'INFO') as logs:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        timing = response['Server-Timing']
+        for name in ('db;', 'berechne_heizwaermebedarf;', 'berechne_pv_ertrag;', 'serialisierung;', 'gesamt;'):
+            self.assertIn(name, timing)
+
+        daten = json.loads(logs.records[0].getMessage())
+        self.assertEqual(daten['view'], 'gebaeude_berechnung')
+        self.assertEqual(daten['status'], 200)
+        self.assertGreater(daten['db_anzahl'], 0)
+        self.assertEqual(daten['abschnitte']['berechne_trinkwarmwasser']['anzahl'], 1)
+        self.assertGreaterEqual(daten['gesamt_ms'], daten['db_ms'])
+        self.assertEqual(logs.records[0].messung, daten)
+
+    @override_settings(BILANZ_MESSUNG={'RATE': 0})
+    def test_ohne_stichprobe(self):
+        params = {'laenge_ns': '21', 'breite_ow': '15', 'geschosse': '3'}
+        with self.assertNoLogs('bilanz.messung'):
+            response = self.client.get(reverse('berechnung_api'), params)
+        self.assertNotIn('Server-Timing', response)
+
+        with override_settings(BILANZ_MESSUNG={'RATE': 1, 'LOG': False}):
+            gemessen = self.client.get(reverse('berechnung_api'), dict(params, laenge_ns='22'))
+        self.assertIn('Server-Timing', gemessen)
+        params['laenge_ns'] = '22'
+        self.assertEqual(gemessen.json(), berechne_energiebilanz(
+            gebaeude_eingabe_aus_parametern(params), bauteile_aus_parametern(params),
+            None, None, [], [], STANDARD_KLIMADATEN,
+        ))
+
+    @override_settings(BILANZ_MESSUNG={'RATE': 1})
+    def test_inkrementell_und_auswahl(self):
+        params = {'laenge_ns': '24', 'breite_ow': '15', 'geschosse': '3'}
+        abschnitte = []
+        for _ in range(2):
+            with self.assertLogs('bilanz.messung', 'INFO') as logs:
+                self.client.get(reverse('berechnung_terme_api'), params)
+            abschnitte.append(json.loads(logs.records[0].getMessage())['abschnitte'])
+        # Terme ohne Geometrie (z.B. pv_ertrag) können aus anderen Tests im Cache sein
+        self.assertIn('berechne_transmissionsverlust', abschnitte[0])
+        self.assertEqual(sum(
+            abschnitte[0].get(name, {'anzahl': 0})['anzahl']
+            for name in ('term_cache_treffer', 'term_cache_fehlschlag')
+        ), len(BILANZ_TERME))
+        self.assertEqual(abschnitte[1]['term_cache_treffer']['anzahl'], len(BILANZ_TERME))
+        self.assertNotIn('berechne_transmissionsverlust', abschnitte[1])
+
+        with self.assertLogs('bilanz.messung', 'INFO'):
+            response = self.client.get(reverse('berechnung_api'), dict(params, blocks='nutzenergie'))
+        self.assertIn('berechne_heizwaermebedarf;', response['Server-Timing'])
+        self.assertNotIn('berechne_pv_ertrag;', response['Server-Timing'])
+
+    @override_settings(BILANZ_MESSUNG={'RATE': 1, 'LOG': False})
+    async def test_async_view(self):
+        params = {'laenge_ns': '23', 'breite_ow': '15', 'geschosse': '3', 'ort': 'Test Stadt'}
+        response = await self.async_client.get(reverse('berechnung_api_async'), params)
+        self.assertEqual(response.status_code, 200)
+        # Terme aus dem Berechnungs-Executor und Datenbankzeit aus sync_to_async
+        self.assertIn('berechne_solargewinne;', response['Server-Timing'])
+        self.assertNotIn('db;dur=0.000;desc="0 Abfragen"', response['Server-Timing'])
+
+
+class MetrikenTest(TestCase):
+    def setUp(self):
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3500,
+            solarstrahlung_nord=300,
+            solarstrahlung_sued=1100,
+            solarstrahlung_ost=700,
+            solarstrahlung_west=700,
+            solarstrahlung_horizontal=1000,
+        )
+        klima_register.invalidieren()
+
+    def test_threads(self):
+        zaehler = Zaehler('test_total', 'Test', labels=('art',))
+        histogramm = Histogramm('test_sekunden', 'Test', grenzen=(1, 10))
+
+        def schreiben():
+            for i in range(1000):
+                zaehler.erhoehen('a')
+                histogramm.beobachten(i % 20)
+
+        threads = [threading.Thread(target=schreiben) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(zaehler.werte(), {('a',): 8000})
+        buckets, summe = histogramm.werte()[()]
+        self.assertEqual(buckets, [800, 4400, 8000])
+        self.assertEqual(summe, 8 * 50 * sum(range(20)))
+        zeilen = list(histogramm.zeilen())
+        self.assertIn('test_sekunden_bucket{le="+Inf"} 8000', zeilen)
+        self.assertIn('test_sekunden_count 8000', zeilen)
+
+        # Werte beendeter Threads sind in die gemeinsame Summe übernommen
+        self.assertEqual(len(zaehler._werte._alle), 0)
+        zaehler.erhoehen('a')
+        self.assertEqual(zaehler.werte(), {('a',): 8001})
+        self.assertEqual(len(zaehler._werte._alle), 1)
+
+    def test_metrics_endpoint(self):
+        anfragen_vorher = REQUEST_DAUER.werte().get(('berechnung_api', 'GET'), ([0], 0))[0][-1]
+        berechnungen_vorher = BERECHNUNG_DAUER.werte().get(('einzeln',), ([0], 0))[0][-1]
+        orte_vorher = ORT_ABFRAGEN.werte().get(('gefunden',), 0)
+
+        params = {'laenge_ns': '31', 'breite_ow': '15', 'geschosse': '3', 'ort': 'Test Stadt'}
+        for _ in range(2):
+            self.client.get(reverse('berechnung_api'), params)
+        self.client.post(
+            reverse('berechnung_batch_api'),
+            json.dumps([{'laenge_ns': 20, 'breite_ow': 10, 'geschosse': 2}]),
+            content_type='application/json',
+        )
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+
+        self.assertEqual(REQUEST_DAUER.werte()[('berechnung_api', 'GET')][0][-1], anfragen_vorher + 2)
+        # Zweite Anfrage aus dem Ergebnis-Cache
+        self.assertEqual(BERECHNUNG_DAUER.werte()[('einzeln',)][0][-1], berechnungen_vorher + 1)
+        self.assertEqual(ORT_ABFRAGEN.werte()[('gefunden',)], orte_vorher + 2)
+        self.assertIn('bilanz_request_dauer_sekunden_bucket{view="berechnung_api",methode="GET",le="0.001"}', text)
+        self.assertIn('bilanz_request_db_abfragen_count{view="berechnung_batch_api"}', text)
+        self.assertIn('bilanz_berechnung_dauer_sekunden_count{art="batch"}', text)
+        self.assertIn('bilanz_batch_groesse_bucket{le="1"}', text)
+        self.assertIn('bilanz_cache_treffer_total{cache="ergebnis"}', text)
+        self.assertIn('bilanz_executor_abgewiesen_total', text)
+
+        with override_settings(BILANZ_METRIKEN={'AKTIV': False}):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+    def test_abruf_legt_keinen_executor_an(self):
+        with override_settings(BILANZ_BERECHNUNG_EXECUTOR={'WORKER': 1}):
+            self.assertIsNone(vorhandener_berechnungs_executor())
+            self.assertIn('bilanz_executor_laufend 0', self.client.get('/metrics').content.decode())
+            self.assertIsNone(vorhandener_berechnungs_executor())
+
+
+class ProtokollTest(TestCase):
+    def setUp(self):
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3500,
+            solarstrahlung_nord=300,
+            solarstrahlung_sued=1100,
+            solarstrahlung_ost=700,
+            solarstrahlung_west=700,
+            solarstrahlung_horizontal=1000,
+        )
+        self.gebaeude = Gebaeude.objects.create(
+            name='Test', ort=self.ort, laenge_ns=20, breite_ow=15, geschosse=3,
+        )
+        Bauteil.objects.create(gebaeude=self.gebaeude, typ='wand_sued', u_wert=0.3)
+        klima_register.invalidieren()
+
+    def test_baum(self):
+        gebaeude = GebaeudeEingabe(20, 15, 3, fensterflaechen=[5, 10, 5, 5])
+        argumente = (gebaeude, {'dach': 0.2, 'wand_nord': 0.3}, None, None, [], [], STANDARD_KLIMADATEN)
+        with protokollieren() as protokoll:
+            ergebnis = berechne_energiebilanz(*argumente)
+        self.assertIsNone(aktuelles_protokoll())
+        self.assertEqual(ergebnis, berechne_energiebilanz(*argumente))
+        self.assertEqual(len(protokoll.baeume), 1)
+
+        baum = protokoll.baum
+        self.assertEqual(baum['name'], 'berechne_energiebilanz')
+        kinder = {k['name']: k for k in baum['kinder']}
+        self.assertEqual(len(kinder), 8)
+        heizung = kinder['berechne_heizwaermebedarf']
+        self.assertAlmostEqual(heizung['wert'], berechne_heizwaermebedarf(*argumente[:2], STANDARD_KLIMADATEN))
+        q_t, q_v = heizung['kinder']
+        self.assertEqual(q_t['name'], 'berechne_transmissionsverlust')
+        self.assertEqual(q_t['wert'], berechne_transmissionsverlust(*argumente[:2]))
+        self.assertEqual(q_v['name'], 'berechne_lueftungswaermeverlust')
+        self.assertGreaterEqual(heizung['dauer_ms'], q_t['dauer_ms'] + q_v['dauer_ms'])
+
+        gewinne = berechne_solargewinne(gebaeude, STANDARD_KLIMADATEN) + berechne_interne_gewinne(gebaeude, [])
+        self.assertAlmostEqual(baum['wert']['gewinn_abzug'], gewinne * 0.7)
+        self.assertEqual(round(baum['wert']['ee_gesamt'], 1), ergebnis['endenergie']['ee_gesamt'])
+
+    def test_api(self):
+        params = {'laenge_ns': '20', 'breite_ow': '15', 'geschosse': '3', 'ort': 'Test Stadt'}
+        ohne = self.client.get(reverse('berechnung_api'), params).json()
+        mit = self.client.get(reverse('berechnung_api'), dict(params, trace='1')).json()
+        self.assertEqual(mit.pop('trace')['name'], 'berechne_energiebilanz')
+        self.assertEqual(mit, ohne)
+
+        mit = self.client.get(reverse('berechnung_api'), dict(params, trace='1', blocks='pv')).json()
+        self.assertEqual(set(mit), {'pv', 'trace'})
+
+        url = reverse('gebaeude_berechnung', args=[self.gebaeude.id])
+        mit = self.client.get(url, {'trace': 'true', 'blocks': 'gebaeudedaten'}).json()
+        self.assertEqual(len(mit['trace']['kinder']), 8)
+        self.assertFalse(Berechnung.objects.filter(gebaeude=self.gebaeude).exists())
+        self.assertNotIn('trace', self.client.get(url).json())
+
+
+class PortfolioTest(TestCase):
+    def setUp(self):
+        self.ort = Ort.objects.create(
+            name='Test Stadt',
+            temperatur_mittel=9.0,
+            heizgradtage=3500,
+            solarstrahlung_nord=300,
+            solarstrahlung_sued=1100,
+            solarstrahlung_ost=700,
+            solarstrahlung_west=700,
+            solarstrahlung_horizontal=1000,
+        )
+        klima_register.invalidieren()
+        self.verzeichnis = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.verzeichnis)
+
+    def _parameter(self, name):
+        with open(os.path.join(self.verzeichnis, name), encoding='utf-8') as datei:
+            return [json.loads(zeile) for zeile in datei]
+
+    def test_reproduzierbar(self):
+        erste = [p for _, p in portfolio_erzeugen(50, seed=3, orte=[self.ort])]
+        zweite = [p for _, p in portfolio_erzeugen(50, seed=3, orte=[self.ort])]
+        andere = [p for _, p in portfolio_erzeugen(50, seed=4, orte=[self.ort])]
+        self.assertEqual(erste, zweite)
+        self.assertNotEqual(erste, andere)
+        self.assertEqual(set(erste[0]) - PARAMETER_NAMEN, set())
+
+    def test_command(self):
+        pfad = os.path.join(self.verzeichnis, 'a.jsonl')
+        call_command('erzeuge_portfolio', 30, seed=1, parameter=pfad, block=7, stdout=StringIO(), stderr=StringIO())
+        parameter = self._parameter('a.jsonl')
+        self.assertEqual(len(parameter), 30)
+        self.assertEqual(parameter, [p for _, p in portfolio_erzeugen(30, seed=1, orte=[self.ort])])
+
+        zeilen = [z for z, _ in portfolio_erzeugen(30, seed=1, orte=[self.ort])]
+        self.assertEqual(Gebaeude.objects.count(), 30)
+        self.assertEqual(Bauteil.objects.count(), sum(len(z['bauteile']) for z in zeilen))
+        self.assertEqual(Waermequelle.objects.count(), sum(len(z['waermequellen']) for z in zeilen))
+        self.assertEqual(Beleuchtung.objects.count(), sum(len(z['beleuchtungen']) for z in zeilen))
+        self.assertEqual(PVAnlage.objects.count(), sum(1 for z in zeilen if z['pv_anlage']))
+        self.assertEqual(Lueftung.objects.count(), sum(1 for z in zeilen if z['lueftung']))
+
+        # Nicht angegebene Felder erhalten den Standardwert des Modells
+        lueftung = Lueftung.objects.first()
+        self.assertEqual(lueftung.luftwechselrate, Lueftung._meta.get_field('luftwechselrate').default)
+
+        gebaeude = Gebaeude.objects.get(name='Synthetisch 0000001')
+        ergebnis = self.client.get(reverse('berechnung_api'), parameter[0]).json()
+        self.assertNotIn('error', ergebnis)
+        self.assertEqual(gebaeude.laenge_ns, parameter[0]['laenge_ns'])
+
+    def test_nur_parameter(self):
+        pfad = os.path.join(self.verzeichnis, 'b.csv')
+        call_command('erzeuge_portfolio', 10, parameter=pfad, nur_parameter=True, stdout=StringIO())
+        self.assertFalse(Gebaeude.objects.exists())
+        with open(pfad, encoding='utf-8') as datei:
+            self.assertEqual(len(datei.readlines()), 11)
+
+        with self.assertRaises(CommandError):
+            call_command('erzeuge_portfolio', 10, nur_parameter=True, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('erzeuge_portfolio', 10, ort=['Nirgendwo'], stdout=StringIO())
+        Ort.objects.all().delete()
+        with self.assertRaises(CommandError):
+            call_command('erzeuge_portfolio', 10, stdout=StringIO())
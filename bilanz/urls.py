@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import views, api_views
 
 urlpatterns = [
     # Hauptseiten
@@ -28,4 +28,7 @@ urlpatterns = [
     # Ergebnis-Seiten
     path('einfach-ergebnis/', views.einfach_ergebnis, name='einfach_ergebnis'),
     path('ergebnis-pdf/', views.ergebnis_pdf, name='ergebnis_pdf'),
+    
+    # Monitoring
+    path('metrics', api_views.metriken_api, name='metriken'),
 ]
\ No newline at end of file
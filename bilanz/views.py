@@ -1,6 +1,6 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, Http404
 from django.template.loader import render_to_string
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
@@ -9,13 +9,16 @@ import json
 
 from .models import (
     Gebaeude, Bauteil, PVAnlage, Lueftung, Beleuchtung, 
-    Waermequelle, Sonnenschutz, Berechnung, Ort
+    Waermequelle, Sonnenschutz
 )
 from .forms import (
     GebaeudeAllgForm, BauteilForm, PVForm, LueftungForm,
     BeleuchtungForm, WaermequelleForm, SonnenschutzForm
 )
 from .berechnungen import berechne_energiebilanz
+from .klima import klima_register
+from .lader import lade_berechnungseingabe
+from .ergebnisse import aktuelle_berechnung
 
 
 def startseite(request):
@@ -65,7 +68,7 @@ def allg_angaben(request):
         form = GebaeudeAllgForm(instance=gebaeude)
     
     # Orte für Dropdown
-    orte = Ort.objects.all().values_list('name', flat=True)
+    orte = klima_register.namen()
     
     context = {
         'form': form,
@@ -282,16 +285,16 @@ def ergebnis(request):
         messages.error(request, 'Bitte füllen Sie zuerst die allgemeinen Angaben aus.')
         return redirect('allg_angaben')
     
-    gebaeude = get_object_or_404(Gebaeude, id=gebaeude_id)
-    
-    # Berechnung durchführen
     try:
-        berechnung = gebaeude.berechnung
-    except Berechnung.DoesNotExist:
-        berechnung = Berechnung.objects.create(gebaeude=gebaeude)
+        eingaben = lade_berechnungseingabe(gebaeude_id)
+    except Gebaeude.DoesNotExist:
+        raise Http404('Gebäude nicht gefunden')
+    
+    # Berechnung nur bei geänderten Eingaben neu durchführen
+    berechnung, _ = aktuelle_berechnung(eingaben)
     
     context = {
-        'gebaeude': gebaeude,
+        'gebaeude': eingaben.gebaeude,
         'berechnung': berechnung,
     }
     return render(request, 'ergebnis.html', context)
@@ -0,0 +1,131 @@
+"""
+WebSocket-Kanal für die Live-Berechnung
+
+Der Kanal wird direkt von der ASGI-Anwendung bedient (siehe
+energiebilanz/asgi.py), ohne Middleware, Session und CSRF-Prüfung. Der
+Client hält eine Verbindung offen und schickt Nachrichten der Form
+
+    {"id": 17, "parameter": {"u_wert_dach": 0.2, ...}}
+
+mit geänderten Parametern (Namen wie berechnung_api, None entfernt einen
+Parameter). Die erste Antwort enthält das vollständige Ergebnis, jede
+weitere nur die geänderten Felder, jeweils mit der id der letzten
+berücksichtigten Nachricht. Treffen während einer Berechnung weitere
+Nachrichten ein, werden sie zusammengefasst und nur der neueste Stand
+berechnet.
+
+Die Klimadaten kommen über das asynchrone ORM, die Berechnung läuft wie
+bei den asynchronen Views im begrenzten Berechnungs-Executor.
+"""
+import asyncio
+import contextlib
+import json
+
+from .ausfuehrung import Ueberlastet, get_berechnungs_executor
+from .klima import aklimadaten_fuer_ort
+from .live import (
+    BERECHNUNGSFEHLER, berechne_live, ergebnis_aenderungen, parameter_anwenden, pruefe_parameter,
+)
+
+
+WEBSOCKET_PFAD = '/ws/berechnung/'
+
+
+async def _senden(send, daten):
+    await send({'type': 'websocket.send', 'text': json.dumps(daten)})
+
+
+async def live_berechnung_websocket(scope, receive, send):
+    """ASGI-Anwendung für eine WebSocket-Verbindung der Live-Berechnung"""
+    nachricht = await receive()
+    if nachricht['type'] != 'websocket.connect':
+        return
+    await send({'type': 'websocket.accept'})
+
+    # Zusammengefasste, noch nicht berechnete Änderungen
+    offen = {'delta': {}, 'id': None, 'verbunden': True}
+    neu = asyncio.Event()
+
+    async def empfangen():
+        try:
+            while True:
+                nachricht = await receive()
+                if nachricht['type'] == 'websocket.disconnect':
+                    return
+                if nachricht['type'] != 'websocket.receive':
+                    continue
+                daten = None
+                try:
+                    daten = json.loads(nachricht.get('text') or nachricht.get('bytes') or '')
+                    if not isinstance(daten, dict) or not isinstance(daten.get('parameter'), dict):
+                        raise ValueError('Nachricht muss {"parameter": {...}} enthalten')
+                    pruefe_parameter(daten['parameter'])
+                except ValueError as e:
+                    await _senden(send, {'id': daten.get('id') if isinstance(daten, dict) else None,
+                                         'error': str(e)})
+                    continue
+                offen['delta'].update(daten['parameter'])
+                offen['id'] = daten.get('id')
+                neu.set()
+        except Exception:
+            # z.B. RecursionError bei tief verschachteltem JSON: Verbindung schließen
+            with contextlib.suppress(Exception):
+                await send({'type': 'websocket.close', 'code': 1011})
+        finally:
+            # Ohne Empfänger wartete die Hauptschleife sonst für immer auf neu
+            offen['verbunden'] = False
+            neu.set()
+
+    empfaenger = asyncio.ensure_future(empfangen())
+    parameter = {}
+    ergebnis = None
+    version = 0
+    try:
+        while True:
+            await neu.wait()
+            neu.clear()
+            if not offen['verbunden']:
+                break
+            delta, nachricht_id = offen['delta'], offen['id']
+            offen['delta'] = {}
+
+            try:
+                neue_parameter = parameter_anwenden(parameter, delta)
+                klimadaten = await aklimadaten_fuer_ort(neue_parameter.get('ort'))
+                neues_ergebnis = await get_berechnungs_executor().ausfuehren(
+                    berechne_live, neue_parameter, klimadaten,
+                )
+            except BERECHNUNGSFEHLER as e:
+                await _senden(send, {'id': nachricht_id, 'error': str(e)})
+                continue
+            except Ueberlastet:
+                await _senden(send, {'id': nachricht_id, 'error': 'Zu viele gleichzeitige Berechnungen'})
+                continue
+
+            version += 1
+            antwort = {'version': version, 'id': nachricht_id}
+            if ergebnis is None:
+                antwort['ergebnis'] = neues_ergebnis
+            else:
+                antwort['aenderungen'] = ergebnis_aenderungen(ergebnis, neues_ergebnis)
+            parameter, ergebnis = neue_parameter, neues_ergebnis
+            await _senden(send, antwort)
+    finally:
+        empfaenger.cancel()
+
+
+def mit_websocket(anwendung):
+    """
+    Ergänzt die Django-ASGI-Anwendung um den WebSocket-Kanal; alle anderen
+    Verbindungen gehen unverändert an ``anwendung``
+    """
+    async def asgi(scope, receive, send):
+        if scope['type'] == 'websocket':
+            if scope['path'] == WEBSOCKET_PFAD:
+                return await live_berechnung_websocket(scope, receive, send)
+            await receive()
+            await send({'type': 'websocket.close', 'code': 4404})
+            return
+        return await anwendung(scope, receive, send)
+
+    return asgi
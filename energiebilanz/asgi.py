@@ -2,6 +2,8 @@
 ASGI config for energiebilanz project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+WebSocket connections to /ws/berechnung/ are served by the live calculation
+channel (bilanz/websocket.py), everything else by Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -13,4 +15,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'energiebilanz.settings')
 
-application = get_asgi_application()
\ No newline at end of file
+django_application = get_asgi_application()
+
+# Erst nach dem Initialisieren von Django importieren
+from bilanz.websocket import mit_websocket  # noqa: E402
+
+application = mit_websocket(django_application)
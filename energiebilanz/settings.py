@@ -35,6 +35,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'bilanz.metriken.MetrikenMiddleware',
+    'bilanz.messung.MessungMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -129,4 +131,50 @@ REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
     ],
-}
\ No newline at end of file
+}
+
+# Ergebnis-Cache für die Live-Berechnung (/api/berechnung/)
+BILANZ_ERGEBNIS_CACHE = {
+    'GROESSE': 1024,  # Einträge pro Prozess, 0 deaktiviert den Cache
+    'TTL': 300,  # Sekunden
+    'DJANGO_CACHE': None,  # Alias aus CACHES, um Treffer zwischen Workern zu teilen
+}
+
+# Cache der einzelnen Bilanzterme für die inkrementelle Berechnung (/api/berechnung/terme/)
+BILANZ_TERM_CACHE = {
+    'GROESSE': 8192,
+    'TTL': 300,
+    'DJANGO_CACHE': None,
+}
+
+# Thread-Pool der asynchronen API-Views (/api/async/...): Worker-Threads und
+# maximal wartende Berechnungen, darüber hinaus antworten die Views mit 503
+BILANZ_BERECHNUNG_EXECUTOR = {
+    'WORKER': 4,
+    'WARTESCHLANGE': 64,
+}
+
+# Maximale Body-Größe in Bytes für /api/berechnung/batch/ (wird zeilenweise
+# gelesen, DATA_UPLOAD_MAX_MEMORY_SIZE gilt dort nicht), darüber 413
+BILANZ_BATCH_MAX_BYTES = 100 * 1024 * 1024
+
+# Klimadaten-Register: Sekunden bis zum Neuladen der Orte in anderen Worker-Prozessen
+# (im eigenen Prozess wird über post_save/post_delete sofort invalidiert)
+BILANZ_KLIMA_NEULADEN = 300
+
+# Stündliche Klimadaten (Testreferenzjahre) je Ort, memory-mapped von allen
+# Worker-Prozessen gelesen; befüllt über manage.py load_klimadaten_stunden
+BILANZ_KLIMA_STUNDEN = BASE_DIR / 'klima_stunden.bin'
+
+# Laufzeitmessung je Request (Server-Timing-Header und Logzeile 'bilanz.messung'),
+# RATE ist der Anteil gemessener Requests
+BILANZ_MESSUNG = {
+    'RATE': 0.05,
+    'HEADER': True,
+    'LOG': True,
+}
+
+# Metriken im Prometheus-Textformat unter /metrics (AKTIV = False: 404)
+BILANZ_METRIKEN = {
+    'AKTIV': True,
+}